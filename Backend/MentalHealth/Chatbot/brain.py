@@ -3,7 +3,22 @@ IMPROVED AI brain - better emotion detection and context understanding
 """
 import random
 import re
-from .config import THERAPEUTIC_RESPONSES, EMOTION_WORDS
+from .config import (
+    THERAPEUTIC_RESPONSES, EMOTION_WORDS, POSITIVE_EMOTION_WORDS, MESSAGE_CUES,
+    INTENSITY_WORDS, ABSOLUTE_NEGATIVE_PHRASES, THEME_KEYWORDS
+)
+from .lexicon import Lexicon
+
+# Every word list the brain looks for, matched together in one pass (see lexicon.py)
+LEXICON_GROUPS = {
+    'positive_emotion': POSITIVE_EMOTION_WORDS,
+    'emotion': EMOTION_WORDS,
+    'cue': MESSAGE_CUES,
+    'intensity': {'intensity': INTENSITY_WORDS},
+    'absolute_negative': {'absolute_negative': ABSOLUTE_NEGATIVE_PHRASES},
+    'theme': THEME_KEYWORDS,
+}
+LEXICON = Lexicon(LEXICON_GROUPS)
 
 class TherapeuticBrain:
     def __init__(self):
@@ -12,137 +27,94 @@ class TherapeuticBrain:
         self.conversation_context = []
         
         # Add POSITIVE emotion words
-        self.positive_emotion_words = {
-            'good': ['good', 'great', 'awesome', 'wonderful', 'nice', 'better', 'well', 'happy', 'joy', 'pleased'],
-            'calm': ['calm', 'peaceful', 'relaxed', 'chill', 'serene'],
-            'hopeful': ['hopeful', 'optimistic', 'positive', 'excited', 'looking forward'],
-            'proud': ['proud', 'accomplished', 'achieved', 'success', 'progress']
-        }
+        self.positive_emotion_words = POSITIVE_EMOTION_WORDS
         
     def analyze_message(self, text):
         """Analyze user message for emotional content and themes"""
         text_lower = text.lower()
+        # One scan finds every lexicon word; the checks below only look at the hits
+        matches = LEXICON.match(text_lower)
         
         analysis = {
-            'emotions': self._detect_emotions(text_lower),
-            'urgency': self._assess_urgency(text_lower),
-            'themes': self._extract_themes(text_lower),
+            'emotions': self._detect_emotions(text_lower, matches),
+            'urgency': self._assess_urgency(text_lower, matches),
+            'themes': self._extract_themes(text_lower, matches),
             'length': len(text.split()),
             'has_question': '?' in text,
-            'is_positive': self._is_positive_message(text_lower),
-            'is_negative': self._is_negative_message(text_lower)
+            'is_positive': self._is_positive_message(text_lower, matches),
+            'is_negative': self._is_negative_message(text_lower, matches)
         }
         
         return analysis    
         
-    def _detect_emotions(self, text):
+    def _detect_emotions(self, text, matches=None):
         """Detect emotions in text - IMPROVED VERSION"""
-        emotions_found = []
+        matches = matches or LEXICON.match(text)
+        positive = matches.categories('positive_emotion')
+        negative = matches.categories('emotion')
+        cues = matches.categories('cue')
         
         # Check for POSITIVE emotions first
-        for emotion, words in self.positive_emotion_words.items():
-            for word in words:
-                if word in text:
-                    emotions_found.append(emotion)
-                    break
+        emotions_found = [emotion for emotion in self.positive_emotion_words if emotion in positive]
         
         # Check for NEGATIVE emotions
-        for emotion, words in self.emotion_words.items():
-            for word in words:
-                if word in text:
-                    # Don't add if we already have positive emotions (unless mixed signals)
-                    if not emotions_found or 'not' in text or 'but' in text:
-                        emotions_found.append(emotion)
-                    break
+        for emotion in self.emotion_words:
+            if emotion in negative:
+                # Don't add if we already have positive emotions (unless mixed signals)
+                if not emotions_found or 'negation' in cues or 'contrast' in cues:
+                    emotions_found.append(emotion)
         
         # Special case: "not good", "not well", "not happy"
-        if 'not' in text and any(pos in text for pos in ['good', 'well', 'happy', 'great']):
+        if 'negation' in cues and 'negatable' in cues:
             if 'good' in emotions_found:
                 emotions_found.remove('good')
             emotions_found.append('bad')
             
         return emotions_found if emotions_found else ['neutral']
     
-    def _is_positive_message(self, text):
+    def _is_positive_message(self, text, matches=None):
         """Check if message is positive"""
-        positive_indicators = [
-            'good', 'great', 'awesome', 'happy', 'better', 'well', 
-            'excited', 'proud', 'achieved', 'progress', 'improved'
-        ]
+        matches = matches or LEXICON.match(text)
         
         # Check for positive words WITHOUT negation
-        for indicator in positive_indicators:
-            if indicator in text:
-                # Make sure it's not negated
-                if f"not {indicator}" not in text and f"n't {indicator}" not in text:
-                    return True
+        for indicator in matches.terms('cue', 'positive'):
+            # Make sure it's not negated
+            if f"not {indicator}" not in text and f"n't {indicator}" not in text:
+                return True
         return False
     
-    def _is_negative_message(self, text):
+    def _is_negative_message(self, text, matches=None):
         """Check if message is negative"""
-        negative_indicators = [
-            'bad', 'sad', 'anxious', 'stressed', 'tired', 'angry', 
-            'depressed', 'hopeless', 'overwhelmed', 'exhausted'
-        ]
+        matches = matches or LEXICON.match(text)
+        cues = matches.categories('cue')
         
-        # Explicit negative words
-        for indicator in negative_indicators:
-            if indicator in text:
-                return True
-                
-        # Negated positive words
-        if any(neg in text for neg in ['not good', 'not well', "don't feel good", "not happy"]):
-            return True
-            
-        return False
+        # Explicit negative words, or negated positive words
+        return 'negative' in cues or 'negated_positive' in cues
     
-    def _assess_urgency(self, text):
+    def _assess_urgency(self, text, matches=None):
         """Assess urgency level of message - IMPROVED"""
-        urgency_score = 0
+        matches = matches or LEXICON.match(text)
         
         # Only assess urgency for negative messages
-        if self._is_positive_message(text):
+        if self._is_positive_message(text, matches):
             return 0  # No urgency for positive messages
         
         # Intensity words
-        intensity_words = ['really', 'very', 'extremely', 'so', 'too', 'cannot', 'can\'t', 'never', 'always']
-        for word in intensity_words:
-            if word in text:
-                urgency_score += 1
+        urgency_score = len(matches.terms('intensity'))
         
         # Exclamation marks
         urgency_score += text.count('!') * 2
         
         # Negative absolute statements
-        absolute_negative = ["can't take", "can't handle", "can't do this", "hate this", "want to die"]
-        for phrase in absolute_negative:
-            if phrase in text:
-                urgency_score += 3
+        urgency_score += 3 * len(matches.terms('absolute_negative'))
         
         return min(urgency_score, 10)
     
-    def _extract_themes(self, text):
+    def _extract_themes(self, text, matches=None):
         """Extract key themes from text"""
-        themes = []
-        
-        # Common mental health themes
-        common_themes = {
-            'sleep': ['sleep', 'tired', 'bed', 'night', 'insomnia', 'awake'],
-            'work': ['work', 'job', 'boss', 'colleague', 'deadline', 'office'],
-            'family': ['family', 'parent', 'mother', 'father', 'sibling', 'child', 'wife', 'husband'],
-            'friends': ['friend', 'friends', 'social', 'lonely', 'alone'],
-            'school': ['school', 'exam', 'test', 'homework', 'study', 'college'],
-            'health': ['sick', 'pain', 'health', 'doctor', 'hospital'],
-            'daily': ['today', 'yesterday', 'morning', 'night', 'day', 'week']
-        }
-        
-        for theme, keywords in common_themes.items():
-            for keyword in keywords:
-                if keyword in text:
-                    themes.append(theme)
-                    break
-        
-        return themes
+        matches = matches or LEXICON.match(text)
+        found = matches.categories('theme')
+        return [theme for theme in THEME_KEYWORDS if theme in found]
     
     def generate_response(self, user_message, analysis):
         """Generate appropriate response based on analysis - FIXED VERSION"""
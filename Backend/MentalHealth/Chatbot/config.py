@@ -34,10 +34,19 @@ THERAPEUTIC_RESPONSES = {
     ]
 }
 
-# Crisis keywords and resources
-CRISIS_KEYWORDS = {
-    'suicide', 'kill myself', 'end it all', 'want to die', 'harm myself',
-    'no point', 'can\'t go on', 'better off dead', 'end my life'
+# Crisis phrases and resources, shared by every crisis check (see crisis.py).
+# They are matched word by word, and misspelled words still count ("kil myslef").
+CRISIS_KEYWORDS = [
+    'suicide', 'suicidal', 'kill myself', 'end my life', 'end it all', 'end everything',
+    'take my own life', 'want to die', 'wanna die', 'better off dead', 'better off without me',
+    'no point', 'can\'t go on', 'cannot go on', 'can\'t live', 'cannot live',
+    'hurt myself', 'harm myself', 'hurting myself', 'self harm',
+]
+
+# Real words one typo away from a crisis word; they are never read as misspellings
+CRISIS_LOOKALIKES = {
+    'love', 'lover', 'loved', 'will', 'fill', 'bill', 'diet', 'died', 'did', 'lie', 'tie',
+    'deed', 'dear', 'deaf', 'deal', 'hunt', 'hint', 'and', 'elf', 'shelf', 'lift', 'wife', 'like',
 }
 
 CRISIS_RESPONSE = """
@@ -92,4 +101,40 @@ EMOTION_WORDS = {
     'tired': ['tired', 'exhausted', 'drained', 'fatigued', 'burned out', 'sleepy'],
     'lonely': ['lonely', 'isolated', 'alone', 'abandoned'],
     'confused': ['confused', 'lost', 'uncertain', 'unsure', 'mixed']
-}
\ No newline at end of file
+}
+
+# Positive emotional vocabulary
+POSITIVE_EMOTION_WORDS = {
+    'good': ['good', 'great', 'awesome', 'wonderful', 'nice', 'better', 'well', 'happy', 'joy', 'pleased'],
+    'calm': ['calm', 'peaceful', 'relaxed', 'chill', 'serene'],
+    'hopeful': ['hopeful', 'optimistic', 'positive', 'excited', 'looking forward'],
+    'proud': ['proud', 'accomplished', 'achieved', 'success', 'progress']
+}
+
+# Message-level cues used by the brain's analysis
+MESSAGE_CUES = {
+    'positive': ['good', 'great', 'awesome', 'happy', 'better', 'well',
+                 'excited', 'proud', 'achieved', 'progress', 'improved'],
+    'negative': ['bad', 'sad', 'anxious', 'stressed', 'tired', 'angry',
+                 'depressed', 'hopeless', 'overwhelmed', 'exhausted'],
+    'negated_positive': ['not good', 'not well', "don't feel good", 'not happy'],
+    'negation': ['not', 'cannot'],
+    'contrast': ['but'],
+    # Positive words that flip to "bad" when the message also contains a negation
+    'negatable': ['good', 'well', 'happy', 'great'],
+}
+
+# Urgency signals
+INTENSITY_WORDS = ['really', 'very', 'extremely', 'so', 'too', 'cannot', "can't", 'never', 'always']
+ABSOLUTE_NEGATIVE_PHRASES = ["can't take", "can't handle", "can't do this", "hate this", "want to die"]
+
+# Common mental health themes
+THEME_KEYWORDS = {
+    'sleep': ['sleep', 'tired', 'bed', 'night', 'insomnia', 'awake'],
+    'work': ['work', 'job', 'boss', 'colleague', 'deadline', 'office'],
+    'family': ['family', 'parent', 'mother', 'father', 'sibling', 'child', 'wife', 'husband'],
+    'friends': ['friend', 'friends', 'social', 'lonely', 'alone'],
+    'school': ['school', 'exam', 'test', 'homework', 'study', 'college'],
+    'health': ['sick', 'pain', 'health', 'doctor', 'hospital'],
+    'daily': ['today', 'yesterday', 'morning', 'night', 'day', 'week']
+}
@@ -0,0 +1,214 @@
+"""
+Misspelling-tolerant crisis detection.
+
+Every crisis check (Chatbot.views.detect_crisis, SafetyHandler and the Extra
+chatbot's emergency intent) goes through the one CrisisDetector built here
+from config.CRISIS_KEYWORDS, so they all agree on what a crisis message is.
+
+Phrases are matched word by word, and each word of the message may be a
+misspelling of a phrase word. Misspellings are found with a symmetric-delete
+(SymSpell) index: every phrase word is stored under all the strings left after
+deleting up to N of its letters. A message word is looked up by its own
+deletes, and the few candidates that share one are checked with a real edit
+distance. So a lookup costs a handful of dict hits, however long the phrase
+list gets.
+
+How far a word may be misspelled depends on its length:
+
+    1-2 letters   exact only ("my", "to", "on")
+    3-4 letters   one edit that keeps the first and last letter ("dye" -> "die",
+                  "kil" -> "kill", but "and" is not "end")
+    5-6 letters   one edit ("myslef" -> "myself")
+    7+ letters    two edits ("sucide" -> "suicide")
+
+Words in config.CRISIS_LOOKALIKES ("love", "will", "diet") are real words
+and never read as misspellings. Two words written as one ("killmyself") or a
+word split in two ("my self") are matched as well.
+
+It leans towards recall, since a missed crisis costs more than an extra
+helpline message: "I want to dye my hair" is read as a crisis.
+
+The work per message is bounded: each distinct word is looked up once, and at
+most max_fuzzy_words words per message are looked up for misspellings (the
+rest still match exactly). Run `python -m Chatbot.crisis` for timings.
+"""
+import timeit
+
+from .config import CRISIS_KEYWORDS, CRISIS_LOOKALIKES
+from .lexicon import tokenize
+
+
+def max_distance(word):
+    """How many edits a misspelling of word may have"""
+    if len(word) < 3:
+        return 0
+    if len(word) < 7:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (insert, delete, substitute, swap two
+    neighbours), or limit + 1 once it is known to be larger than limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(word, distance):
+    """word and every string left after deleting up to distance of its letters"""
+    found = {word}
+    edge = {word}
+    for _ in range(distance):
+        edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))} - found
+        found |= edge
+    return found
+
+
+class CrisisDetector:
+    """
+    phrases are plain text ("kill myself"); lookalikes are real words that
+    must not be corrected to a phrase word.
+    """
+
+    # Lookup results kept between messages; cleared when it grows past this
+    CACHE_SIZE = 10000
+
+    def __init__(self, phrases=CRISIS_KEYWORDS, lookalikes=CRISIS_LOOKALIKES, max_fuzzy_words=32):
+        self.phrases = {}
+        for phrase in phrases:
+            words = tuple(tokenize(phrase))
+            self.phrases.setdefault(words[0], []).append(words)
+        self.lookalikes = frozenset(lookalikes)
+        self.max_fuzzy_words = max_fuzzy_words
+
+        self.vocabulary = {word for group in self.phrases.values() for words in group for word in words}
+        # "killmyself": a multi-word phrase written as one word matches the whole phrase
+        self.joined = {
+            "".join(words): words
+            for group in self.phrases.values() for words in group if len(words) > 1
+        }
+
+        self._index = {}
+        for word in self.vocabulary | set(self.joined):
+            for delete in deletes(word, max_distance(word)):
+                self._index.setdefault(delete, set()).add(word)
+        self._longest = max(len(word) for word in self._index)
+        self._exact = {word: (word,) for word in self.vocabulary | set(self.joined)}
+        self._cache = {}
+
+    def _is_misspelling(self, token, word):
+        distance = max_distance(word)
+        if len(word) < 5 and (token[0] != word[0] or token[-1] != word[-1]):
+            return False
+        return edit_distance(token, word, distance) <= distance
+
+    def correct(self, token):
+        """The phrase words (or joined phrases) token is, or is a misspelling of"""
+        if token in self._cache:
+            return self._cache[token]
+        if token in self.lookalikes or len(token) > self._longest + 2:
+            found = ()
+        else:
+            candidates = set()
+            # Only words of 7+ letters take two edits, and no token under 5 letters is that close to one
+            for delete in deletes(token, 2 if len(token) >= 5 else 1):
+                candidates.update(self._index.get(delete, ()))
+            found = tuple(word for word in candidates if self._is_misspelling(token, word))
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[token] = found
+        return found
+
+    def _readings(self, tokens):
+        """For each position, the phrase words the token there may be"""
+        readings = []
+        budget = self.max_fuzzy_words
+        exact = self._exact
+        cache = self._cache
+        for token in tokens:
+            if token in exact:
+                readings.append(exact[token])
+            elif token in cache:
+                readings.append(cache[token])
+            elif len(token) < 3 or budget <= 0:
+                readings.append(())
+            else:
+                budget -= 1
+                readings.append(self.correct(token))
+        return readings
+
+    def find(self, text):
+        """The crisis phrases in text, as plain text, in the order they start"""
+        tokens = tokenize(text)
+        readings = self._readings(tokens)
+        # "my self": two neighbouring tokens that only make a phrase word together
+        split = {}
+        for i in range(len(tokens) - 1):
+            word = tokens[i] + tokens[i + 1]
+            if word in self.vocabulary:
+                split[i] = (word,)
+
+        found = []
+        for start, words in enumerate(readings):
+            for word in (*words, *split.get(start, ())):
+                if word in self.joined:
+                    found.append(" ".join(self.joined[word]))
+                for phrase in self.phrases.get(word, ()):
+                    if self._phrase_at(phrase, readings, split, start):
+                        found.append(" ".join(phrase))
+        return list(dict.fromkeys(found))
+
+    @staticmethod
+    def _phrase_at(phrase, readings, split, start):
+        positions = {start}
+        for word in phrase:
+            positions = {
+                position + step
+                for position in positions
+                for step, options in ((1, readings[position] if position < len(readings) else ()),
+                                      (2, split.get(position, ())))
+                if word in options
+            }
+            if not positions:
+                return False
+        return True
+
+    def is_crisis(self, text):
+        return bool(self.find(text))
+
+
+CRISIS_DETECTOR = CrisisDetector()
+
+
+def main():
+    messages = [
+        "hi",
+        "I feel so tired and sad today, I can't take this anymore!",
+        "sometimes i think i wanna dye, there is no point",
+        "Work was really stressful and my boss keeps adding deadlines but my friends helped. " * 5,
+        "Today started fine but by the evening I was exhausted and felt lonely again. " * 20,
+    ]
+    for message in messages:
+        detector = CrisisDetector()
+        cold = timeit.timeit(lambda: detector.find(message), number=1)
+        warm = min(timeit.repeat(lambda: detector.find(message), number=200, repeat=5)) / 200
+        print(f"{len(message):>6} chars  first {cold * 1e6:8.1f} us  cached {warm * 1e6:8.1f} us  {detector.find(message)}")
+
+
+if __name__ == "__main__":
+    main()
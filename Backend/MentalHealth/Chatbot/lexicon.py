@@ -0,0 +1,103 @@
+"""
+Compiled multi-pattern lexicon matcher.
+
+Every word list is folded into one lookup table when the Lexicon is built.
+Matching a message tokenizes it once (str.translate + split, both in C) and
+intersects the tokens with the table, so the cost grows with the length of
+the message, not with the number of words in the lexicon. Phrases are only
+checked when their first word occurs.
+
+Terms only match as whole words: "sad" does not match inside "saddle". A
+phrase and the terms inside it are all reported, so "can't take" also
+yields "can't".
+
+Run `python -m Chatbot.lexicon_benchmark` for a microbenchmark against the
+old substring scans.
+"""
+import string
+from collections import namedtuple
+
+Hit = namedtuple("Hit", "term namespace category")
+
+# Punctuation separates words; apostrophes stay inside words ("can't")
+_SEPARATORS = str.maketrans({**{ch: " " for ch in string.punctuation if ch != "'"}, "’": "'"})
+
+
+def tokenize(text):
+    """Lowercase words of text, split on whitespace and punctuation"""
+    text = f" {text.lower().translate(_SEPARATORS)} "
+    # Quotes around a word are not part of it
+    return text.replace(" '", " ").replace("' ", " ").split()
+
+
+class LexiconMatches:
+    """The distinct terms found in one message, looked up by namespace and category"""
+
+    def __init__(self, lexicon, terms):
+        self.found = terms
+        self._entries = lexicon._entries
+
+    def categories(self, namespace):
+        return {
+            category for term in self.found
+            for ns, category in self._entries[term] if ns == namespace
+        }
+
+    def terms(self, namespace, category=None):
+        return {
+            term for term in self.found
+            for ns, cat in self._entries[term] if ns == namespace and category in (None, cat)
+        }
+
+    def hits(self):
+        """Every (term, namespace, category) matched"""
+        return [
+            Hit(term, namespace, category)
+            for term in sorted(self.found) for namespace, category in self._entries[term]
+        ]
+
+
+class Lexicon:
+    """
+    groups maps namespace -> {category: [terms]}. A term may appear in
+    several categories and namespaces.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+        self._entries = {}
+        for namespace, categories in groups.items():
+            for category, terms in categories.items():
+                for term in terms:
+                    term = " ".join(tokenize(term))
+                    entries = self._entries.setdefault(term, [])
+                    if (namespace, category) not in entries:
+                        entries.append((namespace, category))
+
+        self._words = {term for term in self._entries if " " not in term}
+        self._phrases = {}
+        for term in self._entries:
+            if " " in term:
+                self._phrases.setdefault(term.split(" ", 1)[0], []).append(term)
+        self._phrase_heads = frozenset(self._phrases)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def match(self, text):
+        """The terms in text, found in one pass over its words"""
+        words = tokenize(text)
+        found = self._words.intersection(words)
+
+        heads = self._phrase_heads.intersection(words)
+        if heads:
+            joined = f" {' '.join(words)} "
+            for head in heads:
+                for phrase in self._phrases[head]:
+                    if f" {phrase} " in joined:
+                        found.add(phrase)
+        return LexiconMatches(self, found)
+
+    def find(self, text):
+        """Every hit in text with its category"""
+        return self.match(text).hits()
@@ -0,0 +1,67 @@
+"""
+Microbenchmark: compiled Lexicon vs one substring scan per term.
+
+    python -m Chatbot.lexicon_benchmark
+
+The legacy scan is what TherapeuticBrain used to do: for every category,
+check its words with `word in text` until one hits. It is timed on the real
+brain vocabulary and on the vocabulary padded with synthetic terms, because
+the scan gets slower with every word added while the Lexicon does not.
+"""
+import random
+import string
+import timeit
+
+from .brain import LEXICON_GROUPS
+from .lexicon import Lexicon
+
+MESSAGES = [
+    "hi",
+    "I feel so tired and sad today, I can't take this anymore!",
+    "Work was really stressful and my boss keeps adding deadlines but my friends helped",
+    "I'm not good, I couldn't sleep last night and I keep worrying about my exam. " * 5,
+    "Today started fine but by the evening I was exhausted and felt lonely again. " * 20,
+]
+
+
+def legacy_scan(groups, text):
+    found = []
+    text = text.lower()
+    for categories in groups.values():
+        for category, terms in categories.items():
+            for term in terms:
+                if term in text:
+                    found.append(category)
+                    break
+    return found
+
+
+def padded_groups(extra_terms, seed=0):
+    """LEXICON_GROUPS plus extra_terms made-up words spread over extra categories"""
+    rng = random.Random(seed)
+    groups = {namespace: dict(categories) for namespace, categories in LEXICON_GROUPS.items()}
+    filler = {}
+    for index in range(extra_terms):
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 9)))
+        filler.setdefault(f"filler{index % 50}", []).append(word)
+    groups["filler"] = filler
+    return groups
+
+
+def best_of(fn, number=500, repeat=5):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    for label, groups in (("brain vocabulary", LEXICON_GROUPS), ("+2000 terms", padded_groups(2000))):
+        lexicon = Lexicon(groups)
+        print(f"\n{label}: {len(lexicon)} terms")
+        print(f"{'chars':>6}  {'substring scan':>15}  {'Lexicon.match':>14}  speedup")
+        for message in MESSAGES:
+            legacy = best_of(lambda: legacy_scan(groups, message))
+            compiled = best_of(lambda: lexicon.match(message))
+            print(f"{len(message):>6}  {legacy * 1e6:>12.1f} us  {compiled * 1e6:>11.1f} us  {legacy / compiled:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
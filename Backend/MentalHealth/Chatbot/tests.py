@@ -1,3 +1,129 @@
-from django.test import TestCase
+import random
+import string
+import time
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .brain import LEXICON, TherapeuticBrain
+from .crisis import CRISIS_DETECTOR, CrisisDetector
+from .lexicon import Lexicon
+from .safety import SafetyHandler
+
+
+class LexiconTests(SimpleTestCase):
+    def test_whole_words_only(self):
+        matches = LEXICON.match("I fixed the saddle, a mad-scientist project (badly)")
+        self.assertNotIn('sad', matches.categories('emotion'))
+        # "mad" is a separate word once punctuation splits it off
+        self.assertEqual(matches.categories('emotion'), {'angry'})
+
+    def test_every_category_of_a_term_is_reported(self):
+        matches = LEXICON.match("Another sleepless NIGHT.")
+        self.assertEqual(matches.categories('theme'), {'sleep', 'daily'})
+
+    def test_phrases_and_the_terms_inside_them(self):
+        matches = LEXICON.match("I can't   take it, I'm not good")
+        self.assertEqual(matches.terms('absolute_negative'), {"can't take"})
+        self.assertEqual(matches.terms('intensity'), {"can't"})
+        self.assertIn('negated_positive', matches.categories('cue'))
+
+    def test_hits_carry_their_category(self):
+        lexicon = Lexicon({'mood': {'low': ['down', 'burned out'], 'high': ['great']}})
+        hits = lexicon.find("Feeling 'burned out' and down")
+        self.assertEqual(
+            sorted((hit.term, hit.category) for hit in hits),
+            [('burned out', 'low'), ('down', 'low')],
+        )
+
+
+class TherapeuticBrainTests(SimpleTestCase):
+    def setUp(self):
+        self.brain = TherapeuticBrain()
+
+    def test_analysis(self):
+        analysis = self.brain.analyze_message("I feel so tired and sad today, I can't take this anymore!")
+        # Only the first negative emotion is kept without mixed signals ("not", "but")
+        self.assertEqual(analysis['emotions'], ['sad'])
+        # so + can't + "can't take" + one exclamation mark
+        self.assertEqual(analysis['urgency'], 1 + 1 + 3 + 2)
+        self.assertEqual(analysis['themes'], ['sleep', 'daily'])
+        self.assertTrue(analysis['is_negative'])
+
+    def test_negated_positive(self):
+        analysis = self.brain.analyze_message("I'm not good")
+        self.assertEqual(analysis['emotions'], ['bad'])
+        self.assertFalse(analysis['is_positive'])
+        self.assertTrue(analysis['is_negative'])
+
+    def test_positive_message_has_no_urgency(self):
+        analysis = self.brain.analyze_message("I am doing really great today!")
+        self.assertTrue(analysis['is_positive'])
+        self.assertEqual(analysis['urgency'], 0)
+        self.assertEqual(analysis['emotions'], ['good'])
+
+
+# Crisis messages as users type them; every one must be caught
+CRISIS_RECALL_SET = [
+    "I want to kill myself", "kil myself", "i wanna dye", "wana die", "i wnat to die",
+    "I think about sucide a lot", "suiside", "im suicidial", "killmyself tonight",
+    "I will kill my self", "end my lfe", "I'm going to end it all!", "i cant go on like this",
+    "I cannot go on", "cant live like this anymore", "i keep hurting my self", "self harm again",
+    "selfharm", "harm myslef", "hurt myslef", "everyone is better off without me",
+    "theyd be better off without me", "better off ded", "theres no point",
+    "i want to take my own life", "I want to end everything", "KILL MYSELF", "want to die.",
+]
+
+# Everyday messages that look like the ones above
+CRISIS_SAFE_SET = [
+    "I love my life", "I want to diet before summer", "i will myself to get up",
+    "I can't like this song", "and it all worked out", "I killed it at my exam",
+    "my self esteem is low", "I'm dying to see that movie", "the plant died", "this kills me lol",
+    "better off going home", "I can't go out tonight", "end of my shift", "I hurt my knee",
+    "self care sunday", "she hurt herself skating", "point me to the docs", "no pain no gain",
+]
+
+
+class CrisisDetectorTests(SimpleTestCase):
+    def test_recall(self):
+        missed = [message for message in CRISIS_RECALL_SET if not CRISIS_DETECTOR.is_crisis(message)]
+        self.assertEqual(missed, [])
+
+    def test_lookalikes_are_not_crises(self):
+        flagged = [message for message in CRISIS_SAFE_SET if CRISIS_DETECTOR.is_crisis(message)]
+        self.assertEqual(flagged, [])
+
+    def test_find_reports_the_phrase(self):
+        self.assertEqual(CRISIS_DETECTOR.find("i wanna dye, no point"), ["wanna die", "no point"])
+        self.assertEqual(CRISIS_DETECTOR.find("kill my self"), ["kill myself"])
+
+    def test_every_crisis_check_agrees(self):
+        from Extra.utils import MentalHealthChatbot
+        from .views import detect_crisis
+
+        safety = SafetyHandler()
+        bot = MentalHealthChatbot()
+        for message in CRISIS_RECALL_SET + CRISIS_SAFE_SET:
+            with self.subTest(message=message):
+                expected = CRISIS_DETECTOR.is_crisis(message)
+                self.assertEqual(detect_crisis(message), expected)
+                self.assertEqual(safety.is_crisis_message(message), expected)
+                self.assertEqual(bot.classify_intent(message) == 'emergency', expected)
+
+    def test_misspelling_lookups_are_bounded(self):
+        detector = CrisisDetector(max_fuzzy_words=32)
+        rng = random.Random(3)
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(1000)]
+        # Past the budget only exact words count, so the crisis at the end is still found
+        self.assertTrue(detector.is_crisis(" ".join(words) + " kill myself"))
+        self.assertEqual(len(detector._cache), 32)
+
+    def test_well_under_a_millisecond(self):
+        messages = CRISIS_RECALL_SET + CRISIS_SAFE_SET
+        for message in messages:
+            CRISIS_DETECTOR.find(message)
+        start = time.perf_counter()
+        for _ in range(10):
+            for message in messages:
+                CRISIS_DETECTOR.find(message)
+        per_message = (time.perf_counter() - start) / (10 * len(messages))
+        self.assertLess(per_message, 0.001)
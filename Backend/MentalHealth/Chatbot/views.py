@@ -4,6 +4,8 @@ import json
 from groq import Groq
 from django.conf import settings
 
+from .crisis import CRISIS_DETECTOR
+
 client = Groq(api_key=settings.GROQ_API_KEY)
 
 # --------------------------
@@ -23,14 +25,9 @@ Guidelines:
 - If user expresses self-harm thoughts, respond with empathy and suggest crisis support immediately.
 """
 
-CRISIS_KEYWORDS = [
-    "suicide", "kill myself", "end my life", "want to die",
-    "hurt myself", "can't live", "end everything"
-]
-
 def detect_crisis(text):
-    t = text.lower()
-    return any(word in t for word in CRISIS_KEYWORDS)
+    # Shared with SafetyHandler and the Extra chatbot; tolerates misspellings
+    return CRISIS_DETECTOR.is_crisis(text)
 
 
 # --------------------------
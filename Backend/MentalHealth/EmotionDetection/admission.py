@@ -0,0 +1,154 @@
+"""
+Admission control for CPU-bound inference.
+
+At most EMOTION_MAX_CONCURRENCY requests run inference at once and at most
+EMOTION_MAX_QUEUE more wait for a slot. Anything beyond that is rejected
+straight away (the views answer 429 with Retry-After), so a traffic spike
+cannot tie up every worker thread and slow down unrelated endpoints.
+
+Queue-wait and service-time samples are kept for /emotion/metrics/ so the
+limits can be sized from real numbers.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+
+class InferenceRejected(Exception):
+    """Inference capacity is exhausted; the client should retry after retry_after seconds"""
+
+    def __init__(self, retry_after, message=None):
+        super().__init__(message or f"Inference capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LatencyWindow:
+    """The most recent latency samples, in seconds"""
+
+    def __init__(self, size=1024):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        samples = np.array(self._samples)
+        if not samples.size:
+            return {"count": self.count}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean() * 1000, 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(samples.max()) * 1000, 2),
+        }
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_wait = LatencyWindow()
+        self.service_time = LatencyWindow()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the recent average service time"""
+        backlog = (self.waiting + self.running) / self.max_concurrency
+        return max(1, math.ceil(backlog * self.service_time.mean()))
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise InferenceRejected(self.retry_after())
+
+    @contextmanager
+    def admit(self):
+        """Hold an inference slot for the duration of the with-block, or raise InferenceRejected"""
+        with self._lock:
+            queue_full = self.waiting >= self.max_queue
+            if not queue_full:
+                self.waiting += 1
+        if queue_full:
+            # Still allowed in if a slot happens to be free right now
+            if not self._slots.acquire(blocking=False):
+                self._reject()
+            queued_for = 0.0
+        else:
+            started = time.monotonic()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                self._reject()
+            queued_for = time.monotonic() - started
+
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+            self.queue_wait.add(queued_for)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.running -= 1
+                self.service_time.add(elapsed)
+            self._slots.release()
+
+    def run(self, fn, *args, **kwargs):
+        with self.admit():
+            return fn(*args, **kwargs)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.summary(),
+            "service_time": self.service_time.summary(),
+        }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    settings.EMOTION_MAX_CONCURRENCY,
+                    settings.EMOTION_MAX_QUEUE,
+                    settings.EMOTION_QUEUE_TIMEOUT,
+                )
+    return _controller
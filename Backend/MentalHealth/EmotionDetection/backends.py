@@ -0,0 +1,116 @@
+"""
+Inference backends for the text emotion classifier.
+
+    pytorch    - transformers pipeline in fp32 (default)
+    onnx       - the same graph exported to ONNX, run with ONNX Runtime
+    onnx-int8  - the ONNX graph with dynamic int8 quantisation
+    stub       - tiny deterministic NumPy stand-in for benchmarks and CI
+
+The ONNX files are produced by `manage.py export_emotion_onnx` into
+settings.EMOTION_ONNX_DIR. ONNX backends return exactly what the pipeline
+returns, so callers do not care which one is active.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pytorch", "onnx", "onnx-int8", "stub")
+
+ONNX_FILENAMES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx",
+}
+
+
+def onnx_model_path(backend, export_dir=None):
+    return os.path.join(export_dir or settings.EMOTION_ONNX_DIR, ONNX_FILENAMES[backend])
+
+
+class OnnxTextClassifier:
+    """Drop-in replacement for a text-classification pipeline backed by ONNX Runtime"""
+
+    def __init__(self, model_path, tokenizer_dir, max_length=512):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImproperlyConfigured("The ONNX emotion backends need the 'onnxruntime' package")
+        from transformers import AutoTokenizer
+
+        if not os.path.exists(model_path):
+            raise ImproperlyConfigured(
+                f"{model_path} not found - run 'manage.py export_emotion_onnx' first"
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+        self.max_length = max_length
+        self.model_path = model_path
+
+        with open(os.path.join(tokenizer_dir, "config.json")) as f:
+            id2label = json.load(f)["id2label"]
+        self.labels = [id2label[str(i)] for i in range(len(id2label))]
+
+    def memory_bytes(self):
+        return os.path.getsize(self.model_path)
+
+    def predict_proba(self, texts, batch_size=None):
+        """Softmax probabilities, shape (len(texts), n_labels)"""
+        batch_size = batch_size or len(texts) or 1
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            logits = self.session.run(None, feed)[0]
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            chunks.append(exp / exp.sum(axis=1, keepdims=True))
+        if not chunks:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.concatenate(chunks, axis=0)
+
+    def __call__(self, inputs, batch_size=None, top_k=1, **kwargs):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        probs = self.predict_proba(texts, batch_size=batch_size)
+
+        outputs = []
+        for row in probs:
+            ranked = np.argsort(-row)
+            if top_k is not None:
+                ranked = ranked[:top_k]
+            outputs.append([{"label": self.labels[i], "score": float(row[i])} for i in ranked])
+
+        # Same shapes as transformers' TextClassificationPipeline
+        if top_k == 1:
+            return outputs[0] if single else [output[0] for output in outputs]
+        return outputs[0] if single else outputs
+
+
+def load_text_classifier(backend, model_name):
+    """Build the text-classification callable for the chosen backend"""
+    if backend == "pytorch":
+        from transformers import pipeline
+        return pipeline("text-classification", model=model_name)
+    if backend in ONNX_FILENAMES:
+        return OnnxTextClassifier(onnx_model_path(backend), settings.EMOTION_ONNX_DIR)
+    if backend == "stub":
+        from .stub_model import StubTextClassifier
+        return StubTextClassifier()
+    raise ImproperlyConfigured(f"Unknown EMOTION_BACKEND '{backend}', expected one of {BACKENDS}")
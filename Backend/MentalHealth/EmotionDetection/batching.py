@@ -0,0 +1,106 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent callers each submit one text. A single worker thread collects them
+into batches (up to max_batch_size, waiting at most max_wait_ms for the batch
+to fill), runs one padded forward pass per batch and hands every result back
+to the caller that submitted it.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    def __init__(self, predict_batch, max_batch_size=16, max_wait_ms=5, name="micro-batcher"):
+        """
+        Args:
+            predict_batch: callable taking a list of texts and returning a
+                list of results in the same order
+            max_batch_size: largest batch sent to predict_batch
+            max_wait_ms: how long the first request in a batch may wait for
+                others to join it
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+        # Simple counters, useful to check the batches actually fill up
+        self.batches_run = 0
+        self.items_processed = 0
+
+    def submit(self, text):
+        """Queue one text and return a Future for its result"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def predict(self, text, timeout=None):
+        """Blocking helper: submit one text and wait for its result"""
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "batches_run": self.batches_run,
+            "items_processed": self.items_processed,
+            "average_batch_size": (
+                round(self.items_processed / self.batches_run, 2) if self.batches_run else 0
+            ),
+            "queued": self._queue.qsize(),
+        }
+
+    def _ensure_worker(self):
+        # The worker is started lazily, and restarted after a fork
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Drop requests whose caller already gave up
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                results = self.predict_batch(texts)
+                if len(results) != len(texts):
+                    raise RuntimeError(f"Expected {len(texts)} results, got {len(results)}")
+            except Exception as e:
+                logger.error(f"Batch of {len(texts)} failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_processed += len(texts)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,193 @@
+"""
+Latency / throughput benchmark for text emotion inference.
+
+Each target is driven with freshly generated texts (so the result cache never
+answers) for every combination of micro-batch size, text length and client
+thread count. Run it through `manage.py benchmark_inference`; with the "stub"
+backend it needs no model download and is deterministic enough for CI.
+"""
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from . import admission, inference
+
+TARGETS = ("detect_text_emotion", "emotion_view", "calculate_user_score")
+
+# Words per text; "long" spans several 510-token windows
+TEXT_LENGTHS = {"short": 12, "medium": 80, "long": 1200}
+
+_VOCABULARY = (
+    "i feel tired today and my head hurts but my friends helped me smile again "
+    "work was stressful exam tomorrow worried about money lonely at night happy "
+    "to see my family proud of myself cannot sleep anxious angry about everything "
+    "calm walk in the park grateful for small things hopeless some days better now"
+).split()
+
+
+def make_texts(count, words, seed):
+    """count distinct pseudo-sentences of the given word count, the same for the same seed"""
+    rng = random.Random(seed)
+    texts = []
+    for index in range(count):
+        body = " ".join(rng.choice(_VOCABULARY) for _ in range(words - 1))
+        # The counter keeps every text distinct, so the result cache never answers
+        texts.append(f"{body} {index}.")
+    return texts
+
+
+def _target_callable(target):
+    if target == "detect_text_emotion":
+        from api.views import detect_text_emotion
+        return detect_text_emotion
+
+    if target == "emotion_view":
+        from .views import detect_emotion
+        factory = RequestFactory()
+
+        def call(text):
+            request = factory.post('/emotion/data/', data=json.dumps({"text": text}),
+                                   content_type='application/json')
+            response = detect_emotion(request)
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+        return call
+
+    if target == "calculate_user_score":
+        from api.models import Assessment, CustomUser
+        from api.views import calculate_user_score
+        user = CustomUser(username="benchmark@example.com", email="benchmark@example.com")
+
+        def call(text):
+            # Unsaved objects: the benchmark measures scoring, not the database
+            assessment = Assessment(user=user, mood="low", sleep_quality="fair", expression_analysis=text)
+            return calculate_user_score(assessment)
+        return call
+
+    raise ValueError(f"Unknown benchmark target '{target}', expected one of {TARGETS}")
+
+
+@contextlib.contextmanager
+def inference_settings(backend, batch_size):
+    """Fresh inference singletons for one configuration, restored afterwards"""
+    saved = (inference._batcher, inference._result_cache, inference._service_client, admission._controller)
+    inference._batcher = None
+    inference._result_cache = None
+    inference._service_client = None
+    admission._controller = None
+    try:
+        with override_settings(
+            EMOTION_BACKEND=backend,
+            EMOTION_BATCHING=batch_size > 1,
+            EMOTION_BATCH_MAX_SIZE=batch_size,
+            EMOTION_CACHE_BACKEND="none",
+            EMOTION_SERVICE_SOCKET="",
+        ):
+            yield
+    finally:
+        inference._batcher, inference._result_cache, inference._service_client, admission._controller = saved
+
+
+def measure(call, texts, threads):
+    """Per-call latencies in seconds, wall time and error count for texts sent from `threads` threads"""
+    def timed(text):
+        started = time.perf_counter()
+        try:
+            call(text)
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(timed, texts))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    return latencies, wall, sum(1 for _, ok in outcomes if not ok)
+
+
+def summarize(latencies, wall, errors):
+    summary = {"requests": len(latencies) + errors, "errors": errors}
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        summary.update({
+            "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+        })
+    summary["throughput_rps"] = round(len(latencies) / wall, 2) if wall > 0 else None
+    return summary
+
+
+def environment(backend):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "backend": backend,
+        "model": settings.EMOTION_MODEL,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_suite(backend, targets=TARGETS, batch_sizes=(1, 8), lengths=("short", "medium", "long"),
+              thread_counts=(1, 4), requests=50, warmup=3, seed=0, progress=None):
+    """Run every configuration and return the JSON-ready report"""
+    results = []
+    for batch_size in batch_sizes:
+        with inference_settings(backend, batch_size):
+            # Load the model before anything is timed
+            inference.warmup()
+            for target in targets:
+                call = _target_callable(target)
+                for length in lengths:
+                    words = TEXT_LENGTHS[length]
+                    for threads in thread_counts:
+                        texts = make_texts(warmup + requests, words, seed=f"{seed}:{target}:{length}:{threads}:{batch_size}")
+                        # Output from the scoring code's print() calls is not part of what we measure
+                        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                            measure(call, texts[:warmup], threads)
+                            latencies, wall, errors = measure(call, texts[warmup:], threads)
+
+                        row = {
+                            "target": target,
+                            "batch_size": batch_size,
+                            "text_length": length,
+                            "words": words,
+                            "threads": threads,
+                            **summarize(latencies, wall, errors),
+                        }
+                        results.append(row)
+                        if progress:
+                            progress(row)
+    return {"environment": environment(backend), "results": results}
+
+
+def compare(baseline, current):
+    """(row key, baseline row, current row) for configurations present in both reports"""
+    def key(row):
+        return (row["target"], row["batch_size"], row["text_length"], row["threads"])
+
+    previous = {key(row): row for row in baseline["results"]}
+    return [(key(row), previous[key(row)], row) for row in current["results"] if key(row) in previous]
@@ -0,0 +1,134 @@
+"""
+Content-addressed cache for emotion results.
+
+Keys are a SHA-256 of the normalised text plus the model version, so the same
+text never runs through the model twice and switching models never serves
+stale results. Two backends are available:
+
+    memory - per-process LRU dict with a TTL (default)
+    django - Django's cache framework, shared between workers
+"""
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def normalize_text(text):
+    # Case is kept on purpose: the model is cased, so "SAD" and "sad" can score differently
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text, model_version):
+    digest = hashlib.sha256()
+    digest.update(model_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return f"emotion:{digest.hexdigest()}"
+
+
+class BaseResultCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+        }
+
+
+class MemoryResultCache(BaseResultCache):
+    backend_name = "memory"
+
+    def __init__(self, max_entries, ttl):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        data = super().stats()
+        data["entries"] = len(self._entries)
+        data["max_entries"] = self.max_entries
+        return data
+
+
+class DjangoResultCache(BaseResultCache):
+    """Size bounds and eviction are up to the configured Django cache (e.g. MAX_ENTRIES)"""
+
+    backend_name = "django"
+
+    def __init__(self, alias, ttl):
+        super().__init__(ttl)
+        self.alias = alias
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def _get(self, key):
+        return self._cache.get(key)
+
+    def _set(self, key, value):
+        self._cache.set(key, value, timeout=self.ttl or None)
+
+    def clear(self):
+        self._cache.clear()
+
+
+def build_result_cache():
+    backend = settings.EMOTION_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryResultCache(settings.EMOTION_CACHE_MAX_ENTRIES, settings.EMOTION_CACHE_TTL)
+    if backend == "django":
+        return DjangoResultCache(settings.EMOTION_CACHE_ALIAS, settings.EMOTION_CACHE_TTL)
+    if backend in ("", "none", None):
+        return None
+    raise ValueError(f"Unknown EMOTION_CACHE_BACKEND: {backend}")
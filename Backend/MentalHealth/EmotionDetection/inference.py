@@ -0,0 +1,188 @@
+"""
+Single entry point for text emotion inference.
+
+Views and scoring code call classify() / classify_batch() instead of touching
+the pipeline directly, so caching, batching and other optimisations live in
+one place. When EMOTION_SERVICE_SOCKET is set, texts are sent to the shared
+inference service (see service.py) and only run in this process if the
+service cannot be reached. Model work (not cache hits) is admitted through
+the AdmissionController, which raises InferenceRejected when it is saturated.
+
+Every result is a list of {"label": ..., "score": ...} dicts covering all
+labels, sorted best first.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from .admission import get_admission_controller
+from .batching import MicroBatcher
+from .cache import build_result_cache, cache_key
+from .registry import get_emotion_pipeline
+from .service import InferenceClient, ServiceUnavailable, service_authkey
+
+logger = logging.getLogger(__name__)
+
+_batcher = None
+_result_cache = None
+_service_client = None
+_lock = threading.Lock()
+
+
+def model_version():
+    """Identifies the model producing results; part of every cache key"""
+    return f"{settings.EMOTION_MODEL}:{settings.EMOTION_BACKEND}"
+
+
+def predict_batch(texts):
+    """Run one padded forward pass over a list of texts"""
+    texts = list(texts)
+    if not texts:
+        return []
+    # Every label is returned, best first, so result[0] is still the primary emotion
+    outputs = get_emotion_pipeline()(texts, batch_size=len(texts), top_k=None, truncation=True)
+    return [output if isinstance(output, list) else [output] for output in outputs]
+
+
+def warmup():
+    """
+    Load the emotion model and run one tiny inference.
+
+    Nothing ML-related is imported or loaded until the first request needs it;
+    web workers that want to pay that cost up front call this at startup
+    (see EMOTION_WARMUP in settings).
+    """
+    predict_batch(["Warming up the emotion model."])
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    predict_batch,
+                    max_batch_size=settings.EMOTION_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.EMOTION_BATCH_MAX_WAIT_MS,
+                    name="emotion-batcher",
+                )
+    return _batcher
+
+
+def get_result_cache():
+    """The configured result cache, or None when caching is switched off"""
+    global _result_cache
+    if _result_cache is None:
+        with _lock:
+            if _result_cache is None:
+                _result_cache = build_result_cache() or False
+    return _result_cache or None
+
+
+def get_service_client():
+    """Client for the inference service, or None when no service is configured"""
+    global _service_client
+    if not settings.EMOTION_SERVICE_SOCKET:
+        return None
+    if _service_client is None:
+        with _lock:
+            if _service_client is None:
+                _service_client = InferenceClient(
+                    settings.EMOTION_SERVICE_SOCKET,
+                    service_authkey(),
+                    timeout=settings.EMOTION_SERVICE_TIMEOUT,
+                    retry_seconds=settings.EMOTION_SERVICE_RETRY_SECONDS,
+                )
+    return _service_client
+
+
+def _run_remote(texts):
+    """Results from the inference service, or None if it is down"""
+    client = get_service_client()
+    if client is None:
+        return None
+    try:
+        return client.classify_batch(texts)
+    except ServiceUnavailable as e:
+        logger.warning(f"Inference service unavailable, running in-process: {str(e)}")
+        return None
+
+
+def _run_uncached(texts, bucket_size):
+    with get_admission_controller().admit():
+        return _run_uncached_admitted(list(texts), bucket_size)
+
+
+def _run_uncached_admitted(texts, bucket_size):
+    remote = _run_remote(texts)
+    if remote is not None:
+        return remote
+
+    bucket_size = bucket_size or settings.EMOTION_BATCH_MAX_SIZE
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+    results = [None] * len(texts)
+    for start in range(0, len(order), bucket_size):
+        bucket = order[start:start + bucket_size]
+        outputs = predict_batch([texts[i] for i in bucket])
+        for i, output in zip(bucket, outputs):
+            results[i] = output
+    return results
+
+
+def classify(text):
+    """Emotion result for one text, batched with concurrent callers when enabled"""
+    cache = get_result_cache()
+    if cache is not None:
+        key = cache_key(text, model_version())
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    with get_admission_controller().admit():
+        remote = _run_remote([text])
+        if remote is not None:
+            result = remote[0]
+        elif settings.EMOTION_BATCHING:
+            result = get_batcher().predict(text)
+        else:
+            result = predict_batch([text])[0]
+
+    if cache is not None:
+        cache.set(key, result)
+    return result
+
+
+def classify_batch(texts, bucket_size=None):
+    """
+    Emotion results for several texts in one call.
+
+    Cached texts are answered straight away. The rest are sorted by length and
+    cut into buckets of similar length, so each padded forward pass wastes as
+    little work on padding as possible. Results come back in the original order.
+    """
+    texts = list(texts)
+    cache = get_result_cache()
+    if cache is None:
+        return _run_uncached(texts, bucket_size)
+
+    version = model_version()
+    keys = [cache_key(text, version) for text in texts]
+    results = [cache.get(key) for key in keys]
+
+    # Each distinct missing key only goes through the model once
+    missing = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], i)
+
+    if missing:
+        indices = list(missing.values())
+        outputs = _run_uncached([texts[i] for i in indices], bucket_size)
+        computed = {}
+        for i, output in zip(indices, outputs):
+            cache.set(keys[i], output)
+            computed[keys[i]] = output
+        results = [result if result is not None else computed[key] for key, result in zip(keys, results)]
+    return results
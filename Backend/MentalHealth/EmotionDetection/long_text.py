@@ -0,0 +1,147 @@
+"""
+Emotion analysis for texts longer than the model's context window.
+
+The text is cut into overlapping token windows. The windows are classified
+in batches and their probability vectors are averaged, weighted by window
+length. Very long inputs are tokenized one character segment at a time and
+windows go through the model a group at a time, so memory stays bounded
+however long the text is.
+"""
+import itertools
+
+import numpy as np
+from django.conf import settings
+
+from .inference import classify, classify_batch
+from .registry import get_emotion_tokenizer
+
+
+def _segments(text, segment_chars):
+    """Split text into pieces of at most segment_chars, preferably at whitespace"""
+    start = 0
+    while start < len(text):
+        end = min(start + segment_chars, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + segment_chars // 2, end)
+            if cut != -1:
+                end = cut
+        yield start, end
+        start = end
+
+
+def iter_windows(text, tokenizer, window_tokens, stride_tokens, segment_chars=50_000):
+    """
+    Yield (chunk_text, token_count) for overlapping windows over text.
+
+    Consecutive windows share stride_tokens tokens. Windows never cross a
+    segment boundary.
+    """
+    step = max(1, window_tokens - stride_tokens)
+    for seg_start, seg_end in _segments(text, segment_chars):
+        offsets = tokenizer(
+            text[seg_start:seg_end],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+        )["offset_mapping"]
+        if not offsets:
+            continue
+
+        start = 0
+        while True:
+            end = min(start + window_tokens, len(offsets))
+            chunk = text[seg_start + offsets[start][0]:seg_start + offsets[end - 1][1]]
+            yield chunk, end - start
+            if end == len(offsets):
+                break
+            start += step
+
+
+class EmotionAccumulator:
+    """Running length-weighted mean of all-label emotion results"""
+
+    def __init__(self):
+        self.labels = None
+        self.total = None
+        self.total_weight = 0.0
+
+    def add(self, result, weight):
+        if self.labels is None:
+            self.labels = sorted(item["label"] for item in result)
+            self.total = np.zeros(len(self.labels))
+        scores = {item["label"]: item["score"] for item in result}
+        self.total += weight * np.array([scores.get(label, 0.0) for label in self.labels])
+        self.total_weight += weight
+
+    def result(self):
+        """The mean as a pipeline-style result, best label first"""
+        mean = self.total / self.total_weight
+        order = np.argsort(-mean)
+        return [{"label": self.labels[i], "score": float(mean[i])} for i in order]
+
+
+def analyze_text(text):
+    """
+    Emotion result for a text of any length.
+
+    Returns a list of {"label", "score"} for every label, best first.
+    Texts that fit in one window take the normal single-text path.
+    """
+    tokenizer = get_emotion_tokenizer()
+    windows = iter_windows(
+        text,
+        tokenizer,
+        window_tokens=settings.EMOTION_WINDOW_TOKENS,
+        stride_tokens=settings.EMOTION_WINDOW_OVERLAP,
+    )
+
+    first = next(windows, None)
+    second = next(windows, None)
+    if second is None:
+        return classify(text)
+
+    group_size = settings.EMOTION_LONG_TEXT_GROUP_SIZE
+    accumulator = EmotionAccumulator()
+
+    def flush(group):
+        results = classify_batch([chunk for chunk, _ in group])
+        for result, (_, token_count) in zip(results, group):
+            accumulator.add(result, token_count)
+
+    group = []
+    for window in itertools.chain([first, second], windows):
+        group.append(window)
+        if len(group) >= group_size:
+            flush(group)
+            group = []
+    if group:
+        flush(group)
+
+    return accumulator.result()
+
+
+def analyze_texts(texts):
+    """
+    analyze_text for many texts. Texts that fit in one window go through the
+    model together in one classify_batch call; longer texts are windowed one
+    by one.
+    """
+    texts = list(texts)
+    tokenizer = get_emotion_tokenizer()
+    results = [None] * len(texts)
+    single_window = []
+    for i, text in enumerate(texts):
+        windows = iter_windows(
+            text,
+            tokenizer,
+            window_tokens=settings.EMOTION_WINDOW_TOKENS,
+            stride_tokens=settings.EMOTION_WINDOW_OVERLAP,
+        )
+        next(windows, None)
+        if next(windows, None) is None:
+            single_window.append(i)
+        else:
+            results[i] = analyze_text(text)
+
+    for i, result in zip(single_window, classify_batch([texts[i] for i in single_window])):
+        results[i] = result
+    return results
@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from EmotionDetection.benchmark import TARGETS, TEXT_LENGTHS, compare, run_suite
+
+
+def _csv(value, cast=str):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = "Benchmark emotion inference latency (p50/p95/p99) and throughput; writes JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=("stub", "real"), default="stub",
+                            help="'stub' runs the offline stand-in model, 'real' uses EMOTION_BACKEND")
+        parser.add_argument("--targets", default=",".join(TARGETS))
+        parser.add_argument("--batch-sizes", default="1,8", help="Micro-batch sizes (1 = batching off)")
+        parser.add_argument("--lengths", default=",".join(TEXT_LENGTHS), help=f"Any of {', '.join(TEXT_LENGTHS)}")
+        parser.add_argument("--threads", default="1,4", help="Concurrent client thread counts")
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per configuration")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per configuration")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+        parser.add_argument("--compare", help="Earlier JSON report to print p95/throughput changes against")
+
+    def handle(self, *args, **options):
+        targets = _csv(options["targets"])
+        lengths = _csv(options["lengths"])
+        unknown = [t for t in targets if t not in TARGETS] + [l for l in lengths if l not in TEXT_LENGTHS]
+        if unknown:
+            raise CommandError(f"Unknown targets/lengths: {', '.join(unknown)}")
+
+        backend = "stub" if options["model"] == "stub" else settings.EMOTION_BACKEND
+        if backend == "stub" and options["model"] == "real":
+            raise CommandError("EMOTION_BACKEND is 'stub'; set a real backend for --model real")
+
+        def progress(row):
+            self.stderr.write(
+                f"{row['target']:<22} batch={row['batch_size']:<3} {row['text_length']:<6} "
+                f"threads={row['threads']:<3} p50={row.get('p50_ms', '-')}ms p95={row.get('p95_ms', '-')}ms "
+                f"p99={row.get('p99_ms', '-')}ms {row['throughput_rps']} req/s errors={row['errors']}"
+            )
+
+        report = run_suite(
+            backend,
+            targets=targets,
+            batch_sizes=_csv(options["batch_sizes"], int),
+            lengths=lengths,
+            thread_counts=_csv(options["threads"], int),
+            requests=options["requests"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+            progress=progress,
+        )
+
+        body = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(body + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(report['results'])} results to {options['output']}"))
+        else:
+            self.stdout.write(body)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            for key, before, after in compare(baseline, report):
+                if "p95_ms" not in before or "p95_ms" not in after:
+                    continue
+                p95 = (after["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+                self.stderr.write(
+                    f"{' '.join(map(str, key)):<40} p95 {before['p95_ms']} -> {after['p95_ms']}ms ({p95:+.1f}%), "
+                    f"{before['throughput_rps']} -> {after['throughput_rps']} req/s"
+                )
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from EmotionDetection.backends import BACKENDS, load_text_classifier
+from EmotionDetection.parity import compare_backends, load_corpus, within_tolerance
+
+
+class Command(BaseCommand):
+    help = "Compare an emotion backend against the PyTorch reference on a fixture corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=BACKENDS, default="onnx-int8")
+        parser.add_argument("--corpus", help="JSON list of texts (defaults to the bundled fixture)")
+        parser.add_argument("--min-agreement", type=float, default=0.95,
+                            help="Minimum share of texts with the same top label")
+        parser.add_argument("--max-drift", type=float, default=0.10,
+                            help="Maximum absolute difference of any label score")
+
+    def handle(self, *args, **options):
+        texts = load_corpus(options["corpus"])
+        model_name = settings.EMOTION_MODEL
+
+        reference = load_text_classifier("pytorch", model_name)
+        candidate = load_text_classifier(options["backend"], model_name)
+        report = compare_backends(reference, candidate, texts)
+
+        self.stdout.write(
+            f"{options['backend']} vs pytorch on {report['texts']} texts: "
+            f"label agreement {report['label_agreement']:.1%}, "
+            f"max score drift {report['max_score_drift']:.4f}, "
+            f"mean score drift {report['mean_score_drift']:.4f}"
+        )
+        for item in report["disagreements"]:
+            self.stdout.write(f"  '{item['text']}': {item['reference']} -> {item['candidate']}")
+
+        if not within_tolerance(report, options["min_agreement"], options["max_drift"]):
+            raise CommandError(
+                f"Parity check failed (need agreement >= {options['min_agreement']:.0%} "
+                f"and drift <= {options['max_drift']})"
+            )
+        self.stdout.write(self.style.SUCCESS("Parity check passed"))
@@ -0,0 +1,72 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from EmotionDetection.backends import onnx_model_path
+
+
+class Command(BaseCommand):
+    help = "Export the emotion model to ONNX, quantize it to int8 and check parity with PyTorch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output-dir", default=settings.EMOTION_ONNX_DIR)
+        parser.add_argument("--opset", type=int, default=17)
+        parser.add_argument("--skip-quantize", action="store_true")
+        parser.add_argument("--skip-check", action="store_true")
+
+    def handle(self, *args, **options):
+        try:
+            import torch
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        except ImportError as e:
+            raise CommandError(f"Exporting needs torch, transformers, onnx and onnxruntime: {e}")
+
+        output_dir = options["output_dir"]
+        os.makedirs(output_dir, exist_ok=True)
+        model_name = settings.EMOTION_MODEL
+
+        self.stdout.write(f"Loading {model_name}...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+
+        # Tokenizer files and config.json (for id2label) sit next to the graph
+        tokenizer.save_pretrained(output_dir)
+        model.config.save_pretrained(output_dir)
+
+        fp32_path = onnx_model_path("onnx", output_dir)
+        sample = tokenizer(["I feel a little tired today"], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=options["opset"],
+                dynamo=False,
+            )
+        self.stdout.write(f"Exported {fp32_path} ({os.path.getsize(fp32_path) / 2**20:.1f} MiB)")
+
+        backends = ["onnx"]
+        if not options["skip_quantize"]:
+            int8_path = onnx_model_path("onnx-int8", output_dir)
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+            self.stdout.write(f"Quantized {int8_path} ({os.path.getsize(int8_path) / 2**20:.1f} MiB)")
+            backends.append("onnx-int8")
+
+        if options["skip_check"]:
+            return
+        if output_dir != settings.EMOTION_ONNX_DIR:
+            self.stdout.write("Skipping parity check: output dir is not EMOTION_ONNX_DIR")
+            return
+        for backend in backends:
+            call_command("check_emotion_parity", backend=backend, stdout=self.stdout)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from EmotionDetection import inference
+from EmotionDetection.service import InferenceServer, service_authkey
+
+
+class Command(BaseCommand):
+    help = "Run the shared emotion inference service that web workers connect to over a UNIX socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.EMOTION_SERVICE_SOCKET,
+                            help="UNIX socket path (defaults to EMOTION_SERVICE_SOCKET)")
+        parser.add_argument("--max-batch-size", type=int, default=settings.EMOTION_BATCH_MAX_SIZE)
+        parser.add_argument("--max-wait-ms", type=float, default=settings.EMOTION_BATCH_MAX_WAIT_MS)
+        parser.add_argument("--max-pending", type=int, default=settings.EMOTION_SERVICE_MAX_PENDING,
+                            help="Texts allowed in flight before clients are told to back off")
+
+    def handle(self, *args, **options):
+        if not options["socket"]:
+            raise CommandError("Set EMOTION_SERVICE_SOCKET or pass --socket")
+
+        self.stdout.write("Loading emotion model...")
+        inference.warmup()
+
+        server = InferenceServer(
+            options["socket"],
+            service_authkey(),
+            # The service always runs the model itself, never through another service
+            inference.predict_batch,
+            max_batch_size=options["max_batch_size"],
+            max_wait_ms=options["max_wait_ms"],
+            max_pending=options["max_pending"],
+        )
+        server.start()
+        self.stdout.write(self.style.SUCCESS(f"Inference service listening on {options['socket']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
@@ -0,0 +1,60 @@
+"""
+Parity check between two emotion backends.
+
+Runs both over a fixture corpus and reports how often they agree on the top
+label and how far their per-label probabilities drift apart.
+"""
+import json
+import os
+
+import numpy as np
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "emotion_parity_corpus.json")
+
+
+def load_corpus(path=None):
+    with open(path or DEFAULT_CORPUS) as f:
+        return json.load(f)
+
+
+def probability_matrix(classifier, texts, labels=None, batch_size=16):
+    """
+    Run classifier over texts with every label returned.
+
+    Returns (labels, probs) where probs[i, j] is the score of labels[j] for texts[i].
+    """
+    rows = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        outputs = classifier(batch, batch_size=len(batch), top_k=None)
+        for output in outputs:
+            scores = {item["label"]: float(item["score"]) for item in output}
+            if labels is None:
+                labels = sorted(scores)
+            rows.append([scores.get(label, 0.0) for label in labels])
+    return labels, np.array(rows, dtype=np.float64)
+
+
+def compare_backends(reference, candidate, texts, batch_size=16):
+    labels, ref = probability_matrix(reference, texts, batch_size=batch_size)
+    _, cand = probability_matrix(candidate, texts, labels=labels, batch_size=batch_size)
+
+    ref_top = ref.argmax(axis=1)
+    cand_top = cand.argmax(axis=1)
+    drift = np.abs(ref - cand)
+
+    disagreements = [
+        {"text": texts[i], "reference": labels[ref_top[i]], "candidate": labels[cand_top[i]]}
+        for i in np.flatnonzero(ref_top != cand_top)
+    ]
+    return {
+        "texts": len(texts),
+        "label_agreement": float((ref_top == cand_top).mean()) if len(texts) else 1.0,
+        "max_score_drift": float(drift.max()) if drift.size else 0.0,
+        "mean_score_drift": float(drift.mean()) if drift.size else 0.0,
+        "disagreements": disagreements,
+    }
+
+
+def within_tolerance(report, min_agreement, max_drift):
+    return report["label_agreement"] >= min_agreement and report["max_score_drift"] <= max_drift
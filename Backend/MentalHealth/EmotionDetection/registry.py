@@ -0,0 +1,98 @@
+"""
+Process-wide model registry.
+
+Every model is loaded once per process, the first time somebody asks for it,
+and all callers (api.views, EmotionDetection.views, ...) share the same handle.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from .backends import ONNX_FILENAMES, load_text_classifier
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Return the model registered under key, calling loader() on first use"""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(key)
+            if model is None:
+                logger.info(f"Loading model '{key}'")
+                model = loader()
+                self._models[key] = model
+                logger.info(f"Model '{key}' loaded ({_model_bytes(model) / 2**20:.1f} MiB)")
+        return model
+
+    def is_loaded(self, key):
+        return key in self._models
+
+    def memory_report(self):
+        """Bytes held by the weights and buffers of every loaded model"""
+        models = {key: _model_bytes(model) for key, model in self._models.items()}
+        return {
+            "models": models,
+            "total_bytes": sum(models.values()),
+        }
+
+
+def _model_bytes(model):
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes()
+    # HF pipelines keep the torch module on `.model`
+    module = getattr(model, "model", model)
+    total = 0
+    for tensors in (getattr(module, "parameters", None), getattr(module, "buffers", None)):
+        if tensors is None:
+            continue
+        total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+
+# Single instance shared by the whole process
+registry = ModelRegistry()
+
+
+def get_emotion_pipeline():
+    """Shared text-classification pipeline for the emotion model, on the configured backend"""
+    backend = settings.EMOTION_BACKEND
+    model_name = settings.EMOTION_MODEL
+    return registry.get(
+        f"text-classification:{model_name}:{backend}",
+        lambda: load_text_classifier(backend, model_name),
+    )
+
+
+def get_emotion_tokenizer():
+    """
+    Tokenizer of the emotion model.
+
+    Reuses the loaded pipeline's tokenizer when there is one, otherwise loads
+    only the tokenizer (a few MB) - workers that send inference to the
+    out-of-process service never need the weights.
+    """
+    backend = settings.EMOTION_BACKEND
+    model_name = settings.EMOTION_MODEL
+    if registry.is_loaded(f"text-classification:{model_name}:{backend}"):
+        return get_emotion_pipeline().tokenizer
+
+    def load():
+        if backend == "stub":
+            from .stub_model import StubTokenizer
+            return StubTokenizer()
+        from transformers import AutoTokenizer
+        source = settings.EMOTION_ONNX_DIR if backend in ONNX_FILENAMES else model_name
+        return AutoTokenizer.from_pretrained(source)
+
+    return registry.get(f"tokenizer:{model_name}:{backend}", load)
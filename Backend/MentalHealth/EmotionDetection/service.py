@@ -0,0 +1,187 @@
+"""
+Out-of-process inference service.
+
+`manage.py run_inference_service` starts one process that loads the emotion
+model once and serves every web worker on the box over a UNIX socket.
+Requests from all workers go through one MicroBatcher, so batching and
+backpressure happen centrally.
+
+Web workers talk to it through InferenceClient. inference.py falls back to
+in-process inference when the service cannot be reached.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from .admission import InferenceRejected
+from .batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailable(Exception):
+    """The service could not be reached or did not answer in time"""
+
+
+class ServiceBusy(InferenceRejected):
+    """The service is at capacity; try again after retry_after seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after, f"Inference service busy, retry after {retry_after}s")
+
+
+def service_authkey():
+    # Messages are pickled, so only processes that know the project secret may connect
+    return hashlib.sha256(f"emotion-service:{settings.SECRET_KEY}".encode()).digest()
+
+
+class InferenceServer:
+    def __init__(self, address, authkey, predict_batch, max_batch_size=16, max_wait_ms=5, max_pending=256):
+        self.address = address
+        self.authkey = authkey
+        self.max_pending = max_pending
+        self.batcher = MicroBatcher(
+            predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name="service-batcher"
+        )
+
+        self.pending = 0
+        self.requests_served = 0
+        self.requests_rejected = 0
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def start(self):
+        # A socket file left behind by a crashed service would make bind() fail
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        logger.info(f"Inference service listening on {self.address}")
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                # Listener closed by stop()
+                return
+            except Exception as e:
+                logger.warning(f"Rejected inference client: {str(e)}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "requests_served": self.requests_served,
+            "requests_rejected": self.requests_rejected,
+            "batching": self.batcher.stats(),
+        }
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._dispatch(op, payload))
+
+    def _dispatch(self, op, payload):
+        if op == "ping":
+            return ("ok", self.stats())
+        if op != "classify_batch":
+            return ("error", f"Unknown operation '{op}'")
+
+        texts = list(payload)
+        with self._lock:
+            if self.pending + len(texts) > self.max_pending:
+                self.requests_rejected += 1
+                # Rough guess: the queue drains one batch every few tens of milliseconds
+                return ("busy", 1)
+            self.pending += len(texts)
+
+        try:
+            futures = [self.batcher.submit(text) for text in texts]
+            results = [future.result() for future in futures]
+            self.requests_served += 1
+            return ("ok", results)
+        except Exception as e:
+            logger.error(f"Inference service request failed: {str(e)}")
+            return ("error", str(e))
+        finally:
+            with self._lock:
+                self.pending -= len(texts)
+
+
+class InferenceClient:
+    """
+    Thin client used by the web workers.
+
+    Each thread keeps its own connection. After a connection failure the
+    client reports the service as unavailable for retry_seconds instead of
+    trying to connect on every request.
+    """
+
+    def __init__(self, address, authkey, timeout=30, retry_seconds=5):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def classify_batch(self, texts):
+        return self._call("classify_batch", list(texts))
+
+    def ping(self):
+        return self._call("ping", None)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, op, payload):
+        if time.monotonic() < self._down_until:
+            raise ServiceUnavailable("Inference service marked down")
+
+        try:
+            conn = self._connection()
+            conn.send((op, payload))
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"No reply within {self.timeout}s")
+            status, body = conn.recv()
+        except Exception as e:
+            self._drop_connection()
+            self._down_until = time.monotonic() + self.retry_seconds
+            raise ServiceUnavailable(str(e)) from e
+
+        if status == "ok":
+            return body
+        if status == "busy":
+            raise ServiceBusy(body)
+        raise RuntimeError(f"Inference service error: {body}")
@@ -0,0 +1,77 @@
+"""
+Tiny deterministic stand-in for the emotion model (EMOTION_BACKEND="stub").
+
+It needs nothing beyond NumPy and no downloads, so benchmarks and CI can
+exercise the whole inference path offline. Like the real model it pads each
+batch to its longest text and masks the padding out, so a text scores the
+same alone or inside any batch, and the work per call grows with
+batch size times text length.
+"""
+import numpy as np
+
+LABELS = ("anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise")
+
+
+class StubTokenizer:
+    """One token per whitespace-separated word, with character offsets"""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True, **kwargs):
+        offsets, start = [], None
+        for i, ch in enumerate(text + " "):
+            if ch.isspace():
+                if start is not None:
+                    offsets.append((start, i))
+                    start = None
+            elif start is None:
+                start = i
+        return {"offset_mapping": offsets}
+
+
+class StubTextClassifier:
+    """Callable with the same signature and output shapes as a text-classification pipeline"""
+
+    labels = LABELS
+
+    def __init__(self, max_length=512):
+        self.tokenizer = StubTokenizer()
+        self.max_length = max_length
+        self.weights = np.arange(1, len(LABELS) + 1, dtype=np.float64)
+
+    def memory_bytes(self):
+        return self.weights.nbytes
+
+    def predict_proba(self, texts):
+        """Softmax probabilities, shape (len(texts), n_labels)"""
+        if not texts:
+            return np.zeros((0, len(LABELS)))
+        texts = [text[:self.max_length * 8] for text in texts]
+        width = max(len(text) for text in texts) or 1
+        codes = np.zeros((len(texts), width))
+        mask = np.zeros((len(texts), width))
+        for row, text in enumerate(texts):
+            codes[row, :len(text)] = [ord(ch) for ch in text]
+            mask[row, :len(text)] = 1.0
+
+        pooled = (codes * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+        logits = np.sin(np.outer(pooled, self.weights))
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def __call__(self, inputs, batch_size=None, top_k=1, **kwargs):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+        probs = np.concatenate(
+            [self.predict_proba(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+        ) if texts else np.zeros((0, len(LABELS)))
+
+        outputs = []
+        for row in probs:
+            ranked = np.argsort(-row)
+            if top_k is not None:
+                ranked = ranked[:top_k]
+            outputs.append([{"label": LABELS[i], "score": float(row[i])} for i in ranked])
+
+        if top_k == 1:
+            return outputs[0] if single else [output[0] for output in outputs]
+        return outputs[0] if single else outputs
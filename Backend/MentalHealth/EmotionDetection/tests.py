@@ -1,3 +1,528 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from . import admission, benchmark, inference, long_text, parity, timeline
+from .admission import AdmissionController, InferenceRejected
+from .batching import MicroBatcher
+from .cache import MemoryResultCache, cache_key
+from .service import InferenceClient, InferenceServer, ServiceBusy, ServiceUnavailable
+
+LABELS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+
+def stub_predict_batch(texts):
+    """
+    Tiny deterministic stand-in for the classifier.
+
+    Like the real model it pads the batch to its longest text and masks the
+    padding out, so a text must score the same alone or inside any batch.
+    """
+    width = max(len(text) for text in texts) or 1
+    codes = np.zeros((len(texts), width), dtype=np.float64)
+    mask = np.zeros((len(texts), width), dtype=np.float64)
+    for row, text in enumerate(texts):
+        codes[row, :len(text)] = [ord(ch) for ch in text]
+        mask[row, :len(text)] = 1.0
+
+    weights = np.arange(1, len(LABELS) + 1, dtype=np.float64)
+    pooled = (codes * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+    logits = np.sin(np.outer(pooled, weights))
+    probs = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+
+    results = []
+    for row in probs:
+        best = int(row.argmax())
+        results.append([{"label": LABELS[best], "score": float(row[best])}])
+    return results
+
+
+class MicroBatcherTests(SimpleTestCase):
+    texts = [
+        "I feel tired",
+        "good",
+        "I am so anxious about my exam tomorrow that I cannot sleep",
+        "",
+        "everything worked out today and I'm proud of myself",
+        "not good",
+    ] * 8
+
+    def test_batched_results_match_unbatched(self):
+        unbatched = [stub_predict_batch([text])[0] for text in self.texts]
+
+        batch_sizes = []
+
+        def recording_predict(texts):
+            batch_sizes.append(len(texts))
+            return stub_predict_batch(texts)
+
+        batcher = MicroBatcher(recording_predict, max_batch_size=8, max_wait_ms=50)
+        results = [None] * len(self.texts)
+        start = threading.Barrier(len(self.texts))
+
+        def worker(index):
+            start.wait()
+            results[index] = batcher.predict(self.texts[index], timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(self.texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, unbatched)
+        self.assertEqual(sum(batch_sizes), len(self.texts))
+        self.assertLessEqual(max(batch_sizes), 8)
+        # Concurrent callers really were grouped together
+        self.assertGreater(max(batch_sizes), 1)
+
+    def test_errors_reach_every_caller_in_the_batch(self):
+        def failing_predict(texts):
+            raise ValueError("model exploded")
+
+        batcher = MicroBatcher(failing_predict, max_batch_size=4, max_wait_ms=20)
+        futures = [batcher.submit(text) for text in self.texts[:4]]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+
+
+def stub_tokenizer(text, add_special_tokens=False, return_offsets_mapping=True):
+    """One token per whitespace-separated word, with character offsets"""
+    offsets, start = [], None
+    for i, ch in enumerate(text + " "):
+        if ch.isspace():
+            if start is not None:
+                offsets.append((start, i))
+                start = None
+        elif start is None:
+            start = i
+    return {"offset_mapping": offsets}
+
+
+def without_result_cache(test_case):
+    patcher = mock.patch.object(inference, '_result_cache', False)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+class ClassifyBatchTests(SimpleTestCase):
+    def setUp(self):
+        without_result_cache(self)
+
+    def test_buckets_are_length_sorted_and_order_is_kept(self):
+        texts = ["a" * n for n in (40, 3, 17, 1, 25, 8, 33)]
+        buckets = []
+
+        def recording_predict(bucket):
+            buckets.append([len(text) for text in bucket])
+            return stub_predict_batch(bucket)
+
+        with mock.patch.object(inference, 'predict_batch', side_effect=recording_predict):
+            results = inference.classify_batch(texts, bucket_size=3)
+
+        self.assertEqual(results, [stub_predict_batch([text])[0] for text in texts])
+        self.assertEqual(buckets, [[1, 3, 8], [17, 25, 33], [40]])
+
+
+class BatchEndpointTests(SimpleTestCase):
+    url = '/emotion/data/batch/'
+
+    def setUp(self):
+        without_result_cache(self)
+
+    def post(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type='application/json')
+
+    def test_returns_one_result_per_item_with_ids(self):
+        with mock.patch.object(inference, 'predict_batch', side_effect=stub_predict_batch):
+            response = self.post({"items": [
+                {"id": "a", "text": "I feel tired"},
+                {"id": "b", "text": "   "},
+                {"id": "c", "text": "good"},
+            ]})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], ["a", "b", "c"])
+        self.assertEqual(results[1]["status"], "error")
+        expected = stub_predict_batch(["good"])[0][0]
+        self.assertEqual(results[2]["primary_emotion"], expected["label"])
+        self.assertAlmostEqual(results[2]["confidence"], expected["score"])
+
+    @override_settings(EMOTION_BATCH_MAX_ITEMS=2)
+    def test_rejects_too_many_items(self):
+        response = self.post({"texts": ["one", "two", "three"]})
+        self.assertEqual(response.status_code, 400)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = MemoryResultCache(max_entries=3, ttl=60)
+        patcher = mock.patch.object(inference, '_result_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_ignores_whitespace_but_not_model_version(self):
+        self.assertEqual(cache_key("I feel  tired ", "v1"), cache_key("I feel tired", "v1"))
+        self.assertNotEqual(cache_key("I feel tired", "v1"), cache_key("I feel tired", "v2"))
+
+    @override_settings(EMOTION_BATCHING=False)
+    def test_repeated_text_skips_the_model(self):
+        with mock.patch.object(inference, 'predict_batch', side_effect=stub_predict_batch) as predict:
+            first = inference.classify("I feel tired")
+            second = inference.classify("I feel tired ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_batch_only_runs_missing_texts_once(self):
+        with mock.patch.object(inference, 'predict_batch', side_effect=stub_predict_batch) as predict:
+            inference.classify_batch(["good"])
+            results = inference.classify_batch(["good", "bad", "bad"])
+
+        self.assertEqual(results, [stub_predict_batch([t])[0] for t in ["good", "bad", "bad"]])
+        run_texts = [text for call in predict.call_args_list for text in call.args[0]]
+        self.assertEqual(run_texts, ["good", "bad"])
+
+    def test_lru_bound_and_ttl(self):
+        for text in ["a", "b", "c", "d"]:
+            self.cache.set(text, text)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("d"), "d")
+
+        with mock.patch('EmotionDetection.cache.time.monotonic', return_value=10**9):
+            self.assertIsNone(self.cache.get("d"))
+
+
+class ParityCheckTests(SimpleTestCase):
+    def make_classifier(self, noise=0.0):
+        def classifier(texts, batch_size=None, top_k=None):
+            outputs = []
+            for text in texts:
+                scores = {label: 1.0 for label in LABELS}
+                scores[LABELS[len(text) % len(LABELS)]] = 5.0 + noise * len(text)
+                total = sum(scores.values())
+                outputs.append([{"label": label, "score": score / total} for label, score in scores.items()])
+            return outputs
+        return classifier
+
+    def test_identical_backends_agree(self):
+        texts = parity.load_corpus()
+        report = parity.compare_backends(self.make_classifier(), self.make_classifier(), texts)
+        self.assertEqual(report["label_agreement"], 1.0)
+        self.assertEqual(report["max_score_drift"], 0.0)
+        self.assertTrue(parity.within_tolerance(report, 0.99, 0.01))
+
+    def test_drift_is_reported(self):
+        texts = ["a", "bb", "ccc"]
+        report = parity.compare_backends(self.make_classifier(), self.make_classifier(noise=1.0), texts)
+        self.assertEqual(report["label_agreement"], 1.0)
+        self.assertGreater(report["max_score_drift"], 0.0)
+        self.assertFalse(parity.within_tolerance(report, 0.99, 0.01))
+
+
+class LongTextTests(SimpleTestCase):
+    def setUp(self):
+        without_result_cache(self)
+
+    def test_windows_overlap_and_cover_the_text(self):
+        text = " ".join(f"w{i}" for i in range(25))
+        windows = list(long_text.iter_windows(text, stub_tokenizer, window_tokens=10, stride_tokens=3))
+
+        self.assertEqual([count for _, count in windows], [10, 10, 10, 4])
+        self.assertTrue(windows[0][0].startswith("w0 ") and windows[0][0].endswith(" w9"))
+        # Each window starts 3 tokens before the previous one ended
+        self.assertTrue(windows[1][0].startswith("w7 "))
+        self.assertTrue(windows[-1][0].endswith("w24"))
+
+    def test_segments_bound_tokenizer_input(self):
+        text = " ".join(["word"] * 1000)
+        seen = []
+
+        def recording_tokenizer(segment, **kwargs):
+            seen.append(len(segment))
+            return stub_tokenizer(segment)
+
+        windows = list(long_text.iter_windows(text, recording_tokenizer, 50, 10, segment_chars=500))
+        self.assertLessEqual(max(seen), 500)
+        self.assertGreaterEqual(sum(count for _, count in windows), 1000)
+
+    @override_settings(EMOTION_WINDOW_TOKENS=4, EMOTION_WINDOW_OVERLAP=0, EMOTION_LONG_TEXT_GROUP_SIZE=2)
+    def test_long_text_is_length_weighted_and_grouped(self):
+        calls = []
+
+        def fake_classify_batch(chunks):
+            calls.append(len(chunks))
+            # Full windows read as sadness, the short tail as joy
+            return [
+                [{"label": "sadness", "score": 0.9}, {"label": "joy", "score": 0.1}]
+                if len(chunk.split()) == 4 else
+                [{"label": "joy", "score": 0.9}, {"label": "sadness", "score": 0.1}]
+                for chunk in chunks
+            ]
+
+        text = "one two three four five six seven eight nine"
+        with mock.patch.object(long_text, 'get_emotion_tokenizer', return_value=stub_tokenizer), \
+                mock.patch.object(long_text, 'classify_batch', side_effect=fake_classify_batch):
+            result = long_text.analyze_text(text)
+
+        self.assertEqual(calls, [2, 1])
+        self.assertEqual(result[0]["label"], "sadness")
+        # (4 * 0.9 + 4 * 0.9 + 1 * 0.1) / 9
+        self.assertAlmostEqual(result[0]["score"], 7.3 / 9)
+
+    def test_short_text_takes_single_text_path(self):
+        with mock.patch.object(long_text, 'get_emotion_tokenizer', return_value=stub_tokenizer), \
+                mock.patch.object(long_text, 'classify', return_value=[{"label": "joy", "score": 1.0}]) as single:
+            result = long_text.analyze_text("I feel good")
+        single.assert_called_once_with("I feel good")
+        self.assertEqual(result[0]["label"], "joy")
+
+
+def parse_sse(response):
+    """[(event, data), ...] from a text/event-stream response"""
+    body = b"".join(response.streaming_content).decode()
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class EmotionStreamTests(SimpleTestCase):
+    text = "I failed my exam. I feel awful!\nBut my friends were kind... Tomorrow is new"
+
+    def setUp(self):
+        without_result_cache(self)
+        for patcher in (
+            mock.patch.object(long_text, 'get_emotion_tokenizer', return_value=stub_tokenizer),
+            mock.patch.object(inference, 'predict_batch', side_effect=stub_predict_batch),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sentences_keep_their_offsets(self):
+        sentences = list(timeline.split_sentences(self.text))
+        self.assertEqual([sentence for _, _, sentence in sentences], [
+            "I failed my exam.", "I feel awful!", "But my friends were kind...", "Tomorrow is new",
+        ])
+        for start, end, sentence in sentences:
+            self.assertEqual(self.text[start:end], sentence)
+
+    @override_settings(EMOTION_STREAM_BATCH_SIZE=2)
+    def test_stream_sends_sentences_then_a_summary_of_them(self):
+        batch_sizes = []
+        real_classify_batch = timeline.classify_batch
+
+        def recording_classify_batch(texts):
+            batch_sizes.append(len(texts))
+            return real_classify_batch(texts)
+
+        with mock.patch.object(timeline, 'classify_batch', side_effect=recording_classify_batch), \
+                mock.patch('EmotionDetection.views.analyze_text', side_effect=AssertionError("second pass")):
+            response = self.client.post(
+                '/emotion/data/stream/', data=json.dumps({"text": self.text}), content_type='application/json'
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            events = parse_sse(response)
+
+        self.assertEqual([event for event, _ in events], ["sentence"] * 4 + ["summary", "done"])
+        self.assertEqual(batch_sizes, [2, 2])
+        first = events[0][1]
+        self.assertEqual((first["index"], first["text"]), (0, "I failed my exam."))
+        self.assertEqual(first["primary_emotion"], stub_predict_batch(["I failed my exam."])[0][0]["label"])
+
+        # The summary has detect_emotion's shape, from the sentence results weighted by length
+        plain = self.client.post('/emotion/data/', data=json.dumps({"text": self.text}), content_type='application/json')
+        summary = events[-2][1]
+        self.assertEqual(set(summary), set(plain.json()))
+        accumulator = long_text.EmotionAccumulator()
+        for _, data in events[:4]:
+            accumulator.add(data["all_emotions"], len(data["text"]))
+        expected = accumulator.result()
+        self.assertEqual(summary["primary_emotion"], expected[0]["label"])
+        self.assertAlmostEqual(summary["confidence"], expected[0]["score"])
+
+    def test_rejection_mid_stream_becomes_an_error_event(self):
+        with mock.patch.object(timeline, 'classify_batch', side_effect=InferenceRejected(2)):
+            response = self.client.post('/emotion/data/stream/', data={"text": self.text})
+            events = parse_sse(response)
+        self.assertEqual([event for event, _ in events], ["error", "done"])
+        self.assertEqual(events[0][1]["retry_after"], 2)
+
+    def test_empty_text_is_rejected_up_front(self):
+        response = self.client.post('/emotion/data/stream/', data=json.dumps({"text": "  "}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+class InferenceServiceTests(SimpleTestCase):
+    authkey = b"test-key"
+
+    def start_server(self, predict=stub_predict_batch, **kwargs):
+        directory = tempfile.mkdtemp()
+        address = os.path.join(directory, "emotion.sock")
+        server = InferenceServer(address, self.authkey, predict, max_wait_ms=20, **kwargs)
+        server.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.stop)
+        return server, address
+
+    def test_results_from_the_service_match_in_process(self):
+        server, address = self.start_server()
+        client = InferenceClient(address, self.authkey, timeout=5)
+        texts = ["I feel tired", "good", "so anxious today"]
+
+        self.assertEqual(client.classify_batch(texts), stub_predict_batch(texts))
+        self.assertEqual(client.ping()["requests_served"], 1)
+
+    def test_requests_from_many_clients_are_batched_centrally(self):
+        batch_sizes = []
+
+        def recording_predict(texts):
+            batch_sizes.append(len(texts))
+            return stub_predict_batch(texts)
+
+        server, address = self.start_server(recording_predict)
+        client = InferenceClient(address, self.authkey, timeout=5)
+        start = threading.Barrier(6)
+        results = {}
+
+        def worker(index):
+            start.wait()
+            results[index] = client.classify_batch([f"text number {index}"])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index, result in results.items():
+            self.assertEqual(result, stub_predict_batch([f"text number {index}"]))
+        self.assertGreater(max(batch_sizes), 1)
+
+    def test_busy_service_pushes_back(self):
+        server, address = self.start_server(max_pending=2)
+        client = InferenceClient(address, self.authkey, timeout=5)
+        with self.assertRaises(ServiceBusy):
+            client.classify_batch(["one", "two", "three"])
+
+    def test_missing_service_is_reported_and_backed_off(self):
+        client = InferenceClient("/nonexistent/emotion.sock", self.authkey, retry_seconds=60)
+        with self.assertRaises(ServiceUnavailable):
+            client.classify_batch(["hello"])
+        with mock.patch('EmotionDetection.service.Client') as connect:
+            with self.assertRaises(ServiceUnavailable):
+                client.classify_batch(["hello"])
+        connect.assert_not_called()
+
+    @override_settings(EMOTION_SERVICE_SOCKET="/nonexistent/emotion.sock", EMOTION_BATCHING=False)
+    def test_inference_falls_back_in_process_when_service_is_down(self):
+        without_result_cache(self)
+        with mock.patch.object(inference, '_service_client', None), \
+                mock.patch.object(inference, 'predict_batch', side_effect=stub_predict_batch):
+            self.assertEqual(inference.classify("good"), stub_predict_batch(["good"])[0])
+            self.assertEqual(inference.classify_batch(["a", "bb"]), stub_predict_batch(["a", "bb"]))
+
+
+class AdmissionControlTests(SimpleTestCase):
+    def test_full_queue_rejects_immediately_with_retry_after(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = threading.Event()
+        running = threading.Event()
+
+        def hold_slot():
+            with controller.admit():
+                running.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        running.wait(5)
+        waiter = threading.Thread(target=controller.run, args=(lambda: None,))
+        waiter.start()
+        while controller.waiting < 1:
+            time.sleep(0.001)
+
+        with self.assertRaises(InferenceRejected) as rejected:
+            with controller.admit():
+                pass
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+        release.set()
+        holder.join()
+        waiter.join()
+        stats = controller.stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["running"]), (2, 1, 0))
+        self.assertEqual(stats["service_time"]["count"], 2)
+        self.assertIn("p95_ms", stats["queue_wait"])
+
+    def test_waiting_past_the_timeout_is_rejected(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        with controller.admit():
+            with self.assertRaises(InferenceRejected):
+                controller.run(lambda: None)
+        self.assertEqual(controller.waiting, 0)
+        self.assertEqual(controller.run(lambda: "ok"), "ok")
+
+    def test_endpoint_answers_429_when_saturated(self):
+        saturated = mock.Mock()
+        saturated.admit.side_effect = InferenceRejected(3)
+        without_result_cache(self)
+        with mock.patch.object(inference, 'get_admission_controller', return_value=saturated):
+            response = self.client.post(
+                '/emotion/data/batch/', data=json.dumps({"texts": ["hello"]}), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "3")
+
+    def test_metrics_endpoint_reports_admission(self):
+        controller = AdmissionController(max_concurrency=2, max_queue=2, queue_timeout=1)
+        controller.run(lambda: None)
+        with mock.patch.object(admission, '_controller', controller):
+            response = self.client.get('/emotion/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["admission"]["admitted"], 1)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_stub_model_is_batch_invariant(self):
+        from .stub_model import StubTextClassifier
+        model = StubTextClassifier()
+        texts = ["good", "I feel so tired and alone tonight", ""]
+        together = model(texts, batch_size=3, top_k=None)
+        self.assertEqual([model(text, top_k=None) for text in texts], together)
+        self.assertEqual(len(together[0]), 7)
+
+    def test_texts_are_deterministic_and_distinct(self):
+        texts = benchmark.make_texts(5, words=12, seed=1)
+        self.assertEqual(texts, benchmark.make_texts(5, words=12, seed=1))
+        self.assertEqual(len(set(texts)), 5)
+        self.assertEqual(len(texts[0].split()), 12)
+
+    def test_stub_run_writes_a_json_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "bench.json")
+            call_command(
+                'benchmark_inference', model='stub', requests=4, warmup=1, lengths='short,long',
+                batch_sizes='1,4', threads='1,2', output=output, stderr=mock.Mock(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(report["environment"]["backend"], "stub")
+        self.assertEqual(len(report["results"]), len(benchmark.TARGETS) * 2 * 2 * 2)
+        for row in report["results"]:
+            self.assertEqual((row["requests"], row["errors"]), (4, 0))
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+        # The benchmark does not leave its settings behind
+        self.assertNotEqual(settings.EMOTION_BACKEND, "stub")
@@ -0,0 +1,48 @@
+"""
+Sentence-level emotion timeline for streaming responses.
+
+The text is split into sentences, which go through the model a few at a
+time, so the first results are available after one small batch instead of
+after the whole document.
+"""
+import re
+
+from .inference import classify_batch
+
+# A sentence runs up to and including its closing punctuation, or to a line break
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|\n|$)")
+
+
+def split_sentences(text):
+    """Yield (start, end, sentence) for each non-blank sentence; offsets index into text"""
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        start = match.start() + (len(match.group()) - len(match.group().lstrip()))
+        yield start, start + len(sentence), sentence
+
+
+def iter_timeline(text, batch_size):
+    """
+    Yield one list of sentence entries per model batch, in text order.
+
+    Each entry is {"index", "start", "end", "text", "emotions"}, where
+    emotions is the all-label result for that sentence, best first.
+    """
+    batch = []
+
+    def run(batch):
+        results = classify_batch([sentence for _, _, _, sentence in batch])
+        return [
+            {"index": index, "start": start, "end": end, "text": sentence, "emotions": result}
+            for (index, start, end, sentence), result in zip(batch, results)
+        ]
+
+    for index, (start, end, sentence) in enumerate(split_sentences(text)):
+        batch.append((index, start, end, sentence))
+        if len(batch) >= batch_size:
+            yield run(batch)
+            batch = []
+    if batch:
+        yield run(batch)
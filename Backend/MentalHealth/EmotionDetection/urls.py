@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('data/', views.detect_emotion, name='index'),
+    path('data/stream/', views.detect_emotion_stream, name='detect_emotion_stream'),
+    path('data/batch/', views.detect_emotion_batch, name='detect_emotion_batch'),
+    path('models/', views.model_status, name='model_status'),
+    path('metrics/', views.inference_metrics, name='inference_metrics'),
 ]
\ No newline at end of file
@@ -1,14 +1,63 @@
-from transformers import pipeline
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view
 from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
+from .registry import registry
+from . import inference
+from .admission import InferenceRejected, get_admission_controller
+from .inference import classify_batch
+from .long_text import EmotionAccumulator, analyze_text
+from .timeline import iter_timeline
 
 logger = logging.getLogger(__name__)
 
-# Pretrained model load (load once)
-emotion_pipeline = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base")
+
+def _busy_response(error):
+    response = JsonResponse({
+        "error": "Emotion analysis is busy, please retry shortly",
+        "status": "error"
+    }, status=429)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def _emotions_from_result(result):
+    """Turn a pipeline result into the list of {label, score} we return"""
+    return [
+        {"label": item['label'], "score": float(item['score'])}
+        for item in result
+    ]
+
+
+def _request_text(request):
+    """The 'text' field from a JSON or form-encoded body"""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+        return data.get('text', '')
+    return request.POST.get('text', '')
+
+
+def _detection_payload(text, result):
+    """Response body of detect_emotion; the stream's summary event carries the same"""
+    emotions = _emotions_from_result(result)
+    return {
+        "status": "success",
+        "input_text": text,
+        "primary_emotion": emotions[0]['label'],
+        "confidence": emotions[0]['score'],
+        "all_emotions": emotions,
+        "analysis": {
+            "text_length": len(text),
+            "word_count": len(text.split())
+        }
+    }
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 @csrf_exempt
 @api_view(['POST'])
@@ -17,11 +66,7 @@ def detect_emotion(request):
         logger.info(f"Request received - Content-Type: {request.content_type}")
         
         # Get text from request
-        if request.content_type == 'application/json':
-            data = json.loads(request.body)
-            text = data.get('text', '')
-        else:
-            text = request.POST.get('text', '')
+        text = _request_text(request)
         
         logger.info(f"Received text length: {len(text)} characters")
         
@@ -32,33 +77,18 @@ def detect_emotion(request):
                 "status": "error"
             }, status=400)
         
-        # Process emotion detection
-        result = emotion_pipeline(text)
-        
-        # Get all emotions with scores for potential future use
-        emotions = []
-        for item in result:
-            emotions.append({
-                "label": item['label'],
-                "score": float(item['score'])
-            })
+        # Process emotion detection (long texts are analysed window by window)
+        result = analyze_text(text)
         
-        # Return detailed response
-        response_data = {
-            "status": "success",
-            "input_text": text,
-            "primary_emotion": emotions[0]['label'],
-            "confidence": emotions[0]['score'],
-            "all_emotions": emotions,
-            "analysis": {
-                "text_length": len(text),
-                "word_count": len(text.split())
-            }
-        }
+        # Return detailed response, with all emotions and their scores
+        response_data = _detection_payload(text, result)
         
-        logger.info(f"Analysis complete: {emotions[0]['label']} ({emotions[0]['score']:.2f})")
+        logger.info(f"Analysis complete: {response_data['primary_emotion']} ({response_data['confidence']:.2f})")
         return JsonResponse(response_data)
         
+    except InferenceRejected as e:
+        logger.warning(str(e))
+        return _busy_response(e)
     except json.JSONDecodeError:
         logger.error("Invalid JSON format received")
         return JsonResponse({
@@ -71,4 +101,198 @@ def detect_emotion(request):
             "error": "Internal server error",
             "details": str(e),
             "status": "error"
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@csrf_exempt
+@api_view(['POST'])
+def detect_emotion_stream(request):
+    """
+    Streaming variant of detect_emotion, as Server-Sent Events.
+
+    One "sentence" event is sent per sentence as soon as its batch has been
+    through the model, then a "summary" event, then "done". The summary has
+    the same shape as detect_emotion's body. Its emotions are the mean of
+    the sentence results, weighted by sentence length, so the text is not
+    run through the model a second time. It can differ a little from
+    detect_emotion, which averages overlapping windows. If inference fails
+    half way an "error" event is sent instead of the summary.
+    """
+    try:
+        text = _request_text(request)
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON format received")
+        return JsonResponse({
+            "error": "Invalid JSON format",
+            "status": "error"
+        }, status=400)
+
+    if not text or not text.strip():
+        logger.warning("Empty text received")
+        return JsonResponse({
+            "error": "No text provided",
+            "status": "error"
+        }, status=400)
+
+    logger.info(f"Stream request received - {len(text)} characters")
+
+    def events():
+        try:
+            accumulator = EmotionAccumulator()
+            for entries in iter_timeline(text, settings.EMOTION_STREAM_BATCH_SIZE):
+                for entry in entries:
+                    accumulator.add(entry["emotions"], len(entry["text"]))
+                    emotions = _emotions_from_result(entry["emotions"])
+                    yield _sse("sentence", {
+                        "index": entry["index"],
+                        "start": entry["start"],
+                        "end": entry["end"],
+                        "text": entry["text"],
+                        "primary_emotion": emotions[0]['label'],
+                        "confidence": emotions[0]['score'],
+                        "all_emotions": emotions,
+                    })
+            yield _sse("summary", _detection_payload(text, accumulator.result()))
+        except InferenceRejected as e:
+            logger.warning(str(e))
+            yield _sse("error", {
+                "error": "Emotion analysis is busy, please retry shortly",
+                "retry_after": e.retry_after,
+                "status": "error"
+            })
+        except Exception as e:
+            logger.error(f"Unexpected error in emotion stream: {str(e)}")
+            yield _sse("error", {"error": "Internal server error", "status": "error"})
+        yield _sse("done", {})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+@api_view(['POST'])
+def detect_emotion_batch(request):
+    """
+    Classify many texts in one request.
+
+    Body: {"texts": ["...", ...]} or {"items": [{"id": ..., "text": "..."}, ...]}
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({
+                "error": "Request body must be a JSON object",
+                "status": "error"
+            }, status=400)
+
+        if 'items' in data:
+            items = data.get('items')
+        else:
+            items = [{"id": index, "text": text} for index, text in enumerate(data.get('texts') or [])]
+
+        if not isinstance(items, list) or not items:
+            return JsonResponse({
+                "error": "Provide a non-empty 'texts' or 'items' list",
+                "status": "error"
+            }, status=400)
+
+        max_items = settings.EMOTION_BATCH_MAX_ITEMS
+        if len(items) > max_items:
+            return JsonResponse({
+                "error": f"Too many items: {len(items)} (max {max_items} per request)",
+                "status": "error"
+            }, status=400)
+
+        ids, texts = [], []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {"id": index, "text": item}
+            if not isinstance(item, dict):
+                return JsonResponse({
+                    "error": f"Item {index} must be a string or an object with 'text'",
+                    "status": "error"
+                }, status=400)
+            ids.append(item.get('id', index))
+            text = item.get('text')
+            texts.append(text if isinstance(text, str) else '')
+
+        logger.info(f"Batch request received - {len(texts)} items")
+
+        # Only send non-empty texts to the model
+        to_classify = [i for i, text in enumerate(texts) if text.strip()]
+        outputs = classify_batch([texts[i] for i in to_classify])
+        results_by_index = dict(zip(to_classify, outputs))
+
+        results = []
+        for index, (item_id, text) in enumerate(zip(ids, texts)):
+            if index not in results_by_index:
+                results.append({
+                    "id": item_id,
+                    "status": "error",
+                    "error": "No text provided"
+                })
+                continue
+
+            emotions = _emotions_from_result(results_by_index[index])
+            results.append({
+                "id": item_id,
+                "status": "success",
+                "primary_emotion": emotions[0]['label'],
+                "confidence": emotions[0]['score'],
+                "all_emotions": emotions,
+            })
+
+        return JsonResponse({
+            "status": "success",
+            "count": len(results),
+            "results": results
+        })
+
+    except InferenceRejected as e:
+        logger.warning(str(e))
+        return _busy_response(e)
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON format received")
+        return JsonResponse({
+            "error": "Invalid JSON format",
+            "status": "error"
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Unexpected error in batch detection: {str(e)}")
+        return JsonResponse({
+            "error": "Internal server error",
+            "details": str(e),
+            "status": "error"
+        }, status=500)
+
+
+@api_view(['GET'])
+def model_status(request):
+    """Which models this process has loaded and how much memory they hold"""
+    report = registry.memory_report()
+    return JsonResponse({
+        "status": "success",
+        "models": report["models"],
+        "total_bytes": report["total_bytes"],
+        "total_mb": round(report["total_bytes"] / 2**20, 1),
+        "batching": inference._batcher.stats() if inference._batcher else None,
+        "result_cache": inference._result_cache.stats() if inference._result_cache else None,
+    })
+
+
+@api_view(['GET'])
+def inference_metrics(request):
+    """Admission queue wait and service time, for sizing EMOTION_MAX_CONCURRENCY/QUEUE"""
+    client = inference.get_service_client()
+    try:
+        service = client.ping() if client else None
+    except Exception as e:
+        service = {"error": str(e)}
+    return JsonResponse({
+        "status": "success",
+        "admission": get_admission_controller().stats(),
+        "service": service,
+    })
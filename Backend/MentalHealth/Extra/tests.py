@@ -1,3 +1,104 @@
-from django.test import TestCase
+import random
+import re
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from Chatbot.crisis import CRISIS_DETECTOR
+
+from .utils import MentalHealthChatbot
+
+
+def legacy_classify_intent(bot, message):
+    """classify_intent as it was before the intents were compiled into one pattern"""
+    message_lower = message.lower().strip()
+
+    if any(keyword in message_lower for keyword in bot.emergency_keywords):
+        return 'emergency'
+    for pattern in bot.offensive_patterns:
+        if re.search(pattern, message_lower):
+            return 'offensive'
+    for pattern in bot.greeting_patterns:
+        if re.search(pattern, message_lower):
+            return 'greeting'
+    if re.search(r'333|3.3.3|three three three', message_lower.replace(' ', '')):
+        return '333_rule'
+    if '3 3 3' in message_lower or 'three three three' in message_lower:
+        return '333_rule'
+    for pattern in bot.negative_feeling_patterns:
+        if re.search(pattern, message_lower):
+            return 'negative_feelings'
+    if 'anxiety' in message_lower or 'anxious' in message_lower:
+        if 'what' in message_lower or 'why' in message_lower:
+            return 'anxiety_info'
+        return 'mental_health'
+    if any(keyword in message_lower for keyword in bot.mental_health_keywords):
+        return 'mental_health'
+    if any(keyword in message_lower for keyword in bot.medicine_keywords):
+        return 'medicine'
+    if any(keyword in message_lower for keyword in bot.doctor_keywords):
+        return 'doctor'
+    if any(keyword in message_lower for keyword in bot.app_keywords):
+        return 'app'
+    if message_lower in ['bad', 'not good', 'not well', 'terrible']:
+        return 'negative_feelings'
+    return 'fallback'
+
+
+MESSAGES = [
+    "Hello", "Bad very bad", "I said i am not felling very well today", "Who is srk", "Shahrukh",
+    "Ehy", "For what go on", "Why is anxiety", "Fuck you", "3 3  3 rule", "I'm feeling anxious",
+    "What should I do when I feel stressed?", "I can't sleep at night", "  BAD  ", "terrible",
+    "3-3-3", "3x33", "33 3", "three three three", "threethreethree", "3\n3\n3", "3 \n 3 \n 3",
+    "I want to die, hello", "stupid app", "can I get zoloft from a doctor", "my profile settings",
+    "what is anxiety", "anxious about my account", "you are dumb and I want to end my life",
+    "ok", "", "   ", "Sleep at late night", "I'm felling bad today", "it is not challengable i fell good",
+]
+
+FRAGMENTS = [
+    "i feel", "today", "please", "ok", "3", " ", "what", "why", "the", "shut up", "kill myself",
+    "hey", "good evening", "how are you", "not well", "can't take it", "anxiety", "panic", "calm",
+    "prozac", "pill", "therapist", "premium", "feature", "hate you", "hate life", "lonely",
+    "three", "3.3", "self harm", "xanax", "application", "so", "felling", "low",
+]
+
+
+class IntentClassifierTests(SimpleTestCase):
+    def setUp(self):
+        self.bot = MentalHealthChatbot()
+
+    def corpus(self):
+        rng = random.Random(7)
+        messages = list(MESSAGES)
+        for _ in range(3000):
+            words = [rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 6))]
+            message = " ".join(words)
+            if rng.random() < 0.3:
+                message = message.upper()
+            messages.append(message)
+        return messages
+
+    def test_matches_legacy_classifier(self):
+        for message in self.corpus():
+            with self.subTest(message=message):
+                # Crises now come from the shared crisis detector instead of substrings
+                if CRISIS_DETECTOR.is_crisis(message):
+                    expected = 'emergency'
+                else:
+                    expected = legacy_classify_intent(self.bot, message)
+                self.assertEqual(self.bot.classify_intent(message), expected)
+
+    def test_every_intent_is_reachable(self):
+        intents = {self.bot.classify_intent(message) for message in self.corpus()}
+        self.assertEqual(
+            intents,
+            set(MentalHealthChatbot.INTENT_PRIORITY) - {'anxiety'} | {'anxiety_info', 'fallback'},
+        )
+
+    def test_precedence(self):
+        self.assertEqual(self.bot.classify_intent("hello, I want to die"), 'emergency')
+        self.assertEqual(self.bot.classify_intent("shut up, hello"), 'offensive')
+        self.assertEqual(self.bot.classify_intent("tell me about zoloft and my doctor"), 'medicine')
+
+    def test_misspelled_crisis_is_an_emergency(self):
+        self.assertEqual(self.bot.classify_intent("hello, i wanna dye"), 'emergency')
+        self.assertEqual(self.bot.classify_intent("I want to diet"), 'fallback')
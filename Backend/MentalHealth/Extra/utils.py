@@ -3,7 +3,19 @@ import json
 import random
 from datetime import datetime
 
+from Chatbot.config import CRISIS_KEYWORDS
+from Chatbot.crisis import CRISIS_DETECTOR
+
 class MentalHealthChatbot:
+    # Intents in order of precedence: when a message matches several, the first one wins
+    INTENT_PRIORITY = (
+        'emergency', 'offensive', 'greeting', '333_rule', 'negative_feelings',
+        'anxiety', 'mental_health', 'medicine', 'doctor', 'app'
+    )
+    
+    # Whole messages that mean the user feels bad
+    SIMPLE_NEGATIVES = ('bad', 'not good', 'not well', 'terrible')
+    
     def __init__(self):
         self.greeting_patterns = [
             r'hi|hello|hey|hola|hay|ehy',
@@ -38,11 +50,10 @@ class MentalHealthChatbot:
             'professional', 'specialist', 'referral'
         ]
         
-        # Emergency keywords that need immediate attention
-        self.emergency_keywords = [
-            'suicide', 'kill myself', 'want to die', 'end my life',
-            'harm myself', 'self harm', 'hurting myself'
-        ]
+        # Emergency keywords that need immediate attention, shared with the Chatbot app.
+        # classify_intent finds them with the crisis detector, which also catches misspellings.
+        self.crisis_detector = CRISIS_DETECTOR
+        self.emergency_keywords = list(CRISIS_KEYWORDS)
         
         # Negative feeling patterns
         self.negative_feeling_patterns = [
@@ -55,9 +66,87 @@ class MentalHealthChatbot:
             r'fuck you', r'stupid', r'dumb', r'hate you', r'shut up'
         ]
         
+        self.intent_patterns = self.compile_intent_patterns()
         self.initialize_responses()
         self.conversation_history = []
     
+    def compile_intent_patterns(self):
+        """
+        Compile the intents into regexes that find the winning intent in one scan.
+        
+        All keywords go into one trie. Each keyword ends in an empty named group
+        that records the best INTENT_PRIORITY rank of that keyword and of every
+        shorter keyword it starts with. Two keywords can only both match at one
+        position if one is a prefix of the other, so a match always reports the
+        best intent starting at that position.
+        
+        Returns one (pattern, group rank) pair per rank: patterns[n] only knows
+        the first n + 1 intents. Once an intent is found, the rest of
+        the message is searched with the smaller pattern, so a message full of
+        greetings is not matched word by word.
+        """
+        def literals(patterns):
+            """The alternatives of plain-text patterns like r'hi|hello' or r'can\'t take it'"""
+            words = []
+            for pattern in patterns:
+                for alternative in pattern.split('|'):
+                    word = alternative.replace("\\'", "'")
+                    if any(ch in word for ch in '.^$*+?{}[]\\()'):
+                        raise ValueError(f"Intent pattern {pattern!r} is not plain text")
+                    words.append(word)
+            return words
+        
+        keywords = {
+            # Crises are found word by word by the crisis detector, not as substrings
+            # ("want to diet" is not "want to die")
+            'emergency': [],
+            'offensive': literals(self.offensive_patterns),
+            'greeting': literals(self.greeting_patterns),
+            '333_rule': ['three three three'],
+            'negative_feelings': literals(self.negative_feeling_patterns),
+            'anxiety': ['anxiety', 'anxious'],
+            'mental_health': self.mental_health_keywords,
+            'medicine': self.medicine_keywords,
+            'doctor': self.doctor_keywords,
+            'app': self.app_keywords,
+        }
+        
+        def build(node, best, leaf_ranks):
+            if '' in node:
+                best = min(best, node[''])
+            branches = [re.escape(ch) + build(child, best, leaf_ranks) for ch, child in sorted(node.items()) if ch]
+            if '' in node:
+                name = f"kw{len(leaf_ranks)}"
+                leaf_ranks[name] = best
+                # Longer keywords are tried first; this one matches if none of them do
+                branches.append(f"(?P<{name}>)")
+            if not branches:
+                return '(?!)'
+            return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        
+        rule_rank = self.INTENT_PRIORITY.index('333_rule')
+        patterns = []
+        for limit in range(1, len(self.INTENT_PRIORITY) + 1):
+            trie = {}
+            for rank, intent in enumerate(self.INTENT_PRIORITY[:limit]):
+                for keyword in keywords[intent]:
+                    node = trie
+                    for ch in keyword:
+                        node = node.setdefault(ch, {})
+                    node[''] = min(node.get('', rank), rank)
+            
+            leaf_ranks = {}
+            alternatives = [build(trie, limit, leaf_ranks)]
+            if rule_rank < limit:
+                # The 3-3-3 rule used to be searched for with the spaces taken out ('333' or '3.3.3').
+                # No keyword starts with a digit, so it never competes with the trie at one position.
+                alternatives.append(r'(?P<intent_333_rule>3 *3 *3|3 *[^ \n] *3 *[^ \n] *3)')
+                leaf_ranks['intent_333_rule'] = rule_rank
+            
+            pattern = re.compile('|'.join(alternatives))
+            patterns.append((pattern, {pattern.groupindex[name]: rank for name, rank in leaf_ranks.items()}))
+        return patterns
+    
     def initialize_responses(self):
         self.responses = {
             'greeting': [
@@ -156,58 +245,37 @@ class MentalHealthChatbot:
     def classify_intent(self, message):
         message_lower = message.lower().strip()
         
-        # Check for emergency situations first (highest priority)
-        if any(keyword in message_lower for keyword in self.emergency_keywords):
+        # Crisis messages come first, misspelled or not ("kil myself")
+        if self.crisis_detector.is_crisis(message_lower):
             return 'emergency'
         
-        # Check for offensive language
-        for pattern in self.offensive_patterns:
-            if re.search(pattern, message_lower):
-                return 'offensive'
-        
-        # Check for greetings
-        for pattern in self.greeting_patterns:
-            if re.search(pattern, message_lower):
-                return 'greeting'
+        # One pass over the message; every match narrows the search to better intents
+        best = None
+        pattern, group_rank = self.intent_patterns[-1]
+        match = pattern.search(message_lower)
+        while match:
+            best = group_rank[match.lastindex]
+            if best == 0:
+                break
+            pattern, group_rank = self.intent_patterns[best - 1]
+            # Keywords overlap, so resume right after where this one started
+            match = pattern.search(message_lower, match.start() + 1)
         
-        # Check for 3-3-3 rule queries
-        if re.search(r'333|3.3.3|three three three', message_lower.replace(' ', '')):
-            return '333_rule'
-        if '3 3 3' in message_lower or 'three three three' in message_lower:
-            return '333_rule'
-        
-        # Check for negative feelings
-        for pattern in self.negative_feeling_patterns:
-            if re.search(pattern, message_lower):
+        if best is None:
+            # Check for simple negative responses
+            if message_lower in self.SIMPLE_NEGATIVES:
                 return 'negative_feelings'
+            return 'fallback'
+        
+        intent = self.INTENT_PRIORITY[best]
         
-        # Check for anxiety-related queries
-        if 'anxiety' in message_lower or 'anxious' in message_lower:
+        # Anxiety questions get an explanation, other anxiety messages support
+        if intent == 'anxiety':
             if 'what' in message_lower or 'why' in message_lower:
                 return 'anxiety_info'
             return 'mental_health'
         
-        # Check for mental health topics
-        if any(keyword in message_lower for keyword in self.mental_health_keywords):
-            return 'mental_health'
-        
-        # Check for medicine questions
-        if any(keyword in message_lower for keyword in self.medicine_keywords):
-            return 'medicine'
-        
-        # Check for doctor referrals
-        if any(keyword in message_lower for keyword in self.doctor_keywords):
-            return 'doctor'
-        
-        # Check for app questions
-        if any(keyword in message_lower for keyword in self.app_keywords):
-            return 'app'
-        
-        # Check for simple negative responses
-        if message_lower in ['bad', 'not good', 'not well', 'terrible']:
-            return 'negative_feelings'
-        
-        return 'fallback'
+        return intent
     
     def generate_response(self, message):
         try:
@@ -4,6 +4,7 @@ Django settings for MentalHealth project.
 
 from pathlib import Path
 import os
+import tempfile
 from datetime import timedelta
 
 from dotenv import load_dotenv
@@ -179,6 +180,14 @@ AUTH_USER_MODEL = 'api.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per distinct content, under their SHA-256 (see api/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# `manage.py gc_media` leaves blobs saved or released more recently than this alone (seconds)
+MEDIA_GC_MIN_AGE = float(os.getenv("MEDIA_GC_MIN_AGE", "3600"))
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -192,4 +201,94 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
-}
\ No newline at end of file
+}
+
+
+# ---- Emotion detection ----
+
+# Hugging Face model used for text emotion detection (shared by api and EmotionDetection)
+EMOTION_MODEL = os.getenv("EMOTION_MODEL", "j-hartmann/emotion-english-distilroberta-base")
+# Inference backend: "pytorch", "onnx", "onnx-int8" or "stub" (see EmotionDetection/backends.py)
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "pytorch")
+EMOTION_ONNX_DIR = os.getenv("EMOTION_ONNX_DIR", os.path.join(BASE_DIR, 'onnx_models', 'emotion'))
+# Load the emotion model when a WSGI worker starts instead of on its first request
+EMOTION_WARMUP = os.getenv("EMOTION_WARMUP", "0") == "1"
+
+# Micro-batching of concurrent emotion requests (see EmotionDetection/batching.py)
+EMOTION_BATCHING = os.getenv("EMOTION_BATCHING", "1") == "1"
+EMOTION_BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "16"))
+EMOTION_BATCH_MAX_WAIT_MS = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+# Most texts a client may send to /emotion/data/batch/ in one request
+EMOTION_BATCH_MAX_ITEMS = int(os.getenv("EMOTION_BATCH_MAX_ITEMS", "64"))
+
+# Sentences per model call for /emotion/data/stream/; smaller = earlier first event
+EMOTION_STREAM_BATCH_SIZE = int(os.getenv("EMOTION_STREAM_BATCH_SIZE", "4"))
+
+# Emotion result cache: "memory" (per-process LRU), "django" (CACHES[EMOTION_CACHE_ALIAS]) or "none"
+EMOTION_CACHE_BACKEND = os.getenv("EMOTION_CACHE_BACKEND", "memory")
+EMOTION_CACHE_ALIAS = os.getenv("EMOTION_CACHE_ALIAS", "default")
+EMOTION_CACHE_MAX_ENTRIES = int(os.getenv("EMOTION_CACHE_MAX_ENTRIES", "4096"))
+EMOTION_CACHE_TTL = int(os.getenv("EMOTION_CACHE_TTL", str(24 * 60 * 60)))  # seconds, 0 = never expire
+
+# Shared out-of-process inference service (manage.py run_inference_service); empty = in-process only
+EMOTION_SERVICE_SOCKET = os.getenv("EMOTION_SERVICE_SOCKET", "")
+EMOTION_SERVICE_TIMEOUT = float(os.getenv("EMOTION_SERVICE_TIMEOUT", "30"))  # seconds to wait for a reply
+EMOTION_SERVICE_RETRY_SECONDS = float(os.getenv("EMOTION_SERVICE_RETRY_SECONDS", "5"))  # back-off after a failure
+EMOTION_SERVICE_MAX_PENDING = int(os.getenv("EMOTION_SERVICE_MAX_PENDING", "256"))  # texts queued before rejecting
+
+# Admission control for inference (see EmotionDetection/admission.py). Requests beyond
+# MAX_CONCURRENCY running plus MAX_QUEUE waiting get 429 + Retry-After. With batching on,
+# keep MAX_CONCURRENCY at least EMOTION_BATCH_MAX_SIZE so concurrent requests can share a batch.
+EMOTION_MAX_CONCURRENCY = int(os.getenv("EMOTION_MAX_CONCURRENCY", "16"))
+EMOTION_MAX_QUEUE = int(os.getenv("EMOTION_MAX_QUEUE", "32"))
+EMOTION_QUEUE_TIMEOUT = float(os.getenv("EMOTION_QUEUE_TIMEOUT", "5"))  # seconds a request may wait for a slot
+
+# Long texts are split into overlapping token windows (see EmotionDetection/long_text.py)
+EMOTION_WINDOW_TOKENS = int(os.getenv("EMOTION_WINDOW_TOKENS", "510"))  # model max minus <s> and </s>
+EMOTION_WINDOW_OVERLAP = int(os.getenv("EMOTION_WINDOW_OVERLAP", "64"))
+EMOTION_LONG_TEXT_GROUP_SIZE = int(os.getenv("EMOTION_LONG_TEXT_GROUP_SIZE", "32"))  # windows per model call
+
+
+# ---- Assessment scoring jobs ----
+
+# Assessments are scored by `manage.py run_scoring_worker`, not in the request (see api/jobs.py)
+SCORING_JOB_MAX_ATTEMPTS = int(os.getenv("SCORING_JOB_MAX_ATTEMPTS", "3"))
+SCORING_JOB_VISIBILITY_TIMEOUT = float(os.getenv("SCORING_JOB_VISIBILITY_TIMEOUT", "300"))  # seconds a claim lasts
+SCORING_JOB_RETRY_DELAY = float(os.getenv("SCORING_JOB_RETRY_DELAY", "30"))  # seconds, doubled on every failure
+SCORING_WORKER_POLL_INTERVAL = float(os.getenv("SCORING_WORKER_POLL_INTERVAL", "2"))  # seconds between empty polls
+# Progress file of `manage.py rescore_assessments --resume`; outside the source tree
+RESCORE_CHECKPOINT = os.getenv(
+    "RESCORE_CHECKPOINT", os.path.join(tempfile.gettempdir(), "rescore_assessments.checkpoint.json")
+)
+
+
+# ---- Assessment image uploads ----
+
+# The captured image is streamed to storage in chunks and checked as it arrives (see api/uploads.py)
+ASSESSMENT_IMAGE_MAX_BYTES = int(os.getenv("ASSESSMENT_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+ASSESSMENT_IMAGE_CHUNK_BYTES = int(os.getenv("ASSESSMENT_IMAGE_CHUNK_BYTES", str(64 * 1024)))
+
+
+# ---- Voice analysis ----
+
+# Recorded answers are analysed in a process pool (see api/voice_jobs.py); 0 runs them inline
+VOICE_ANALYSIS_WORKERS = int(os.getenv("VOICE_ANALYSIS_WORKERS", "2"))
+VOICE_DECODE_CHUNK_SECONDS = float(os.getenv("VOICE_DECODE_CHUNK_SECONDS", "5"))  # audio decoded per step
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")  # decodes M4A/AAC/MP3; WAV needs nothing
+
+
+# ---- Resumable audio uploads ----
+
+# Recordings can be sent in checksummed chunks and resumed after a failure (see api/audio_uploads.py)
+AUDIO_UPLOAD_DIR = os.getenv("AUDIO_UPLOAD_DIR", os.path.join(BASE_DIR, 'partial_uploads'))  # not served
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+AUDIO_UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_CHUNK_MAX_BYTES", str(4 * 1024 * 1024)))
+AUDIO_UPLOAD_LOCK_SECONDS = float(os.getenv("AUDIO_UPLOAD_LOCK_SECONDS", "120"))  # a dead chunk request's claim
+AUDIO_UPLOAD_EXPIRY_HOURS = float(os.getenv("AUDIO_UPLOAD_EXPIRY_HOURS", "24"))  # then expire_audio_uploads deletes it
+
+
+# ---- Decoded audio cache ----
+
+# Recordings decoded once to .npy and memory-mapped on later analyses (see api/pcm_cache.py)
+PCM_CACHE_DIR = os.getenv("PCM_CACHE_DIR", os.path.join(BASE_DIR, 'pcm_cache'))
+PCM_CACHE_MAX_BYTES = int(os.getenv("PCM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 0 turns the cache off
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MentalHealth.settings')
 
 application = get_wsgi_application()
+
+# Models load lazily on first use; HTTP workers can load them before taking traffic instead
+from django.conf import settings
+
+if settings.EMOTION_WARMUP:
+    from EmotionDetection.inference import warmup
+
+    warmup()
@@ -3,6 +3,9 @@ from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import Assessment, Article, ArticleLike, ArticleRating, ArticleView
+from .articles import (
+    COUNTER_FIELDS, add_like, rate_article, remove_like, remove_rating, remove_view, save_view,
+)
 
 class CustomUserAdmin(UserAdmin):
     add_form = CustomUserCreationForm
@@ -92,6 +95,15 @@ class ArticleAdmin(admin.ModelAdmin):
     list_filter = ("category", "created_at")
     search_fields = ("title", "content", "author__username")
     ordering = ("-created_at",)
+    readonly_fields = COUNTER_FIELDS
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Likes and views move the counters meanwhile; only api/articles.py writes them
+            obj.save(update_fields=[f.name for f in obj._meta.concrete_fields
+                                    if not f.primary_key and f.name not in COUNTER_FIELDS])
+        else:
+            obj.save()
 
 
 @admin.register(ArticleLike)
@@ -100,6 +112,23 @@ class ArticleLikeAdmin(admin.ModelAdmin):
     list_filter = ("created_at",)
     search_fields = ("article__title", "user__username")
 
+    # Through api/articles.py, so the article's like_count follows
+    def get_readonly_fields(self, request, obj=None):
+        return ("article", "user") if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save()
+        else:
+            obj.pk = add_like(obj.article, obj.user).pk
+
+    def delete_model(self, request, obj):
+        remove_like(obj)
+
+    def delete_queryset(self, request, queryset):
+        for like in queryset:
+            remove_like(like)
+
 
 @admin.register(ArticleRating)
 class ArticleRatingAdmin(admin.ModelAdmin):
@@ -107,6 +136,19 @@ class ArticleRatingAdmin(admin.ModelAdmin):
     list_filter = ("rating", "created_at")
     search_fields = ("article__title", "user__username")
 
+    # Through api/articles.py, so the article's rating counters follow
+    def save_model(self, request, obj, form, change):
+        if change and {"article", "user"} & set(form.changed_data):
+            remove_rating(ArticleRating.objects.get(pk=obj.pk))
+        obj.pk = rate_article(obj.article, obj.user, obj.rating).pk
+
+    def delete_model(self, request, obj):
+        remove_rating(obj)
+
+    def delete_queryset(self, request, queryset):
+        for rating in queryset:
+            remove_rating(rating)
+
 
 @admin.register(ArticleView)
 class ArticleViewAdmin(admin.ModelAdmin):
@@ -114,11 +156,29 @@ class ArticleViewAdmin(admin.ModelAdmin):
     list_filter = ("viewed_at",)
     search_fields = ("article__title", "user__username")
 
+    # Through api/articles.py, so the article's view_count follows
+    def get_readonly_fields(self, request, obj=None):
+        return ("article",) if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save()
+        else:
+            save_view(obj)
+
+    def delete_model(self, request, obj):
+        remove_view(obj)
+
+    def delete_queryset(self, request, queryset):
+        for view in queryset:
+            remove_view(view)
+
 
 
 
 from django.contrib import admin
 from .models import UserScore
+from .scoring import EMOTION_LABELS, unpack_probabilities
 
 
 @admin.register(UserScore)
@@ -146,12 +206,13 @@ class UserScoreAdmin(admin.ModelAdmin):
     readonly_fields = (
         'created_at',
         'total_score',
+        'text_emotion_distribution',
     )
 
     # Form layout (fields arranged in groups)
     fieldsets = (
         ("User Information", {
-            "fields": ("user",)
+            "fields": ("user", "assessment")
         }),
 
         ("Basic Information Scores (10 points)", {
@@ -167,7 +228,8 @@ class UserScoreAdmin(admin.ModelAdmin):
                 
                 "text_sentiment_score",
                 "text_emotion_score",
-                "text_negative_keywords_score"
+                "text_negative_keywords_score",
+                "text_emotion_distribution"
             )
         }),
 
@@ -205,6 +267,47 @@ class UserScoreAdmin(admin.ModelAdmin):
     # Date hierarchy for easy navigation
     date_hierarchy = 'created_at'
 
+    @admin.display(description='Text emotion probabilities')
+    def text_emotion_distribution(self, obj):
+        if not obj.text_emotion_probs:
+            return '-'
+        probabilities = unpack_probabilities(obj.text_emotion_probs)
+        return ', '.join(f"{label}: {p:.2f}" for label, p in zip(EMOTION_LABELS, probabilities))
+
+
+from .models import ScoringJob
+
+
+@admin.register(ScoringJob)
+class ScoringJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'assessment', 'status', 'attempts', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+
+from .models import Blob
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'created_at', 'last_referenced_at')
+    list_filter = ('refcount',)
+    search_fields = ('name', 'digest')
+    readonly_fields = ('name', 'digest', 'size', 'created_at')
+    ordering = ('-created_at',)
+
+
+from .models import AudioUpload
+
+
+@admin.register(AudioUpload)
+class AudioUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'filename', 'received', 'size', 'status', 'created_at', 'expires_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('id', 'received', 'locked_until', 'created_at', 'updated_at')
+    ordering = ('-created_at',)
+
 
 
 
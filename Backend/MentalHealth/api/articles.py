@@ -0,0 +1,155 @@
+"""
+Article like, view and rating counters.
+
+Article keeps like_count, view_count, rating_sum and rating_count, so the
+article list reads them instead of counting rows for every article. The
+helpers here write an ArticleLike/ArticleView/ArticleRating and move the
+counter with an F() update, in the same transaction. Two requests cannot
+lose each other's increment, and a rolled-back write leaves the counter
+as it was.
+
+The admin goes through them too. Writes that bypass them make the
+counters drift: bulk deletes, raw SQL, the shell. A decrement stops at
+0 rather than failing, and `manage.py reconcile_article_counters`
+recounts drifted counters from the rows.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Article, ArticleLike, ArticleRating, ArticleView
+
+COUNTER_FIELDS = ('like_count', 'view_count', 'rating_sum', 'rating_count')
+
+
+def _add(article_id, **deltas):
+    # Clamped: a counter that drifted low must not fail the unlike that finds it
+    Article.objects.filter(pk=article_id).update(
+        **{field: F(field) + delta if delta >= 0 else Greatest(F(field) + delta, 0)
+           for field, delta in deltas.items()}
+    )
+
+
+def counters(article_id):
+    return Article.objects.filter(pk=article_id).values(*COUNTER_FIELDS).get()
+
+
+def add_like(article, user):
+    """Returns the user's ArticleLike of the article, created if needed"""
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                like = ArticleLike.objects.create(article=article, user=user)
+        except IntegrityError:
+            # Already liked, by an earlier or concurrent request that counted it
+            return ArticleLike.objects.get(article=article, user=user)
+        _add(article.pk, like_count=1)
+        return like
+
+
+def remove_like(like):
+    with transaction.atomic():
+        deleted, _ = ArticleLike.objects.filter(pk=like.pk).delete()
+        if deleted:
+            _add(like.article_id, like_count=-1)
+        return bool(deleted)
+
+
+def toggle_like(article, user):
+    """Like the article, or unlike it if the user already does. Returns (liked, like_count)."""
+    with transaction.atomic():
+        existing = ArticleLike.objects.filter(article=article, user=user).first()
+        liked = not (existing is not None and remove_like(existing))
+        if liked:
+            add_like(article, user)
+        return liked, counters(article.pk)['like_count']
+
+
+def save_view(view):
+    """Save a new ArticleView and count it. Returns the new view count."""
+    with transaction.atomic():
+        view.save()
+        _add(view.article_id, view_count=1)
+        return counters(view.article_id)['view_count']
+
+
+def record_view(article, user_id=None):
+    """Returns the new view count"""
+    return save_view(ArticleView(article=article, user_id=user_id))
+
+
+def remove_view(view):
+    with transaction.atomic():
+        deleted, _ = ArticleView.objects.filter(pk=view.pk).delete()
+        if deleted:
+            _add(view.article_id, view_count=-1)
+
+
+def rate_article(article, user, rating):
+    """Set the user's rating of the article. Returns the ArticleRating."""
+    with transaction.atomic():
+        existing = ArticleRating.objects.select_for_update().filter(article=article, user=user).first()
+        if existing is not None:
+            _add(article.pk, rating_sum=rating - existing.rating)
+            existing.rating = rating
+            existing.save(update_fields=['rating'])
+            return existing
+        try:
+            with transaction.atomic():
+                created = ArticleRating.objects.create(article=article, user=user, rating=rating)
+        except IntegrityError:
+            # A concurrent request created it: update that one instead
+            return rate_article(article, user, rating)
+        _add(article.pk, rating_sum=rating, rating_count=1)
+        return created
+
+
+def remove_rating(rating):
+    with transaction.atomic():
+        deleted, _ = ArticleRating.objects.filter(pk=rating.pk).delete()
+        if deleted:
+            _add(rating.article_id, rating_sum=-rating.rating, rating_count=-1)
+
+
+def counted_values(queryset):
+    """The counters recomputed from the like, view and rating rows"""
+    def per_article(model, aggregate):
+        return Coalesce(Subquery(
+            model.objects.filter(article=OuterRef('pk')).order_by().values('article')
+            .annotate(value=aggregate).values('value')
+        ), Value(0), output_field=IntegerField())
+
+    return queryset.annotate(
+        counted_like_count=per_article(ArticleLike, Count('pk')),
+        counted_view_count=per_article(ArticleView, Count('pk')),
+        counted_rating_sum=per_article(ArticleRating, Sum('rating')),
+        counted_rating_count=per_article(ArticleRating, Count('pk')),
+    )
+
+
+def reconcile(queryset=None, dry_run=False):
+    """
+    Set the counters that drifted to the counted values. Returns
+    {article id: {field: (stored, counted)}} of what was wrong.
+    """
+    queryset = Article.objects.all() if queryset is None else queryset
+    fields = list(COUNTER_FIELDS)
+    drifted = {}
+    for row in counted_values(queryset.order_by('pk')).values('pk', *fields, *[f'counted_{f}' for f in fields]).iterator():
+        if all(row[f] == row[f'counted_{f}'] for f in fields):
+            continue
+        if dry_run:
+            drifted[row['pk']] = {f: (row[f], row[f'counted_{f}']) for f in fields if row[f] != row[f'counted_{f}']}
+            continue
+        with transaction.atomic():
+            # Locked, then counted again: a like committing meanwhile is either
+            # counted here or waits and applies its increment afterwards
+            article = Article.objects.select_for_update().filter(pk=row['pk'])
+            locked = counted_values(article).values(*fields, *[f'counted_{f}' for f in fields]).first()
+            if locked is None:
+                continue
+            changes = {f: (locked[f], locked[f'counted_{f}']) for f in fields if locked[f] != locked[f'counted_{f}']}
+            if changes:
+                article.update(**{f: counted for f, (_, counted) in changes.items()})
+                drifted[row['pk']] = changes
+    return drifted
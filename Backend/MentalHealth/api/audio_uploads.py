@@ -0,0 +1,212 @@
+"""
+Resumable chunked upload of audio recordings.
+
+    POST /audio-uploads/                      start: user_id, size, content_type, filename[, assessment_id]
+    PUT  /audio-uploads/<id>/                 one chunk as the raw body, with headers
+                                                  Upload-Offset: <where the chunk starts>
+                                                  Upload-Checksum: sha256 <base64 digest of the chunk>
+    GET|HEAD /audio-uploads/<id>/             the committed offset (also as an Upload-Offset header)
+    POST /audio-uploads/<id>/finalize/        when every byte is in[, sha256 of the whole file, hex]
+
+The client sends chunks in order. After a network failure it asks for the
+committed offset and continues from there. A chunk counts all or nothing.
+It is streamed from the request straight into the partial file at its
+offset, hashed on the way. If it comes in short, or the checksum does not
+match, the file is cut back to the offset.
+
+One chunk is written at a time. A PUT claims the upload with a
+conditional UPDATE on (received = offset, no live lock), the same way
+scoring workers claim jobs. A second PUT for the same offset gets 409. A
+claim whose request died expires after AUDIO_UPLOAD_LOCK_SECONDS.
+Finalize moves the partial file into media storage without copying it,
+creates the AudioAnalysis and starts the voice analysis.
+"""
+import base64
+import binascii
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+
+from .models import AudioAnalysis, AudioUpload
+
+READ_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class PartialUploadFile(File):
+    """A finished partial file; storage moves it into place like a TemporaryUploadedFile"""
+
+    def temporary_file_path(self):
+        return self.name
+
+
+def partial_path(upload):
+    return os.path.join(settings.AUDIO_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def start_upload(user, assessment, size, content_type, filename):
+    if size <= 0:
+        raise UploadError("size must be a positive number of bytes")
+    if size > settings.AUDIO_UPLOAD_MAX_BYTES:
+        raise UploadError(
+            f"Recording is larger than {settings.AUDIO_UPLOAD_MAX_BYTES} bytes",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    upload = AudioUpload.objects.create(
+        user=user,
+        assessment=assessment,
+        size=size,
+        content_type=content_type,
+        filename=os.path.basename(filename or 'recording.m4a')[:255],
+        expires_at=timezone.now() + timedelta(hours=settings.AUDIO_UPLOAD_EXPIRY_HOURS),
+    )
+    os.makedirs(settings.AUDIO_UPLOAD_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def parse_checksum(header):
+    """Upload-Checksum: 'sha256 <base64>' -> digest bytes"""
+    algorithm, _, value = (header or '').strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError("Upload-Checksum must be 'sha256 <base64 digest>'")
+    try:
+        digest = base64.b64decode(value.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        digest = b''
+    if len(digest) != hashlib.sha256().digest_size:
+        raise UploadError("Upload-Checksum is not a base64 SHA-256 digest")
+    return digest
+
+
+def _claim(upload_id, offset):
+    now = timezone.now()
+    return AudioUpload.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        pk=upload_id, status=AudioUpload.UPLOADING, received=offset,
+    ).update(locked_until=now + timedelta(seconds=settings.AUDIO_UPLOAD_LOCK_SECONDS))
+
+
+def write_chunk(upload_id, offset, length, checksum, stream):
+    """
+    Append one chunk of `length` bytes from `stream` at `offset`. Returns the
+    new committed offset.
+    """
+    upload = AudioUpload.objects.filter(pk=upload_id).first()
+    if upload is None:
+        raise UploadError("Upload not found", status.HTTP_404_NOT_FOUND)
+    if upload.status != AudioUpload.UPLOADING:
+        raise UploadError(f"Upload is {upload.status}", status.HTTP_409_CONFLICT, upload.received)
+    if length <= 0:
+        raise UploadError("Empty chunk")
+    if length > settings.AUDIO_UPLOAD_CHUNK_MAX_BYTES:
+        raise UploadError(
+            f"Chunks are at most {settings.AUDIO_UPLOAD_CHUNK_MAX_BYTES} bytes",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, upload.received,
+        )
+    if offset + length > upload.size:
+        raise UploadError("Chunk runs past the declared size", offset=upload.received)
+    if not _claim(upload_id, offset):
+        upload.refresh_from_db()
+        raise UploadError(
+            f"Upload-Offset {offset} does not match the committed offset {upload.received}, "
+            f"or another chunk is being written",
+            status.HTTP_409_CONFLICT, upload.received,
+        )
+
+    committed = offset
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(partial_path(upload), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                data = stream.read(min(READ_BYTES, length - written))
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+                written += len(data)
+            if written < length:
+                f.truncate(offset)
+                raise UploadError(f"Chunk ended after {written} of {length} bytes", offset=offset)
+            if digest.digest() != checksum:
+                f.truncate(offset)
+                raise UploadError("Chunk checksum mismatch", offset=offset)
+            # Anything past the chunk is left over from a request that died mid-write
+            f.truncate(offset + length)
+            f.flush()
+            os.fsync(f.fileno())
+        committed = offset + length
+    finally:
+        AudioUpload.objects.filter(pk=upload_id, received=offset).update(
+            received=committed, locked_until=None, updated_at=timezone.now()
+        )
+    return committed
+
+
+def finalize_upload(upload_id, sha256_hex=None):
+    """
+    Turn a complete upload into an AudioAnalysis. Finalizing again returns
+    the same analysis.
+    """
+    upload = AudioUpload.objects.select_related('user', 'assessment', 'analysis').filter(pk=upload_id).first()
+    if upload is None:
+        raise UploadError("Upload not found", status.HTTP_404_NOT_FOUND)
+    if upload.status == AudioUpload.FINALIZED:
+        return upload.analysis, False
+    if upload.received != upload.size:
+        raise UploadError(
+            f"Only {upload.received} of {upload.size} bytes have arrived", status.HTTP_409_CONFLICT, upload.received
+        )
+    # Claimed like a chunk, so two finalize calls cannot both create an analysis
+    if not _claim(upload_id, upload.size):
+        raise UploadError("Upload is busy", status.HTTP_409_CONFLICT, upload.received)
+
+    path = partial_path(upload)
+    try:
+        if sha256_hex:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                while data := f.read(READ_BYTES):
+                    digest.update(data)
+            if digest.hexdigest() != sha256_hex.lower():
+                # Every chunk matched but the whole does not: start again from 0
+                open(path, 'wb').close()
+                AudioUpload.objects.filter(pk=upload_id).update(received=0, updated_at=timezone.now())
+                raise UploadError("File checksum mismatch; upload it again from offset 0", offset=0)
+
+        analysis = AudioAnalysis(user=upload.user, assessment=upload.assessment, status='processing')
+        analysis.audio_file.save(upload.filename, PartialUploadFile(None, name=path), save=False)
+        analysis.save()
+        AudioUpload.objects.filter(pk=upload_id).update(
+            status=AudioUpload.FINALIZED, analysis=analysis, locked_until=None, updated_at=timezone.now()
+        )
+    except BaseException:
+        AudioUpload.objects.filter(pk=upload_id).update(locked_until=None)
+        raise
+    return analysis, True
+
+
+def expire_uploads(now=None):
+    """Delete unfinished uploads past their expiry, with their partial files"""
+    expired = AudioUpload.objects.filter(status=AudioUpload.UPLOADING, expires_at__lt=now or timezone.now())
+    count = 0
+    for upload in expired:
+        if os.path.exists(partial_path(upload)):
+            os.remove(partial_path(upload))
+        upload.delete()
+        count += 1
+    return count
@@ -0,0 +1,154 @@
+"""
+Database-backed job queue for assessment scoring.
+
+create_assessment only saves the Assessment and a ScoringJob, then answers
+202. A worker (`manage.py run_scoring_worker`) claims jobs one at a time,
+runs the model outside any transaction, and then saves the UserScore and
+marks the job done in one short transaction. A write transaction is never
+held open during inference, so on SQLite other writers are not blocked.
+
+Claims are plain conditional UPDATEs, so several workers can share the
+table without row locks. A claim lasts SCORING_JOB_VISIBILITY_TIMEOUT
+seconds. A job whose worker died is claimed again once that time has
+passed, and the dead worker's late result is thrown away. Failures are
+retried with exponential back-off, up to the job's max_attempts. When
+inference is busy (InferenceRejected), the job is put back without using
+up an attempt.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from EmotionDetection.admission import InferenceRejected
+
+from .models import Assessment, ScoringJob
+from .scoring import apply_voice_scores
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_scoring(assessment):
+    """Queue the scoring of a saved assessment"""
+    return ScoringJob.objects.create(
+        assessment=assessment,
+        max_attempts=settings.SCORING_JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim_next(worker_id, visibility_timeout=None):
+    """
+    Claim the oldest job that is queued and due, or running with an expired
+    claim. Returns None when there is nothing to do.
+    """
+    if visibility_timeout is None:
+        visibility_timeout = settings.SCORING_JOB_VISIBILITY_TIMEOUT
+    now = timezone.now()
+    candidates = (
+        ScoringJob.objects
+        .filter(status__in=[ScoringJob.QUEUED, ScoringJob.RUNNING], available_at__lte=now)
+        .order_by('available_at', 'created_at')
+        .values_list('pk', 'status', 'attempts', 'max_attempts')[:10]
+    )
+    for pk, job_status, attempts, max_attempts in candidates:
+        # Only the worker whose UPDATE still sees the row unchanged gets the job
+        unchanged = ScoringJob.objects.filter(
+            pk=pk, status=job_status, attempts=attempts, available_at__lte=now
+        )
+        if attempts >= max_attempts:
+            # The last attempt's worker never reported back
+            unchanged.update(
+                status=ScoringJob.FAILED, finished_at=now, locked_by='',
+                last_error=f"Gave up after {attempts} attempts (visibility timeout expired)",
+            )
+            continue
+        claimed = unchanged.update(
+            status=ScoringJob.RUNNING,
+            attempts=attempts + 1,
+            locked_by=worker_id,
+            available_at=now + timedelta(seconds=visibility_timeout),
+            started_at=now,
+        )
+        if claimed:
+            return ScoringJob.objects.select_related('assessment__user').get(pk=pk)
+    return None
+
+
+def _still_claimed(job):
+    """Filter matching job only while the claim that fetched it is current"""
+    return ScoringJob.objects.filter(
+        pk=job.pk, status=ScoringJob.RUNNING, attempts=job.attempts, locked_by=job.locked_by
+    )
+
+
+def retry_or_fail(job, error, delay=None, count_attempt=True):
+    """Put a claimed job back in the queue, or fail it when it is out of attempts"""
+    now = timezone.now()
+    attempts = job.attempts if count_attempt else job.attempts - 1
+    if attempts >= job.max_attempts:
+        updated = _still_claimed(job).update(
+            status=ScoringJob.FAILED, finished_at=now, locked_by='', last_error=error
+        )
+        job.status = ScoringJob.FAILED
+    else:
+        if delay is None:
+            delay = settings.SCORING_JOB_RETRY_DELAY * 2 ** (attempts - 1)
+        updated = _still_claimed(job).update(
+            status=ScoringJob.QUEUED, attempts=attempts, locked_by='', last_error=error,
+            available_at=now + timedelta(seconds=delay),
+        )
+        job.status = ScoringJob.QUEUED
+    job.attempts = attempts
+    return bool(updated)
+
+
+def run_job(job):
+    """Score a claimed job's assessment. Returns the job with its new status."""
+    # views imports this module to enqueue jobs
+    from .views import calculate_user_score
+    from .voice_jobs import latest_voice_features
+
+    try:
+        # The slow part: model inference, with no transaction open
+        user_score = calculate_user_score(job.assessment)
+    except InferenceRejected as e:
+        logger.warning(f"Scoring job {job.pk} deferred, inference busy: {str(e)}")
+        retry_or_fail(job, f"Inference busy: {str(e)}", delay=e.retry_after, count_attempt=False)
+        return job
+    except Exception as e:
+        logger.exception(f"Scoring job {job.pk} failed on attempt {job.attempts}")
+        retry_or_fail(job, f"{type(e).__name__}: {str(e)}")
+        return job
+
+    with transaction.atomic():
+        # Serialises with voice_jobs.store_result, so a recording analysed meanwhile is not missed
+        Assessment.objects.select_for_update().filter(pk=job.assessment_id).first()
+        apply_voice_scores(user_score, latest_voice_features([job.assessment_id]).get(job.assessment_id))
+        finished = _still_claimed(job).update(
+            status=ScoringJob.DONE, finished_at=timezone.now(), locked_by='', last_error=''
+        )
+        if not finished:
+            # The claim expired and another worker owns the job now
+            logger.warning(f"Scoring job {job.pk} lost its claim, discarding the result")
+            job.refresh_from_db()
+            return job
+        user_score.save()
+
+    job.status = ScoringJob.DONE
+    return job
+
+
+def run_next(worker_id, visibility_timeout=None):
+    """Claim and run one job; None when the queue is empty"""
+    job = claim_next(worker_id, visibility_timeout)
+    if job is None:
+        return None
+    return run_job(job)
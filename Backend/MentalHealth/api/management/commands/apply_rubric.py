@@ -0,0 +1,172 @@
+import itertools
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q
+
+from api.models import UserScore
+from api.rubric import CURRENT_RUBRIC_VERSION, get_rubric
+from api.scoring import unpack_probability_matrix
+from api.voice_jobs import latest_voice_features
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Move UserScores to another rubric version (see api/rubric.py), rewriting only the "
+        "columns of changed components, for the rows they affect. Never runs the model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", type=int, default=CURRENT_RUBRIC_VERSION,
+                            help="Target rubric version (default: the current one)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per bulk_update for text components")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change, then roll back")
+
+    def handle(self, *args, **options):
+        try:
+            target = get_rubric(options["to"])
+        except KeyError as e:
+            raise CommandError(str(e))
+
+        versions = (
+            UserScore.objects.exclude(rubric_version=target.version)
+            .values_list("rubric_version", flat=True).distinct().order_by("rubric_version")
+        )
+        versions = list(versions)
+        if not versions:
+            self.stdout.write(self.style.SUCCESS(f"Every score already uses rubric {target.version}"))
+            return
+
+        for version in versions:
+            try:
+                source = get_rubric(version)
+            except KeyError:
+                self.stderr.write(f"Skipping scores of unknown rubric version {version}")
+                continue
+            with transaction.atomic():
+                self.migrate(source, target, options)
+                if options["dry_run"]:
+                    transaction.set_rollback(True)
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written"))
+
+    def migrate(self, source, target, options):
+        removed = set(source.components) - set(target.components)
+        if removed:
+            raise CommandError(f"Rubric {target.version} drops components {sorted(removed)}; rescore_assessments instead")
+        changed = target.changed_components(source)
+        for name in changed:
+            if name in source.components and source.columns[name] != target.columns[name]:
+                raise CommandError(f"Component {name!r} moves to another column; rescore_assessments instead")
+
+        rows = UserScore.objects.filter(rubric_version=source.version)
+        eligible = rows
+        kinds = {target.components[name]['kind'] for name in changed}
+        if kinds & {'answer', 'keywords'}:
+            eligible = eligible.filter(assessment__isnull=False)
+        if kinds & {'emotion', 'sentiment'}:
+            # A text scored before vectors were stored would need the model again
+            eligible = eligible.filter(
+                Q(text_emotion_probs__isnull=False)
+                | Q(assessment__expression_analysis__isnull=True)
+                | Q(assessment__expression_analysis__regex=r'^\s*$')
+            )
+        skipped = rows.count() - eligible.count()
+
+        self.stdout.write(f"Rubric {source.version} -> {target.version}: "
+                          f"{', '.join(changed) if changed else 'no component changes'}")
+        for name in changed:
+            kind = target.components[name]['kind']
+            if kind == 'answer':
+                count = self.apply_answer(name, source, target, eligible)
+            elif kind == 'constant':
+                count = self.apply_column(eligible, target, name, target.constant_score(name))
+            else:
+                count = self.apply_text(name, target, eligible, options["chunk_size"])
+            self.stdout.write(f"  {name} ({target.columns[name]}): {count} rows")
+
+        moved = eligible.update(rubric_version=target.version)
+        self.stdout.write(self.style.SUCCESS(f"  {moved} scores now on rubric {target.version}"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"  {skipped} scores stay on rubric {source.version}: their assessment or stored "
+                f"emotion vector is missing (run rescore_assessments for them)"
+            ))
+
+    def apply_column(self, queryset, rubric, name, value):
+        """Set one component column in SQL, with total_score summed again from the row's columns"""
+        column = rubric.columns[name]
+        others = [F(other) for other in rubric.columns.values() if other != column]
+        total = reduce(lambda a, b: a + b, others, value)
+        return queryset.update(**{column: value, 'total_score': total})
+
+    def apply_answer(self, name, source, target, eligible):
+        """One UPDATE per answer whose score changed"""
+        spec = target.components[name]
+        old_spec = source.components.get(name)
+        field = f"assessment__{spec['answer']}"
+        # With a new component or another answer field, every answer has to be rewritten
+        compare = old_spec is not None and old_spec['answer'] == spec['answer']
+
+        answers = {answer.lower() for answer in spec['scores']}
+        if compare:
+            answers |= {answer.lower() for answer in old_spec['scores']}
+
+        count = 0
+        for answer in sorted(answers):
+            new = target.answer_score(name, answer)
+            if compare and source.answer_score(name, answer) == new:
+                continue
+            count += self.apply_column(eligible.filter(**{f"{field}__iexact": answer}), target, name, new)
+
+        # Everything else (other answers, blanks) scores the default
+        if not compare or spec['default'] != old_spec['default']:
+            known = reduce(or_, (Q(**{f"{field}__iexact": answer}) for answer in answers), Q(pk__in=[]))
+            count += self.apply_column(eligible.exclude(known), target, name, spec['default'])
+        return count
+
+    def apply_text(self, name, target, eligible, chunk_size):
+        """
+        Recompute a text or voice component in Python from the stored text, emotion
+        vectors or voice features; write only changed rows
+        """
+        column = target.columns[name]
+        columns = list(target.columns.values())
+        kind = target.components[name]['kind']
+        source_field = {
+            'keywords': 'assessment__expression_analysis', 'voice': 'assessment_id',
+        }.get(kind, 'text_emotion_probs')
+
+        rows = eligible.order_by('pk').values_list('pk', source_field, *columns)
+        count = 0
+        for chunk in _chunked(rows.iterator(chunk_size=chunk_size), chunk_size):
+            inputs = [row[1] for row in chunk]
+            if kind == 'keywords':
+                scores = target.keyword_scores(name, inputs)
+            elif kind == 'voice':
+                features = latest_voice_features([i for i in inputs if i is not None])
+                scores = np.array([target.voice_score(name, features.get(i)) for i in inputs], dtype=float)
+            else:
+                scores = target.text_model_scores(name, unpack_probability_matrix(inputs))
+            current = np.array([row[2:] for row in chunk], dtype=float)
+            old = current[:, columns.index(column)]
+
+            changed = np.flatnonzero(~np.isclose(old, scores))
+            totals = current.sum(axis=1) - old + scores
+            updates = [
+                UserScore(pk=chunk[i][0], **{column: float(scores[i]), 'total_score': float(totals[i])})
+                for i in changed
+            ]
+            UserScore.objects.bulk_update(updates, [column, 'total_score'])
+            count += len(updates)
+        return count
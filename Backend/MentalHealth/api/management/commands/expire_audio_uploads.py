@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.audio_uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable audio uploads that were never finished before they expired, with their partial files"
+
+    def handle(self, *args, **options):
+        count = expire_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Expired {count} unfinished audio uploads"))
@@ -0,0 +1,128 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Blob
+from api.storage import BLOB_PREFIX, blob_root, blob_storages, is_blob_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount references to content-addressed media blobs (see api/storage.py) from every "
+        "file field, then delete the blobs nothing uses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age", type=float, default=settings.MEDIA_GC_MIN_AGE,
+                            help="Seconds since a blob was last saved or released before it may be touched")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be removed, change nothing")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+
+        references = self.count_references()
+        self.stdout.write(f"{sum(references.values())} references to {len(references)} blobs")
+
+        corrected = self.reconcile(references, cutoff, dry_run)
+        removed, freed = self.remove_unused(references, cutoff, dry_run)
+        stray, stray_bytes = self.remove_stray_files(references, cutoff, dry_run)
+
+        verb = "Would remove" if dry_run else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{corrected} refcounts corrected. {verb} {removed} unused blobs and {stray} stray files, "
+            f"{(freed + stray_bytes) / 1024 / 1024:.1f} MB"
+        ))
+
+    def count_references(self):
+        references = Counter()
+        for model, field in blob_storages():
+            names = (
+                model._base_manager.filter(**{f"{field.attname}__startswith": BLOB_PREFIX})
+                .values_list(field.attname, flat=True)
+            )
+            references.update(names.iterator())
+        return references
+
+    def reconcile(self, references, cutoff, dry_run):
+        """Set refcount to the counted references; blobs touched after cutoff are left alone"""
+        corrected = 0
+        known = set()
+        for name, refcount in Blob.objects.filter(last_referenced_at__lt=cutoff).values_list("name", "refcount").iterator():
+            known.add(name)
+            actual = references.get(name, 0)
+            if refcount == actual:
+                continue
+            corrected += 1
+            self.stdout.write(f"  {name}: refcount {refcount} -> {actual}")
+            if not dry_run:
+                # Unchanged since it was read, so a concurrent save is not lost
+                Blob.objects.filter(pk=name, refcount=refcount, last_referenced_at__lt=cutoff).update(refcount=actual)
+
+        missing_rows = set(references) - known - set(Blob.objects.filter(pk__in=list(references)).values_list("name", flat=True))
+        for name in sorted(missing_rows):
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.exists(path):
+                self.stderr.write(f"  {name} is referenced but missing on disk")
+                continue
+            corrected += 1
+            self.stdout.write(f"  {name}: no row, refcount -> {references[name]}")
+            if not dry_run:
+                Blob.objects.get_or_create(name=name, defaults={
+                    'digest': os.path.splitext(os.path.basename(name))[0],
+                    'size': os.path.getsize(path),
+                    'refcount': references[name],
+                })
+        return corrected
+
+    def remove_unused(self, references, cutoff, dry_run):
+        removed = freed = 0
+        unused = Blob.objects.filter(last_referenced_at__lt=cutoff)
+        if not dry_run:
+            unused = unused.filter(refcount=0)
+        # A dry run has not written the corrected refcounts, so it goes by the counted references
+        unused = unused.values_list("name", "size")
+        for name, size in list(unused):
+            if references.get(name):
+                continue
+            if not dry_run:
+                with transaction.atomic():
+                    # A save that counts a reference first makes this delete nothing. One that
+                    # comes later waits for the commit and then writes the file again.
+                    deleted, _ = Blob.objects.filter(pk=name, refcount=0, last_referenced_at__lt=cutoff).delete()
+                    if not deleted:
+                        continue
+                    path = os.path.join(settings.MEDIA_ROOT, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def remove_stray_files(self, references, cutoff, dry_run):
+        """Files with no Blob row: interrupted saves, and leftovers in blobs/tmp"""
+        root = blob_root()
+        if not os.path.isdir(root):
+            return 0, 0
+        stray = stray_bytes = 0
+        cutoff_timestamp = cutoff.timestamp()
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                in_tmp = name.startswith(f"{BLOB_PREFIX}tmp/")
+                if not in_tmp and (not is_blob_name(name) or references.get(name) or Blob.objects.filter(pk=name).exists()):
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff_timestamp:
+                    continue
+                stray += 1
+                stray_bytes += stat.st_size
+                if not dry_run:
+                    os.remove(path)
+        return stray, stray_bytes
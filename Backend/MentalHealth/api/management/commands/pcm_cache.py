@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import pcm_cache, voice
+from api.models import AudioAnalysis
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage the cache of decoded recordings (see api/pcm_cache.py): report its size, prewarm it "
+        "with stored recordings, evict it down to PCM_CACHE_MAX_BYTES, or purge it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["stats", "prewarm", "evict", "purge"])
+        parser.add_argument("--user", type=int, help="prewarm: only this user's recordings")
+        parser.add_argument("--limit", type=int, help="prewarm: at most this many recordings, newest first")
+
+    def handle(self, *args, **options):
+        cache_dir, max_bytes = settings.PCM_CACHE_DIR, settings.PCM_CACHE_MAX_BYTES
+        action = options["action"]
+
+        if action == "prewarm":
+            if max_bytes <= 0:
+                self.stderr.write("PCM_CACHE_MAX_BYTES is 0, the cache is off")
+                return
+            self.prewarm(cache_dir, max_bytes, options["user"], options["limit"])
+        elif action == "evict":
+            removed, freed = pcm_cache.evict(cache_dir, max_bytes)
+            self.stdout.write(self.style.SUCCESS(f"Evicted {removed} recordings, {freed / 1024 / 1024:.1f} MB"))
+        elif action == "purge":
+            removed, freed = pcm_cache.purge(cache_dir)
+            self.stdout.write(self.style.SUCCESS(f"Purged {removed} recordings, {freed / 1024 / 1024:.1f} MB"))
+
+        cached = pcm_cache.entries(cache_dir)
+        self.stdout.write(
+            f"{len(cached)} recordings cached, {sum(size for _, size, _ in cached) / 1024 / 1024:.1f} MB "
+            f"of {max_bytes / 1024 / 1024:.1f} MB"
+        )
+
+    def prewarm(self, cache_dir, max_bytes, user_id, limit):
+        queryset = AudioAnalysis.objects.exclude(audio_file='').order_by('-timestamp', '-pk')
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+        names = list(dict.fromkeys(queryset.values_list('audio_file', flat=True)))[:limit]
+
+        decoded = hits = failed = 0
+        storage = AudioAnalysis._meta.get_field('audio_file').storage
+        for name in names:
+            path = storage.path(name)
+            try:
+                if pcm_cache.load(cache_dir, pcm_cache.content_key(path)) is not None:
+                    hits += 1
+                    continue
+                pcm_cache.decoded(path, cache_dir, max_bytes,
+                                  settings.VOICE_DECODE_CHUNK_SECONDS, settings.FFMPEG_BINARY)
+                decoded += 1
+            except (OSError, voice.AudioDecodeError) as e:
+                failed += 1
+                self.stderr.write(f"  {name}: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Decoded {decoded} recordings, {hits} already cached, {failed} failed"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.articles import reconcile
+from api.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount each article's like, view and rating counters from the ArticleLike/ArticleView/ArticleRating "
+        "rows and repair the ones that drifted (see api/articles.py)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--article", type=int, help="Only this article")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without repairing it")
+
+    def handle(self, *args, **options):
+        queryset = Article.objects.all()
+        if options["article"]:
+            queryset = queryset.filter(pk=options["article"])
+
+        drifted = reconcile(queryset, dry_run=options["dry_run"])
+        for article_id, changes in drifted.items():
+            details = ", ".join(f"{field} {stored} -> {counted}" for field, (stored, counted) in changes.items())
+            self.stdout.write(f"  article {article_id}: {details}")
+
+        verb = "would be repaired" if options["dry_run"] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} of {queryset.count()} articles {verb}"))
@@ -0,0 +1,294 @@
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Assessment, UserScore
+from api.rubric import get_rubric
+from api.scoring import (
+    pack_probabilities, probabilities_from_result, rubric_arrays, unpack_probability_matrix, voice_scores,
+)
+from api.voice_jobs import latest_voice_features
+from EmotionDetection.admission import InferenceRejected
+from EmotionDetection.long_text import analyze_texts
+
+# Everything calculate_user_score writes, apart from the image and voice scores
+RUBRIC_FIELDS = [
+    'sleep_score', 'mood_score', 'mood_label', 'text_label', 'text_sentiment_score',
+    'text_emotion_score', 'text_negative_keywords_score', 'text_emotion_probs', 'total_score',
+    'rubric_version',
+]
+COMPARED_FIELDS = [
+    'sleep_score', 'mood_score', 'text_sentiment_score', 'text_emotion_score',
+    'text_negative_keywords_score', 'total_score',
+]
+
+INFERENCE_RETRIES = 5
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class DistributionShift:
+    """Old and new scores of every rescored assessment, for the dry-run report"""
+
+    def __init__(self):
+        self.before = {field: [] for field in COMPARED_FIELDS}
+        self.after = {field: [] for field in COMPARED_FIELDS}
+        self.new_totals = []
+
+    def add(self, before, after):
+        for field in COMPARED_FIELDS:
+            self.before[field].append(before[field])
+            self.after[field].append(after[field])
+
+    def lines(self):
+        if self.new_totals:
+            new = np.array(self.new_totals)
+            yield f"{len(new)} assessments had no score; new total_score mean {new.mean():.2f}"
+        if not self.before['total_score']:
+            return
+
+        before = np.array(self.before['total_score'])
+        after = np.array(self.after['total_score'])
+        changed = ~np.isclose(before, after)
+        yield f"{changed.sum()} of {len(before)} existing scores change"
+
+        yield f"{'':<36}{'before':>10}{'after':>10}{'delta':>10}"
+        for field in COMPARED_FIELDS:
+            old, new = np.array(self.before[field]), np.array(self.after[field])
+            yield f"{field + ' mean':<36}{old.mean():>10.2f}{new.mean():>10.2f}{new.mean() - old.mean():>+10.2f}"
+        for q in (10, 50, 90):
+            old, new = np.percentile(before, q), np.percentile(after, q)
+            yield f"{f'total_score p{q}':<36}{old:>10.2f}{new:>10.2f}{new - old:>+10.2f}"
+
+        edges = np.arange(0, 101, 10)
+        old_counts, _ = np.histogram(np.clip(before, 0, 100), edges)
+        new_counts, _ = np.histogram(np.clip(after, 0, 100), edges)
+        for low, old, new in zip(edges, old_counts, new_counts):
+            if old or new:
+                yield f"{f'total_score {low}-{low + 10}':<36}{old:>10}{new:>10}{new - old:>+10}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every assessment's UserScore with the current rubric in chunks: "
+        "batched emotion inference, vectorized rubric, bulk writes, resumable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Assessments per read, model batch and write")
+        parser.add_argument("--user", type=int, help="Only rescore this user's assessments")
+        parser.add_argument("--use-stored-probs", action="store_true",
+                            help="Reuse stored emotion vectors instead of running the model for those texts")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Write nothing; report how the score distribution would shift")
+        parser.add_argument("--checkpoint", default=settings.RESCORE_CHECKPOINT,
+                            help="Progress file, updated after every written chunk")
+        parser.add_argument("--resume", action="store_true", help="Continue after the last chunk in --checkpoint")
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many assessments (0 = all)")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        state = self.load_checkpoint(options) if options["resume"] else {
+            "last_assessment_id": 0, "processed": 0, "user": options["user"], "complete": False,
+        }
+        if state["complete"]:
+            self.stdout.write(self.style.SUCCESS("Checkpoint says the rescore already finished; nothing to do"))
+            return
+
+        queryset = Assessment.objects.filter(pk__gt=state["last_assessment_id"]).order_by("pk")
+        if options["user"]:
+            queryset = queryset.filter(user_id=options["user"])
+        rows = queryset.values_list("pk", "user_id", "sleep_quality", "mood", "expression_analysis")
+        if options["limit"]:
+            rows = rows[:options["limit"]]
+
+        self.shift = DistributionShift()
+        self.inferred = self.reused = 0
+        self.legacy_links, blocked_users = self.link_legacy_scores(queryset, options["dry_run"])
+        self.skipped = 0
+        started = time.perf_counter()
+        for chunk in chunked(rows.iterator(chunk_size=options["chunk_size"]), options["chunk_size"]):
+            kept = [row for row in chunk if row[1] not in blocked_users]
+            self.skipped += len(chunk) - len(kept)
+            if kept:
+                self.rescore_chunk(kept, options)
+            state["last_assessment_id"] = chunk[-1][0]
+            state["processed"] += len(chunk)
+            if not options["dry_run"]:
+                self.save_checkpoint(options["checkpoint"], state)
+            self.stderr.write(f"{state['processed']} assessments rescored, last id {state['last_assessment_id']}")
+
+        if not options["limit"] or not queryset.filter(pk__gt=state["last_assessment_id"]).exists():
+            state["complete"] = True
+            if not options["dry_run"]:
+                self.save_checkpoint(options["checkpoint"], state)
+
+        for line in self.shift.lines():
+            self.stdout.write(line)
+        if self.skipped:
+            self.stderr.write(
+                f"Skipped {self.skipped} assessments of users {sorted(blocked_users)}: they have scores with "
+                f"no assessment that could not be matched to one. Link those by hand, then rerun."
+            )
+        verb = "Would rescore" if options["dry_run"] else "Rescored"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {state['processed']} assessments in {time.perf_counter() - started:.1f}s "
+            f"({self.inferred} texts through the model, {self.reused} stored vectors reused)"
+        ))
+
+    def load_checkpoint(self, options):
+        try:
+            with open(options["checkpoint"]) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No checkpoint at {options['checkpoint']}")
+        if state.get("user") != options["user"]:
+            raise CommandError(f"Checkpoint was written for --user {state.get('user')}, not {options['user']}")
+        self.stdout.write(f"Resuming after assessment {state['last_assessment_id']} ({state['processed']} done)")
+        return state
+
+    def save_checkpoint(self, path, state):
+        # Written then renamed, so a crash never leaves half a checkpoint
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def link_legacy_scores(self, queryset, dry_run):
+        """
+        Scores written before UserScore.assessment existed have it NULL. Each
+        was created right after its assessment, so it is matched to the user's
+        latest unlinked assessment created before it. Returns
+        ({assessment id: score id} of the matches, users whose unlinked scores
+        did not all match). The matches are saved unless dry_run; a dry run
+        reads them from the returned dict instead.
+        """
+        links, blocked = {}, set()
+        unlinked = UserScore.objects.filter(
+            assessment__isnull=True, user_id__in=queryset.values("user_id")
+        ).order_by("user_id", "created_at", "pk").values_list("pk", "user_id", "created_at")
+        for user_id, scores in itertools.groupby(unlinked, key=lambda row: row[1]):
+            free = list(
+                Assessment.objects.filter(user_id=user_id, score__isnull=True)
+                .order_by("created_at", "pk").values_list("pk", "created_at")
+            )
+            for score_id, _, created_at in scores:
+                earlier = [assessment for assessment in free if assessment[1] <= created_at]
+                if not earlier:
+                    blocked.add(user_id)
+                    self.stderr.write(f"  Score {score_id} of user {user_id} matches no assessment")
+                    continue
+                free.remove(earlier[-1])
+                links[earlier[-1][0]] = score_id
+
+        if links:
+            self.stdout.write(f"{'Would link' if dry_run else 'Linked'} {len(links)} scores to their assessments")
+        if not dry_run:
+            with transaction.atomic():
+                for assessment_id, score_id in links.items():
+                    UserScore.objects.filter(pk=score_id, assessment__isnull=True).update(assessment_id=assessment_id)
+        return links, blocked
+
+    def infer(self, texts):
+        for attempt in range(INFERENCE_RETRIES):
+            try:
+                return analyze_texts(texts)
+            except InferenceRejected as e:
+                self.stderr.write(f"Inference busy, retrying in {e.retry_after}s")
+                time.sleep(e.retry_after)
+        raise CommandError(f"Inference still busy after {INFERENCE_RETRIES} attempts; rerun with --resume")
+
+    def rescore_chunk(self, chunk, options):
+        ids = [row[0] for row in chunk]
+        existing = {score.assessment_id: score for score in UserScore.objects.filter(assessment_id__in=ids)}
+        if options["dry_run"]:
+            # Legacy scores a real run would have linked first
+            legacy = {self.legacy_links[pk]: pk for pk in ids if pk in self.legacy_links}
+            for score in UserScore.objects.filter(pk__in=list(legacy)):
+                score.assessment_id = legacy[score.pk]
+                existing[score.assessment_id] = score
+        texts = [row[4] for row in chunk]
+
+        # Emotion vectors: stored ones when allowed, the rest from one batched model run
+        packed = [None] * len(chunk)
+        to_infer = []
+        for i, (pk, _, _, _, text) in enumerate(chunk):
+            if not text or not text.strip():
+                continue
+            stored = existing.get(pk)
+            if options["use_stored_probs"] and stored is not None and stored.text_emotion_probs:
+                packed[i] = bytes(stored.text_emotion_probs)
+                self.reused += 1
+            else:
+                to_infer.append(i)
+        if to_infer:
+            results = self.infer([texts[i] for i in to_infer])
+            for i, result in zip(to_infer, results):
+                packed[i] = pack_probabilities(probabilities_from_result(result))
+            self.inferred += len(to_infer)
+
+        scores = rubric_arrays(
+            [row[2] for row in chunk], [row[3] for row in chunk], texts, unpack_probability_matrix(packed),
+        )
+        rubric = get_rubric()
+        constants = {
+            spec['column']: rubric.constant_score(name)
+            for name, spec in rubric.components.items() if spec['kind'] == 'constant'
+        }
+        # Voice scores of the recorded answers analysed so far
+        features = latest_voice_features(ids)
+        voice = [voice_scores(features.get(pk), rubric) for pk in ids]
+        voice_columns = list(voice[0]) if voice else []
+        totals = (
+            scores["sleep_score"] + scores["mood_score"] + scores["text_sentiment_score"]
+            + scores["text_emotion_score"] + scores["text_negative_keywords_score"] + sum(constants.values())
+            + np.array([sum(row.values()) for row in voice])
+        )
+
+        updated, created = [], []
+        for i, (pk, user_id, _, _, text) in enumerate(chunk):
+            user_score = existing.get(pk)
+            if user_score is None:
+                before = None
+                user_score = UserScore(user_id=user_id, assessment_id=pk)
+                created.append(user_score)
+                self.shift.new_totals.append(float(totals[i]))
+            else:
+                before = {field: getattr(user_score, field) for field in COMPARED_FIELDS}
+                updated.append(user_score)
+
+            user_score.sleep_score = float(scores["sleep_score"][i])
+            user_score.mood_score = float(scores["mood_score"][i])
+            user_score.mood_label = scores["mood_label"][i]
+            if text is not None:
+                user_score.text_label = text[:50]
+            user_score.text_sentiment_score = float(scores["text_sentiment_score"][i])
+            user_score.text_emotion_score = float(scores["text_emotion_score"][i])
+            user_score.text_negative_keywords_score = float(scores["text_negative_keywords_score"][i])
+            user_score.text_emotion_probs = packed[i]
+            user_score.total_score = float(totals[i])
+            user_score.rubric_version = rubric.version
+            for column, value in {**constants, **voice[i]}.items():
+                setattr(user_score, column, value)
+
+            if before is not None:
+                self.shift.add(before, {field: getattr(user_score, field) for field in COMPARED_FIELDS})
+
+        if options["dry_run"]:
+            return
+        # The model has already run; the transaction only covers the writes
+        with transaction.atomic():
+            UserScore.objects.bulk_update(
+                updated, RUBRIC_FIELDS + list(constants) + voice_columns, batch_size=options["chunk_size"]
+            )
+            UserScore.objects.bulk_create(created, batch_size=options["chunk_size"])
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.models import UserScore
+from api.scoring import rescore_text_from_stored_probabilities
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute text_sentiment_score / text_emotion_score (and total_score) "
+        "from the stored emotion probability vectors, without running the model"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only rescore this user's scores")
+        parser.add_argument("--dry-run", action="store_true", help="Report changes without saving")
+
+    def handle(self, *args, **options):
+        queryset = UserScore.objects.exclude(text_emotion_probs__isnull=True)
+        if options["user"]:
+            queryset = queryset.filter(user_id=options["user"])
+
+        checked = changed = 0
+        for user_score in queryset.iterator(chunk_size=500):
+            before = (user_score.text_sentiment_score, user_score.text_emotion_score, user_score.total_score)
+            rescore_text_from_stored_probabilities(user_score)
+            after = (user_score.text_sentiment_score, user_score.text_emotion_score, user_score.total_score)
+            checked += 1
+            if before == after:
+                continue
+            changed += 1
+            if not options["dry_run"]:
+                user_score.save(update_fields=["text_sentiment_score", "text_emotion_score", "total_score"])
+
+        verb = "would change" if options["dry_run"] else "updated"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} scores, {verb} {changed}"))
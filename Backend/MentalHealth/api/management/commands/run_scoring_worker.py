@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import default_worker_id, run_next
+from api.models import ScoringJob
+
+
+class Command(BaseCommand):
+    help = "Score queued assessments (see api/jobs.py). Run as many workers as the model can keep busy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", default=None, help="Name recorded on claimed jobs (default host:pid)")
+        parser.add_argument("--visibility-timeout", type=float, default=settings.SCORING_JOB_VISIBILITY_TIMEOUT,
+                            help="Seconds before a claimed job may be claimed by another worker")
+        parser.add_argument("--poll-interval", type=float, default=settings.SCORING_WORKER_POLL_INTERVAL,
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+        parser.add_argument("--max-jobs", type=int, default=0, help="Exit after this many jobs (0 = no limit)")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or default_worker_id()
+        self.stdout.write(f"Scoring worker {worker_id} started")
+
+        processed = 0
+        try:
+            while not options["max_jobs"] or processed < options["max_jobs"]:
+                job = run_next(worker_id, options["visibility_timeout"])
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                processed += 1
+                style = self.style.SUCCESS if job.status == ScoringJob.DONE else self.style.WARNING
+                self.stdout.write(style(f"Job {job.pk}: {job.status} (attempt {job.attempts})"))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
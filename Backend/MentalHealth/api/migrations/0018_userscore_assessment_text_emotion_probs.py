@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userscore',
+            name='assessment',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='score', to='api.assessment'),
+        ),
+        migrations.AddField(
+            model_name='userscore',
+            name='text_emotion_probs',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_scoringjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userscore',
+            name='rubric_version',
+            field=models.PositiveSmallIntegerField(db_index=True, default=1),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioanalysis',
+            name='assessment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audio_analyses', to='api.assessment'),
+        ),
+        migrations.AddField(
+            model_name='audioanalysis',
+            name='features',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
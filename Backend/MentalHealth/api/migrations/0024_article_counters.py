@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:22
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Article = apps.get_model('api', 'Article')
+
+    def per_article(model_name, aggregate):
+        model = apps.get_model('api', model_name)
+        return Coalesce(Subquery(
+            model.objects.filter(article=OuterRef('pk')).order_by().values('article')
+            .annotate(value=aggregate).values('value')
+        ), Value(0), output_field=IntegerField())
+
+    Article.objects.update(
+        like_count=per_article('ArticleLike', Count('pk')),
+        view_count=per_article('ArticleView', Count('pk')),
+        rating_sum=per_article('ArticleRating', Sum('rating')),
+        rating_count=per_article('ArticleRating', Count('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_audioupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
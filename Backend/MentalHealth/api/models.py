@@ -128,8 +128,10 @@ class Assessment(models.Model):
 
 
 import os
+import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 
@@ -156,6 +158,10 @@ class AudioAnalysis(models.Model):
     ]
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # The assessment this recording answers; its voice scores come from here
+    assessment = models.ForeignKey(
+        'Assessment', on_delete=models.SET_NULL, null=True, blank=True, related_name="audio_analyses"
+    )
     # Dynamic path: sound/<user_id>/<filename>
     audio_file = models.FileField(upload_to=user_audio_path)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -165,6 +171,8 @@ class AudioAnalysis(models.Model):
     emotion = models.CharField(max_length=20, choices=EMOTION_CHOICES, null=True, blank=True)
     confidence = models.FloatField(null=True, blank=True)
     duration = models.FloatField(null=True, blank=True, help_text="Duration in seconds")
+    # Voice features from api/voice.py: pitch, energy, speaking rate, pauses, jitter
+    features = models.JSONField(null=True, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
@@ -174,6 +182,35 @@ class AudioAnalysis(models.Model):
     
 
 
+class AudioUpload(models.Model):
+    """A resumable, chunked upload of a recording (see api/audio_uploads.py)"""
+    UPLOADING = 'uploading'
+    FINALIZED = 'finalized'
+    STATUS_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (FINALIZED, 'Finalized'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="audio_uploads")
+    assessment = models.ForeignKey('Assessment', on_delete=models.SET_NULL, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField(help_text="Declared size in bytes")
+    received = models.BigIntegerField(default=0, help_text="Committed offset: bytes stored and verified")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UPLOADING)
+    # Set while one request writes a chunk; a dead request's claim runs out
+    locked_until = models.DateTimeField(null=True, blank=True)
+    analysis = models.OneToOneField(AudioAnalysis, on_delete=models.SET_NULL, null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Audio upload {self.id}: {self.received}/{self.size} bytes ({self.status})"
+
+
 class Article(models.Model):
     CATEGORY_CHOICES = [
         ('stress', 'Stress'),
@@ -191,18 +228,29 @@ class Article(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="articles")
     image = models.ImageField(upload_to="articles/", blank=True, null=True)  # optional
     created_at = models.DateTimeField(auto_now_add=True)
+    # Kept in step with the like/view/rating rows by api/articles.py
+    like_count = models.PositiveIntegerField(default=0)
+    view_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of the article list (api/pagination.py), all and by category
+            models.Index(fields=['-created_at', '-id'], name='article_created_id_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='article_category_created_idx'),
+        ]
 
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings.exists():
-            return round(sum(r.rating for r in ratings) / ratings.count(), 1)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 1)
         return 0
 
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def total_views(self):
-        return self.views.count()
+        return self.view_count
 
     def __str__(self):
         return self.title
@@ -246,6 +294,13 @@ class ArticleView(models.Model):
 
 class UserScore(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    assessment = models.OneToOneField(
+        Assessment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="score"
+    )
 
     # ==== Basic Info (10 points) ====
     age_score = models.FloatField(default=0)
@@ -261,6 +316,8 @@ class UserScore(models.Model):
     text_sentiment_score = models.FloatField(default=0)
     text_emotion_score = models.FloatField(default=0)
     text_negative_keywords_score = models.FloatField(default=0)
+    # Full model output: packed float32[7] in api.scoring.EMOTION_LABELS order
+    text_emotion_probs = models.BinaryField(null=True, blank=True, editable=False)
 
     # ==== Image Emotion (25 points) ====
     image_expression_score = models.FloatField(default=0)
@@ -277,6 +334,8 @@ class UserScore(models.Model):
 
     # ==== Final Combined Score ====
     total_score = models.FloatField(default=0)
+    # api.rubric version the columns above were scored with (scores from before versioning are 1)
+    rubric_version = models.PositiveSmallIntegerField(default=1, db_index=True)
 
     
 
@@ -284,6 +343,67 @@ class UserScore(models.Model):
 
     def __str__(self):
         return f"Mental Health Assessment - User {self.user_id} - Score {self.total_score}"
+
+
+class ScoringJob(models.Model):
+    """
+    One queued scoring of an Assessment (see api/jobs.py).
+
+    A worker claims a job by moving it to RUNNING and pushing available_at
+    out by the visibility timeout. If the worker dies, the job becomes
+    claimable again once available_at passes.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name="scoring_jobs")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Queued: not before this time (retry back-off). Running: the claim expires at this time.
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'])]
+
+    def __str__(self):
+        return f"Scoring job {self.id} for assessment {self.assessment_id} ({self.status})"
+
+
+class Blob(models.Model):
+    """
+    One stored file of the content-addressed media store (see api/storage.py).
+    refcount is how many saves minus deletes point at it; `manage.py gc_media`
+    corrects it from the file fields themselves and removes unused blobs.
+    """
+    name = models.CharField(max_length=255, primary_key=True)  # blobs/ab/cd/<sha256><ext>
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Saves and deletes move this; gc_media leaves blobs touched recently alone
+    last_referenced_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['refcount', 'last_referenced_at'])]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
     
 
 
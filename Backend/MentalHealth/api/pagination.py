@@ -0,0 +1,93 @@
+"""
+Keyset pagination for the article list.
+
+Pages are ordered newest first on (created_at, id). The id breaks ties
+between articles created in the same instant. Each page is fetched with
+
+    WHERE created_at < c OR (created_at = c AND id < i)
+    ORDER BY created_at DESC, id DESC LIMIT n + 1
+
+from the last article of the previous page. Both the whole list and a
+category have an index in that order, so a deep page costs the same as
+the first one. OFFSET would read and skip every earlier row instead.
+
+The cursor is that last (created_at, id), as URL-safe base64 JSON.
+Clients pass it back unchanged. Articles added meanwhile do not shift
+later pages, because a cursor names a position, not a page number.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(created_at, pk):
+    payload = json.dumps({'c': created_at.isoformat(), 'i': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return datetime.fromisoformat(payload['c']), int(payload['i'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise NotFound("Invalid cursor")
+
+
+class KeysetPagination(BasePagination):
+    """Newest first, `limit` at a time, continued from `cursor`"""
+
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 20
+    max_limit = 100
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+        queryset = queryset.order_by('-created_at', '-id')
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            created_at, pk = decode_cursor(token)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        page = list(queryset[:limit + 1])
+        self.next_cursor = encode_cursor(page[limit - 1].created_at, page[limit - 1].pk) if len(page) > limit else None
+        return page[:limit]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
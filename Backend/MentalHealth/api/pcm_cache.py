@@ -0,0 +1,157 @@
+"""
+Cache of decoded recordings, so analysing one again skips the decode.
+
+A recording is decoded once to mono float32 PCM. That is 16 kHz for
+anything ffmpeg decodes, and the file's own rate for PCM WAV, exactly as
+voice.decode_chunks produces it. The result is kept as a .npy file named
+after the SHA-256 of the recording's bytes:
+
+    <PCM_CACHE_DIR>/<2 hex>/<sha256>.<sample rate>.npy
+
+Later analyses open it with np.load(mmap_mode='r'). FrameAnalyzer frames
+the mapped array with views, so nothing is copied. Only the pages a
+block of frames touches are read.
+
+The cache is bounded by PCM_CACHE_MAX_BYTES. Every hit touches the
+file's mtime. After each write the least recently used files are deleted
+until the total fits; the file just written is kept even if it alone is
+over the bound. Deleting a file that another worker has mapped is safe on
+POSIX: the mapping lives until it is closed. `manage.py pcm_cache`
+prewarms, evicts or purges the cache, or reports its size.
+
+Like voice.py, this imports nothing from Django, so the pool workers
+can use it.
+"""
+import glob
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from . import voice
+
+HASH_CHUNK_BYTES = 64 * 1024
+DIGEST_NAME = re.compile(r'[0-9a-f]{64}')
+
+
+def content_key(path):
+    """SHA-256 of the file. Content-addressed media (api/storage.py) is already named by it."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if DIGEST_NAME.fullmatch(stem):
+        return stem
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def entry_path(cache_dir, key, sample_rate):
+    return os.path.join(cache_dir, key[:2], f"{key}.{sample_rate}.npy")
+
+
+def load(cache_dir, key):
+    """(memory-mapped samples, sample rate) of a cached recording, or None"""
+    for path in glob.glob(os.path.join(cache_dir, key[:2], f"{key}.*.npy")):
+        try:
+            samples = np.load(path, mmap_mode='r')
+            os.utime(path)  # most recently used
+        except (FileNotFoundError, ValueError):
+            continue  # evicted meanwhile, or unreadable: decode again
+        return samples, int(path.rsplit('.', 2)[1])
+    return None
+
+
+def store(cache_dir, key, chunks):
+    """
+    Write a recording decoded by voice.decode_chunks into the cache. Returns
+    its path. The samples are streamed to disk; the whole recording is
+    never held in memory.
+    """
+    sample_rate = next(chunks)
+    tmp_dir = os.path.join(cache_dir, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.npy')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            header = {'descr': '<f4', 'fortran_order': False, 'shape': (0,)}
+            np.lib.format.write_array_header_1_0(f, header)
+            data_start = f.tell()
+            count = 0
+            for chunk in chunks:
+                f.write(np.asarray(chunk, dtype='<f4').tobytes())
+                count += len(chunk)
+            # The header is padded so the length can grow in place
+            f.seek(0)
+            np.lib.format.write_array_header_1_0(f, dict(header, shape=(count,)))
+            if f.tell() != data_start:
+                raise RuntimeError("npy header changed size")
+        path = entry_path(cache_dir, key, sample_rate)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def entries(cache_dir):
+    """(path, size, mtime) of every cached recording"""
+    found = []
+    for path in glob.glob(os.path.join(cache_dir, '??', '*.npy')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        found.append((path, stat.st_size, stat.st_mtime))
+    return found
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """Delete least recently used recordings until the cache fits in max_bytes. Returns (removed, bytes freed)."""
+    cached = sorted(entries(cache_dir), key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in cached)
+    removed = freed = 0
+    for path, size, _ in cached:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def purge(cache_dir):
+    """Delete the whole cache. Returns (removed, bytes freed)."""
+    cached = entries(cache_dir)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return len(cached), sum(size for _, size, _ in cached)
+
+
+def decoded(path, cache_dir, max_bytes, chunk_seconds=5.0, ffmpeg='ffmpeg'):
+    """(memory-mapped samples, sample rate) of a recording, decoding it into the cache on a miss"""
+    key = content_key(path)
+    cached = load(cache_dir, key)
+    if cached is not None:
+        return cached
+    stored = store(cache_dir, key, voice.decode_chunks(path, chunk_seconds, ffmpeg))
+    evict(cache_dir, max_bytes, keep=stored)
+    return load(cache_dir, key)
+
+
+def analyze_file(path, chunk_seconds=5.0, ffmpeg='ffmpeg', cache_dir=None, max_bytes=0):
+    """voice.analyze_file, through the cache when it has room (max_bytes > 0)"""
+    if not cache_dir or max_bytes <= 0:
+        return voice.analyze_file(path, chunk_seconds, ffmpeg)
+    samples, sample_rate = decoded(path, cache_dir, max_bytes, chunk_seconds, ffmpeg)
+    return voice.analyze_samples(samples, sample_rate, chunk_seconds)
@@ -0,0 +1,238 @@
+"""
+Versioned, table-driven scoring rubric.
+
+RUBRICS holds every published rubric as plain data. Never edit a version
+once scores have been written with it. Copy it under the next number,
+change what you need, and run `manage.py apply_rubric`. Every UserScore
+records the rubric_version it was scored with. apply_rubric only rewrites
+the columns of the components that changed between two versions, only
+for the rows the change affects. It works from data already stored (the
+assessment answers and text, the stored emotion vectors and voice
+features), so the model is never run again.
+
+Component kinds:
+
+    answer     score looked up by an assessment answer (case-insensitive), `default` otherwise
+    emotion    score looked up by the primary emotion of the text, `default` otherwise
+    sentiment  confidence of the primary emotion times `scale`, at most `cap`, for
+               each emotion group; `default` for emotions in no group
+    keywords   how many of `keywords` appear in the text, mapped through `levels`
+               ((at least this many, score), highest first); 0 below the last level
+    voice      a feature of the assessment's recorded answer (see voice.py), mapped
+               through `levels` ((threshold, score), worst first): the first level
+               whose threshold the value is `above` or `below` (`direction`, inclusive);
+               `default` without a recording or when the feature is unknown
+    constant   the same score for every assessment
+
+Every text component scores 0 when there is no text.
+"""
+import numpy as np
+
+EMOTION_LABELS = ('anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise')
+
+RUBRICS = {
+    1: {
+        # ==== Basic Info (10 points) ====
+        'sleep': {
+            'kind': 'answer', 'column': 'sleep_score', 'answer': 'sleep_quality',
+            'scores': {'excellent': 4, 'good': 3, 'fair': 2, 'worst': 1}, 'default': 0,
+        },
+        # ==== Mood (10 points) ====
+        'mood': {
+            'kind': 'answer', 'column': 'mood_score', 'answer': 'mood',
+            'scores': {'happy': 0, 'neutral': 2, 'low': 5, 'sad': 8, 'angry': 10}, 'default': 0,
+        },
+        # ==== Text Emotion (25 points) ====
+        'text_sentiment': {
+            'kind': 'sentiment', 'column': 'text_sentiment_score',
+            # Negative emotions get higher scores (worse mental health)
+            'groups': [
+                {'emotions': ['anger', 'disgust', 'fear', 'sadness'], 'scale': 10, 'cap': 10},
+                {'emotions': ['joy', 'surprise', 'neutral'], 'scale': 3, 'cap': 3},
+            ],
+            'default': 5,
+        },
+        'text_emotion': {
+            'kind': 'emotion', 'column': 'text_emotion_score',
+            'scores': {'anger': 10, 'disgust': 9, 'fear': 8, 'sadness': 7, 'surprise': 4, 'neutral': 2, 'joy': 0},
+            'default': 5,
+        },
+        'text_negative_keywords': {
+            'kind': 'keywords', 'column': 'text_negative_keywords_score',
+            'keywords': ['sad', 'angry', 'depressed', 'anxious', 'stress',
+                         'tired', 'exhausted', 'hopeless', 'lonely', 'hurt',
+                         'bad', 'terrible', 'awful', 'hate', 'cant', "can't",
+                         'worried', 'scared', 'frustrated', 'upset', 'miserable',
+                         'pain', 'suffer', 'alone', 'empty', 'guilty'],
+            'levels': [(5, 5), (3, 3), (1, 1)],
+        },
+        # ==== Image Emotion (25 points) - not scored yet ====
+        'image_expression': {'kind': 'constant', 'column': 'image_expression_score', 'score': 0},
+        'image_fatigue': {'kind': 'constant', 'column': 'image_fatigue_score', 'score': 0},
+        'image_darkcircles': {'kind': 'constant', 'column': 'image_darkcircles_score', 'score': 0},
+        'image_stressmicro': {'kind': 'constant', 'column': 'image_stressmicro_score', 'score': 0},
+        # ==== Voice Emotion (30 points) - not scored yet ====
+        'voice_tone': {'kind': 'constant', 'column': 'voice_tone_score', 'score': 0},
+        'voice_pitch': {'kind': 'constant', 'column': 'voice_pitch_score', 'score': 0},
+        'voice_speed': {'kind': 'constant', 'column': 'voice_speed_score', 'score': 0},
+        'voice_hesitation': {'kind': 'constant', 'column': 'voice_hesitation_score', 'score': 0},
+        'voice_stress': {'kind': 'constant', 'column': 'voice_stress_score', 'score': 0},
+    },
+}
+
+# Version 2: the voice scores come from the recorded answer
+RUBRICS[2] = {
+    **RUBRICS[1],
+    # ==== Voice Emotion (30 points) ====
+    # Flat loudness
+    'voice_tone': {
+        'kind': 'voice', 'column': 'voice_tone_score', 'feature': 'energy_std_db', 'direction': 'below',
+        'levels': [(3.0, 6), (5.0, 4), (7.0, 2)], 'default': 0,
+    },
+    # Monotone pitch
+    'voice_pitch': {
+        'kind': 'voice', 'column': 'voice_pitch_score', 'feature': 'pitch_std_semitones', 'direction': 'below',
+        'levels': [(1.0, 6), (1.5, 4), (2.0, 2)], 'default': 0,
+    },
+    # Slow speech, syllables per second
+    'voice_speed': {
+        'kind': 'voice', 'column': 'voice_speed_score', 'feature': 'speaking_rate', 'direction': 'below',
+        'levels': [(2.0, 6), (2.5, 4), (3.0, 2)], 'default': 0,
+    },
+    # Share of the answer spent in pauses
+    'voice_hesitation': {
+        'kind': 'voice', 'column': 'voice_hesitation_score', 'feature': 'pause_ratio', 'direction': 'above',
+        'levels': [(0.5, 6), (0.35, 4), (0.25, 2)], 'default': 0,
+    },
+    # Unsteady pitch (frame-level jitter)
+    'voice_stress': {
+        'kind': 'voice', 'column': 'voice_stress_score', 'feature': 'jitter', 'direction': 'above',
+        'levels': [(0.08, 6), (0.05, 4), (0.03, 2)], 'default': 0,
+    },
+}
+
+CURRENT_RUBRIC_VERSION = max(RUBRICS)
+
+
+class Rubric:
+    """One rubric version compiled into lookup tables"""
+
+    def __init__(self, version, components):
+        self.version = version
+        self.components = components
+        self.columns = {name: spec['column'] for name, spec in components.items()}
+
+        self._answers = {}
+        self._emotion_tables = {}
+        self._sentiment_tables = {}
+        for name, spec in components.items():
+            if spec['kind'] == 'answer':
+                self._answers[name] = {answer.lower(): score for answer, score in spec['scores'].items()}
+            elif spec['kind'] == 'emotion':
+                self._emotion_tables[name] = np.array(
+                    [spec['scores'].get(label, spec['default']) for label in EMOTION_LABELS], dtype=float
+                )
+            elif spec['kind'] == 'sentiment':
+                # Per primary emotion: (scale, cap), or (0, default) for the flat default score
+                scale = np.zeros(len(EMOTION_LABELS))
+                cap = np.full(len(EMOTION_LABELS), float(spec['default']))
+                for group in spec['groups']:
+                    for emotion in group['emotions']:
+                        scale[EMOTION_LABELS.index(emotion)] = group['scale']
+                        cap[EMOTION_LABELS.index(emotion)] = group['cap']
+                self._sentiment_tables[name] = (scale, cap)
+            elif spec['kind'] == 'voice' and spec['direction'] not in ('above', 'below'):
+                raise ValueError(f"Rubric {version} component {name!r} has unknown direction {spec['direction']!r}")
+            elif spec['kind'] not in ('keywords', 'voice', 'constant'):
+                raise ValueError(f"Rubric {version} component {name!r} has unknown kind {spec['kind']!r}")
+
+    def component(self, kind, column=None):
+        """Name of the component of this kind (scoring a given column)"""
+        for name, spec in self.components.items():
+            if spec['kind'] == kind and column in (None, spec['column']):
+                return name
+        raise KeyError(f"Rubric {self.version} has no {kind} component")
+
+    # ---- One assessment ----
+
+    def answer_score(self, name, answer):
+        return self._answers[name].get((answer or '').lower(), self.components[name]['default'])
+
+    def keyword_count(self, name, text):
+        text_lower = text.lower()
+        return sum(1 for word in self.components[name]['keywords'] if word in text_lower)
+
+    def keyword_score(self, name, count):
+        for minimum, score in self.components[name]['levels']:
+            if count >= minimum:
+                return score
+        return 0
+
+    # ---- Many assessments at once ----
+
+    def answer_scores(self, name, answers):
+        return np.array([self.answer_score(name, answer) for answer in answers], dtype=float)
+
+    def keyword_scores(self, name, texts):
+        counts = np.array([self.keyword_count(name, text) if text and text.strip() else 0 for text in texts])
+        levels = self.components[name]['levels']
+        minimums = np.array([minimum for minimum, _ in levels])
+        scores = np.array([score for _, score in levels] + [0], dtype=float)
+        # First (highest) level reached; len(levels) picks the trailing 0
+        reached = counts[:, None] >= minimums[None, :]
+        return scores[np.where(reached.any(axis=1), reached.argmax(axis=1), len(levels))]
+
+    def text_model_scores(self, name, probabilities):
+        """
+        Scores of an emotion or sentiment component for an (n, 7) probability
+        matrix in EMOTION_LABELS order. Rows of NaN (no text) score 0.
+        """
+        has_text = ~np.isnan(probabilities).any(axis=1)
+        filled = np.where(has_text[:, None], probabilities, 0.0)
+        best = filled.argmax(axis=1)
+
+        if self.components[name]['kind'] == 'emotion':
+            scores = self._emotion_tables[name][best]
+        else:
+            scale, cap = self._sentiment_tables[name]
+            confidence = filled[np.arange(len(filled)), best]
+            scores = np.where(scale[best] > 0, np.minimum(cap[best], confidence * scale[best]), cap[best])
+            scores = np.round(scores, 2)
+        return np.where(has_text, scores, 0.0)
+
+    def voice_score(self, name, features):
+        """Score of a voice component for a recording's features (None: no recording)"""
+        spec = self.components[name]
+        value = (features or {}).get(spec['feature'])
+        if value is None:
+            return spec['default']
+        for threshold, score in spec['levels']:
+            if (value >= threshold) if spec['direction'] == 'above' else (value <= threshold):
+                return score
+        return 0
+
+    def constant_score(self, name):
+        return self.components[name]['score']
+
+    # ---- Comparing versions ----
+
+    def changed_components(self, other):
+        """Names of the components scored differently from `other` (an older Rubric)"""
+        return [
+            name for name, spec in self.components.items()
+            if other.components.get(name) != spec
+        ]
+
+
+_compiled = {}
+
+
+def get_rubric(version=None):
+    """The compiled rubric of a version, the current one by default"""
+    if version is None:
+        version = CURRENT_RUBRIC_VERSION
+    if version not in _compiled:
+        if version not in RUBRICS:
+            raise KeyError(f"Unknown rubric version {version}")
+        _compiled[version] = Rubric(version, RUBRICS[version])
+    return _compiled[version]
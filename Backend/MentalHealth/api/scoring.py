@@ -0,0 +1,161 @@
+"""
+Scoring helpers on top of the versioned rubric in rubric.py.
+
+The model's full probability vector is stored on each UserScore as a packed
+float32 array in EMOTION_LABELS order (28 bytes). The model-derived text
+scores can always be recomputed from that vector, so changing the rubric
+never needs another pass through the model.
+"""
+import struct
+
+import numpy as np
+
+from .rubric import EMOTION_LABELS, get_rubric
+
+_VECTOR_FORMAT = f"<{len(EMOTION_LABELS)}f"
+
+# Mood sticker -> label stored next to the mood score
+MOOD_LABELS = {'happy': 'Happy', 'neutral': 'Neutral', 'low': 'Low', 'sad': 'Sad', 'angry': 'Angry'}
+UNKNOWN_MOOD_LABEL = 'Unknown'
+
+
+def sleep_score(sleep_quality, rubric=None):
+    rubric = rubric or get_rubric()
+    return rubric.answer_score(rubric.component('answer', 'sleep_score'), sleep_quality)
+
+
+def mood_label(mood):
+    return MOOD_LABELS.get((mood or '').lower(), UNKNOWN_MOOD_LABEL)
+
+
+def mood_score(mood, rubric=None):
+    """(score, label) of a mood sticker"""
+    rubric = rubric or get_rubric()
+    return rubric.answer_score(rubric.component('answer', 'mood_score'), mood), mood_label(mood)
+
+
+def negative_keyword_count(text, rubric=None):
+    rubric = rubric or get_rubric()
+    return rubric.keyword_count(rubric.component('keywords'), text)
+
+
+def negative_keyword_score(count, rubric=None):
+    rubric = rubric or get_rubric()
+    return rubric.keyword_score(rubric.component('keywords'), count)
+
+
+def probabilities_from_result(result):
+    """Pipeline result (list of {label, score}) -> probabilities in EMOTION_LABELS order"""
+    scores = {item['label'].lower(): float(item['score']) for item in result}
+    return [scores.get(label, 0.0) for label in EMOTION_LABELS]
+
+
+def pack_probabilities(probabilities):
+    return struct.pack(_VECTOR_FORMAT, *probabilities)
+
+
+def unpack_probabilities(data):
+    return list(struct.unpack(_VECTOR_FORMAT, bytes(data)))
+
+
+def primary_emotion(probabilities):
+    """(label, confidence) of the most likely emotion"""
+    best = max(range(len(EMOTION_LABELS)), key=lambda i: probabilities[i])
+    return EMOTION_LABELS[best], probabilities[best]
+
+
+def text_model_scores(probabilities, rubric=None):
+    """
+    Sentiment (0-10) and emotion category (0-10) scores from a probability vector
+    """
+    scores = text_model_score_arrays(np.array([probabilities], dtype=float), rubric)
+    return {
+        "text_sentiment_score": float(scores["text_sentiment_score"][0]),
+        "text_emotion_score": float(scores["text_emotion_score"][0]),
+    }
+
+
+def update_total_score(user_score):
+    user_score.total_score = (
+        user_score.sleep_score +  # Basic Info (10)
+        user_score.mood_score +  # Mood (10)
+        user_score.text_sentiment_score + user_score.text_emotion_score + user_score.text_negative_keywords_score +  # Text Emotion (25)
+        user_score.image_expression_score + user_score.image_fatigue_score + user_score.image_darkcircles_score + user_score.image_stressmicro_score +  # Image Emotion (25)
+        user_score.voice_tone_score + user_score.voice_pitch_score + user_score.voice_speed_score + user_score.voice_hesitation_score + user_score.voice_stress_score  # Voice Emotion (30)
+    )
+    return user_score.total_score
+
+
+def voice_scores(features, rubric=None):
+    """{column: score} of the voice components for a recording's features (None: no recording)"""
+    rubric = rubric or get_rubric()
+    return {
+        spec['column']: rubric.voice_score(name, features)
+        for name, spec in rubric.components.items() if spec['kind'] == 'voice'
+    }
+
+
+def apply_voice_scores(user_score, features):
+    """Set the voice scores of a UserScore, under the rubric it was scored with"""
+    for column, score in voice_scores(features, get_rubric(user_score.rubric_version)).items():
+        setattr(user_score, column, score)
+    return update_total_score(user_score)
+
+
+def rescore_text_from_stored_probabilities(user_score):
+    """
+    Recompute the model-derived text scores of a UserScore from its stored
+    vector, under the rubric it was scored with (apply_rubric moves versions).
+
+    Returns False when the score has no stored vector (scored before vectors
+    were kept, or without any text).
+    """
+    if not user_score.text_emotion_probs:
+        return False
+    scores = text_model_scores(
+        unpack_probabilities(user_score.text_emotion_probs), get_rubric(user_score.rubric_version)
+    )
+    user_score.text_sentiment_score = scores["text_sentiment_score"]
+    user_score.text_emotion_score = scores["text_emotion_score"]
+    update_total_score(user_score)
+    return True
+
+
+# ---- Vectorized rubric, for scoring many assessments at once ----
+
+def unpack_probability_matrix(packed_vectors):
+    """Stacked float64 copy of packed vectors; a None entry becomes a row of NaN"""
+    matrix = np.full((len(packed_vectors), len(EMOTION_LABELS)), np.nan)
+    for row, data in enumerate(packed_vectors):
+        if data:
+            matrix[row] = np.frombuffer(bytes(data), dtype='<f4')
+    return matrix
+
+
+def text_model_score_arrays(probabilities, rubric=None):
+    """
+    text_model_scores for every row of an (n, 7) probability matrix.
+    Rows of NaN (no text) score 0.
+    """
+    rubric = rubric or get_rubric()
+    return {
+        "text_sentiment_score": rubric.text_model_scores(rubric.component('sentiment'), probabilities),
+        "text_emotion_score": rubric.text_model_scores(rubric.component('emotion'), probabilities),
+    }
+
+
+def rubric_arrays(sleep_qualities, moods, texts, probabilities, rubric=None):
+    """
+    The sleep, mood and text parts of calculate_user_score for many
+    assessments at once. probabilities is an (n, 7) matrix with a row of NaN
+    where there is no text.
+    """
+    rubric = rubric or get_rubric()
+    scores = {
+        "sleep_score": rubric.answer_scores(rubric.component('answer', 'sleep_score'), sleep_qualities),
+        "mood_score": rubric.answer_scores(rubric.component('answer', 'mood_score'), moods),
+        "mood_label": [mood_label(mood) for mood in moods],
+        "text_negative_keywords_score": rubric.keyword_scores(rubric.component('keywords'), texts),
+    }
+    scores.update(text_model_score_arrays(probabilities, rubric))
+    return scores
@@ -3,6 +3,7 @@ from .models import Assessment, Article, ArticleLike, ArticleRating, ArticleView
 
 from rest_framework import serializers
 from .models import Assessment, UserScore
+from .scoring import EMOTION_LABELS, unpack_probabilities
 
 class AssessmentSerializer(serializers.ModelSerializer):
     captured_image_url = serializers.SerializerMethodField()
@@ -19,10 +20,17 @@ class AssessmentSerializer(serializers.ModelSerializer):
 
 
 class UserScoreSerializer(serializers.ModelSerializer):
+    text_emotion_probs = serializers.SerializerMethodField()
+
     class Meta:
         model = UserScore
         fields = '__all__'
 
+    def get_text_emotion_probs(self, obj):
+        if not obj.text_emotion_probs:
+            return None
+        return dict(zip(EMOTION_LABELS, unpack_probabilities(obj.text_emotion_probs)))
+
 
 from .models import CustomUser   # ya jo tumhara user model hai
 
@@ -55,9 +63,10 @@ class AudioAnalysisSerializer(serializers.ModelSerializer):
 
 class ArticleSerializer(serializers.ModelSerializer):
     author = UserMiniSerializer(read_only=True)
+    # From the counter columns on Article, no query per article
     average_rating = serializers.FloatField(read_only=True)
-    total_likes = serializers.IntegerField(read_only=True)
-    total_views = serializers.IntegerField(read_only=True)
+    total_likes = serializers.IntegerField(source="like_count", read_only=True)
+    total_views = serializers.IntegerField(source="view_count", read_only=True)
     is_liked = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -79,6 +88,8 @@ class ArticleSerializer(serializers.ModelSerializer):
     def get_is_liked(self, obj):
         # Get the current user from request context
         request = self.context.get('request')
+        if hasattr(obj, 'liked_by_user'):
+            return obj.liked_by_user  # annotated by the article views
         if request and request.user.is_authenticated:
             return ArticleLike.objects.filter(
                 article=obj, 
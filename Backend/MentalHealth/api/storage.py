@@ -0,0 +1,139 @@
+"""
+Content-addressed, deduplicating media storage.
+
+Every upload is hashed with SHA-256 while it is streamed to a temporary
+file. It is stored as blobs/<2 hex>/<2 hex>/<sha256><ext>, so identical
+bytes land on the same path and a duplicate costs one rename, not a
+second copy. The extension is kept so URLs still carry a usable type.
+
+A Blob row counts the references to each file. save() adds one and
+delete() removes one. A file is never removed by delete(), because
+another upload of the same bytes may be racing it. `manage.py gc_media`
+recounts references from every FileField, then removes the blobs nothing
+points at. That includes rows deleted without FieldFile.delete(), and
+profile images replaced by edit_profile.
+
+Names outside blobs/ (files written before this storage, the default
+profile image) are served and deleted exactly as FileSystemStorage
+would.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_PREFIX = 'blobs/'
+HASH_CHUNK_BYTES = 64 * 1024
+
+
+def blob_name(digest, extension):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def add_reference(name, digest, size):
+    from .models import Blob
+
+    now = timezone.now()
+    existing = Blob.objects.filter(pk=name)
+    if existing.update(refcount=F('refcount') + 1, last_referenced_at=now):
+        return
+    try:
+        with transaction.atomic():
+            Blob.objects.create(name=name, digest=digest, size=size, refcount=1, last_referenced_at=now)
+    except IntegrityError:
+        # Another save of the same bytes created it first
+        existing.update(refcount=F('refcount') + 1, last_referenced_at=now)
+
+
+def remove_reference(name):
+    from .models import Blob
+
+    Blob.objects.filter(pk=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, last_referenced_at=timezone.now()
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once, under its hash"""
+
+    def get_available_name(self, name, max_length=None):
+        # The real name depends on the content; _save picks it
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        tmp_dir = os.path.join(self.location, BLOB_PREFIX, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (a streamed upload): hash it in place, then move it
+            source = content.temporary_file_path()
+            with open(source, 'rb') as f:
+                while chunk := f.read(HASH_CHUNK_BYTES):
+                    digest.update(chunk)
+                    size += len(chunk)
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+            os.close(fd)
+            file_move_safe(source, tmp_path, allow_overwrite=True)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_BYTES):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+        name = blob_name(digest.hexdigest(), extension)
+        path = self.path(name)
+        try:
+            # Count the reference first: gc_media only removes a blob whose
+            # row it can delete at refcount 0, and it does that in a transaction
+            add_reference(name, digest.hexdigest(), size)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                # Atomic; a concurrent save of the same bytes writes the same file
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        if is_blob_name(name):
+            remove_reference(name)
+        else:
+            super().delete(name)
+
+
+def blob_storages():
+    """Every (model, field) whose files live in a ContentAddressedStorage"""
+    from django.apps import apps
+    from django.db.models import FileField
+
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def blob_root():
+    return os.path.join(settings.MEDIA_ROOT, BLOB_PREFIX)
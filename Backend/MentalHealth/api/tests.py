@@ -1,3 +1,1143 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import numpy as np
+
+from EmotionDetection.admission import InferenceRejected
+from EmotionDetection.benchmark import inference_settings
+
+from . import articles, audio_uploads, jobs, pcm_cache, rubric, uploads, views, voice, voice_jobs
+from .models import Article, ArticleLike, ArticleRating, ArticleView, Assessment, AudioAnalysis, AudioUpload, Blob, CustomUser, ScoringJob, UserScore
+from .scoring import (
+    EMOTION_LABELS, pack_probabilities, probabilities_from_result, text_model_scores,
+    unpack_probabilities, voice_scores,
+)
+
+
+def pipeline_result(**scores):
+    """All-label pipeline result, best first; unspecified labels share what is left"""
+    rest = (1.0 - sum(scores.values())) / (len(EMOTION_LABELS) - len(scores))
+    result = [{"label": label, "score": scores.get(label, rest)} for label in EMOTION_LABELS]
+    return sorted(result, key=lambda item: -item["score"])
+
+
+class ScoringTests(SimpleTestCase):
+    def test_vector_round_trip_is_compact_and_ordered(self):
+        probabilities = probabilities_from_result(pipeline_result(sadness=0.7, fear=0.2))
+        packed = pack_probabilities(probabilities)
+
+        self.assertEqual(len(packed), 4 * len(EMOTION_LABELS))
+        unpacked = unpack_probabilities(packed)
+        self.assertAlmostEqual(unpacked[EMOTION_LABELS.index('sadness')], 0.7, places=6)
+        self.assertAlmostEqual(unpacked[EMOTION_LABELS.index('fear')], 0.2, places=6)
+
+    def test_text_model_scores(self):
+        sad = text_model_scores(probabilities_from_result(pipeline_result(sadness=0.8)))
+        self.assertEqual(sad, {"text_sentiment_score": 8.0, "text_emotion_score": 7})
+
+        joy = text_model_scores(probabilities_from_result(pipeline_result(joy=0.9)))
+        self.assertEqual(joy, {"text_sentiment_score": 2.7, "text_emotion_score": 0})
+
+
+class StoredProbabilityTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+
+    def score_assessment(self, text, result):
+        assessment = Assessment.objects.create(
+            user=self.user, mood='sad', sleep_quality='fair', expression_analysis=text
+        )
+        with mock.patch.object(views, 'analyze_text', return_value=result):
+            user_score = views.calculate_user_score(assessment)
+        user_score.save()
+        return user_score
+
+    def test_vector_is_stored_with_the_score(self):
+        user_score = self.score_assessment("I feel so sad and tired", pipeline_result(sadness=0.8))
+        user_score.refresh_from_db()
+
+        self.assertEqual(user_score.assessment.expression_analysis, "I feel so sad and tired")
+        probabilities = unpack_probabilities(user_score.text_emotion_probs)
+        self.assertEqual(EMOTION_LABELS[probabilities.index(max(probabilities))], 'sadness')
+
+    def test_rescore_uses_stored_vectors_only(self):
+        user_score = self.score_assessment("I feel so sad and tired", pipeline_result(sadness=0.8))
+        original = (user_score.text_sentiment_score, user_score.text_emotion_score, user_score.total_score)
+
+        # Simulate an old rubric having written different numbers
+        UserScore.objects.filter(pk=user_score.pk).update(text_emotion_score=0, total_score=0)
+
+        with mock.patch.object(views, 'analyze_text', side_effect=AssertionError("model was run")):
+            call_command('rescore_text_scores', stdout=mock.Mock())
+
+        user_score.refresh_from_db()
+        self.assertEqual(
+            (user_score.text_sentiment_score, user_score.text_emotion_score, user_score.total_score),
+            original,
+        )
+
+
+@override_settings(SCORING_JOB_MAX_ATTEMPTS=2, SCORING_JOB_RETRY_DELAY=30)
+class ScoringJobTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+
+    def submit(self, text="I feel so sad and tired"):
+        with mock.patch.object(views, 'analyze_text', side_effect=AssertionError("model run in the request")):
+            response = self.client.post('/api/assessments/', {
+                'user': self.user.id, 'mood': 'sad', 'sleep_quality': 'fair', 'expression_analysis': text,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return ScoringJob.objects.get(pk=response.json()['job']['id']), response.json()['job']['status_url']
+
+    def make_due(self, job):
+        ScoringJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+
+    def test_request_only_queues_and_worker_scores(self):
+        job, status_url = self.submit()
+        self.assertEqual(job.status, ScoringJob.QUEUED)
+        self.assertFalse(UserScore.objects.exists())
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        with mock.patch.object(views, 'analyze_text', return_value=pipeline_result(sadness=0.8)):
+            call_command('run_scoring_worker', '--once', stdout=mock.Mock())
+
+        body = self.client.get(status_url).json()
+        self.assertEqual(body['status'], 'done')
+        self.assertEqual(body['attempts'], 1)
+        user_score = UserScore.objects.get(assessment=job.assessment)
+        self.assertEqual(body['score_details']['total_score'], user_score.total_score)
+        self.assertEqual(body['score_details']['breakdown']['text_emotion_score']['emotion'], 7)
+
+    def test_unknown_job(self):
+        response = self.client.get('/api/assessments/jobs/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_failures_are_retried_with_back_off_then_fail(self):
+        job, status_url = self.submit()
+
+        with mock.patch.object(views, 'calculate_user_score', side_effect=RuntimeError("boom")):
+            job = jobs.run_next('worker-a')
+            self.assertEqual((job.status, job.attempts), (ScoringJob.QUEUED, 1))
+            # Not due again until the back-off has passed
+            self.assertIsNone(jobs.claim_next('worker-a'))
+
+            self.make_due(job)
+            job = jobs.run_next('worker-a')
+
+        self.assertEqual((job.status, job.attempts), (ScoringJob.FAILED, 2))
+        body = self.client.get(status_url).json()
+        self.assertEqual(body['status'], 'failed')
+        self.assertIn('boom', body['error'])
+
+    def test_busy_inference_does_not_use_an_attempt(self):
+        job, _ = self.submit()
+        with mock.patch.object(views, 'calculate_user_score', side_effect=InferenceRejected(7)):
+            job = jobs.run_next('worker-a')
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ScoringJob.QUEUED, 0))
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=5))
+
+    def test_expired_claim_is_taken_over(self):
+        job, _ = self.submit()
+        stale = jobs.claim_next('worker-a', visibility_timeout=60)
+        self.assertIsNone(jobs.claim_next('worker-b'))
+
+        # worker-a hangs past its visibility timeout
+        self.make_due(stale)
+        current = jobs.claim_next('worker-b')
+        self.assertEqual((current.pk, current.attempts, current.locked_by), (job.pk, 2, 'worker-b'))
+
+        with mock.patch.object(views, 'analyze_text', return_value=pipeline_result(joy=0.9)):
+            self.assertEqual(jobs.run_job(current).status, ScoringJob.DONE)
+            # worker-a finally finishes; its result is dropped
+            jobs.run_job(stale)
+
+        self.assertEqual(UserScore.objects.filter(assessment=job.assessment).count(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScoringJob.DONE)
+
+    def test_expired_last_attempt_fails(self):
+        job, _ = self.submit()
+        for worker in ('worker-a', 'worker-b'):
+            self.make_due(job)
+            self.assertIsNotNone(jobs.claim_next(worker))
+
+        self.make_due(job)
+        self.assertIsNone(jobs.claim_next('worker-c'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScoringJob.FAILED)
+
+
+class RescoreAssessmentsTests(TestCase):
+    ANSWERS = [
+        ('happy', 'excellent', "Had a lovely day with friends"),
+        ('SAD', 'Worst', "I feel sad, tired and lonely, everything is awful and I can't sleep"),
+        ('angry', 'fair', ""),
+        ('low', None, None),
+        ('meh', 'good', "stress at work " * 200),
+    ]
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        self.assessments = [
+            Assessment.objects.create(user=self.user, mood=mood, sleep_quality=sleep, expression_analysis=text)
+            for mood, sleep, text in self.ANSWERS
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+
+    def rescore(self, *args):
+        stdout = io.StringIO()
+        with inference_settings("stub", 1):
+            call_command('rescore_assessments', '--chunk-size', '2', '--checkpoint', self.checkpoint,
+                         *args, stdout=stdout, stderr=io.StringIO())
+        return stdout.getvalue()
+
+    def test_matches_calculate_user_score(self):
+        with inference_settings("stub", 1), mock.patch('builtins.print'):
+            expected = [views.calculate_user_score(assessment) for assessment in self.assessments]
+        self.rescore()
+
+        for assessment, want in zip(self.assessments, expected):
+            got = UserScore.objects.get(assessment=assessment)
+            with self.subTest(assessment=assessment.expression_analysis and assessment.expression_analysis[:20]):
+                for field in ('sleep_score', 'mood_score', 'mood_label', 'text_label', 'text_sentiment_score',
+                              'text_emotion_score', 'text_negative_keywords_score', 'total_score'):
+                    self.assertEqual(getattr(got, field), getattr(want, field), field)
+                self.assertEqual(got.text_emotion_probs and bytes(got.text_emotion_probs), want.text_emotion_probs)
+
+    def test_existing_scores_are_updated_in_place(self):
+        self.rescore()
+        ids = set(UserScore.objects.values_list('pk', flat=True))
+        UserScore.objects.update(mood_score=99, total_score=0)
+        self.rescore()
+        self.assertEqual(set(UserScore.objects.values_list('pk', flat=True)), ids)
+        self.assertFalse(UserScore.objects.filter(mood_score=99).exists())
+
+    def test_scores_from_before_the_assessment_link_are_linked_not_duplicated(self):
+        self.rescore()
+        original = {}
+        for i, assessment in enumerate(self.assessments):
+            # As they were written: a day apart, each score just after its assessment
+            assessment.created_at = self.assessments[0].created_at + timedelta(days=i)
+            assessment.save(update_fields=['created_at'])
+            score = UserScore.objects.get(assessment=assessment)
+            original[assessment.pk] = score.pk
+            UserScore.objects.filter(pk=score.pk).update(created_at=assessment.created_at + timedelta(milliseconds=1))
+        UserScore.objects.update(assessment=None, mood_score=99)
+        # An older stray score that no assessment precedes
+        stray = UserScore.objects.create(user=self.user)
+        UserScore.objects.filter(pk=stray.pk).update(created_at=self.assessments[0].created_at - timedelta(days=1))
+
+        stderr = io.StringIO()
+        with inference_settings("stub", 1):
+            call_command('rescore_assessments', '--checkpoint', self.checkpoint, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn(f"Score {stray.pk} of user {self.user.pk} matches no assessment", stderr.getvalue())
+        self.assertIn("Skipped 5 assessments", stderr.getvalue())
+        self.assertEqual(UserScore.objects.count(), 6)
+
+        stray.delete()
+        self.rescore()
+        self.assertEqual(UserScore.objects.count(), 5)
+        self.assertFalse(UserScore.objects.filter(mood_score=99).exists())
+        self.assertEqual(dict(UserScore.objects.values_list('assessment_id', 'pk')), original)
+
+    def test_dry_run_reports_the_shift_and_writes_nothing(self):
+        self.rescore()
+        UserScore.objects.filter(assessment=self.assessments[1]).update(mood_score=0, total_score=0)
+
+        output = self.rescore('--dry-run')
+        self.assertIn("1 of 5 existing scores change", output)
+        self.assertRegex(output, r"mood_score mean\s+3\.00\s+4\.60\s+\+1\.60")
+        self.assertEqual(UserScore.objects.get(assessment=self.assessments[1]).total_score, 0)
+
+    def test_resume_continues_after_the_checkpoint(self):
+        self.rescore('--limit', '3')
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.assertEqual((state['processed'], state['last_assessment_id'], state['complete']),
+                         (3, self.assessments[2].pk, False))
+        self.assertEqual(UserScore.objects.count(), 3)
+
+        self.rescore('--resume')
+        self.assertEqual(UserScore.objects.count(), 5)
+        self.assertIn("nothing to do", self.rescore('--resume'))
+
+    def test_stored_vectors_skip_the_model(self):
+        self.rescore()
+        with mock.patch('api.management.commands.rescore_assessments.analyze_texts',
+                        side_effect=AssertionError("model was run")):
+            output = self.rescore('--use-stored-probs')
+        self.assertIn("0 texts through the model, 3 stored vectors reused", output)
+
+
+class RubricVersionTests(TestCase):
+    current = rubric.CURRENT_RUBRIC_VERSION
+    following = current + 1
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        self.scores = {}
+        answers = [('sad', 'fair', "I feel sad and tired", 'sadness'), ('Sad', 'good', "angry today", 'anger'),
+                   ('happy', 'good', "what a great day", 'joy'), ('low', None, "", None)]
+        for mood, sleep, text, emotion in answers:
+            assessment = Assessment.objects.create(
+                user=self.user, mood=mood, sleep_quality=sleep, expression_analysis=text
+            )
+            result = pipeline_result(**{emotion: 0.8}) if emotion else []
+            with mock.patch.object(views, 'analyze_text', return_value=result), mock.patch('builtins.print'):
+                user_score = views.calculate_user_score(assessment)
+            user_score.save()
+            self.scores[text] = user_score
+
+    def new_version(self, **changes):
+        """The next rubric version = the current one with some components replaced"""
+        components = {**rubric.RUBRICS[self.current], **changes}
+        patcher = mock.patch.dict(rubric.RUBRICS, {self.following: components})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(rubric._compiled.pop, self.following, None)
+
+    def apply(self, *args):
+        stdout = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('apply_rubric', '--to', str(self.following), *args, stdout=stdout)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        return stdout.getvalue(), updates
+
+    def reload(self, text):
+        return UserScore.objects.get(pk=self.scores[text].pk)
+
+    def test_scores_record_their_rubric(self):
+        self.assertEqual({score.rubric_version for score in UserScore.objects.all()}, {rubric.CURRENT_RUBRIC_VERSION})
+
+    def test_rubric_matches_the_original_if_chains(self):
+        current = rubric.get_rubric(1)
+        self.assertEqual(current.answer_score('sleep', 'Excellent'), 4)
+        self.assertEqual(current.answer_score('mood', None), 0)
+        self.assertEqual(current.keyword_score('text_negative_keywords', 4), 3)
+        probabilities = np.array([probabilities_from_result(pipeline_result(surprise=0.5))])
+        self.assertEqual(current.text_model_scores('text_sentiment', probabilities)[0], 1.5)
+        self.assertEqual(current.text_model_scores('text_emotion', probabilities)[0], 4)
+
+    def test_answer_change_updates_only_that_column_of_affected_rows(self):
+        mood = {**rubric.RUBRICS[self.current]['mood'], 'scores': {**rubric.RUBRICS[self.current]['mood']['scores'], 'sad': 9}}
+        self.new_version(mood=mood)
+        before = {text: self.reload(text) for text in self.scores}
+
+        output, updates = self.apply()
+        self.assertIn("mood (mood_score): 2 rows", output)
+        # One UPDATE for the changed answer, one for the version
+        self.assertEqual(len(updates), 2)
+        self.assertNotIn('"sleep_score" =', updates[0])
+
+        for text in ("I feel sad and tired", "angry today"):
+            after = self.reload(text)
+            self.assertEqual(after.mood_score, 9)
+            self.assertAlmostEqual(after.total_score, before[text].total_score + 1)
+            self.assertEqual(after.rubric_version, self.following)
+        self.assertEqual(self.reload("what a great day").total_score, before["what a great day"].total_score)
+
+    def test_rescore_text_scores_keeps_each_row_on_its_own_rubric(self):
+        emotion = {**rubric.RUBRICS[self.current]['text_emotion'],
+                   'scores': {**rubric.RUBRICS[self.current]['text_emotion']['scores'], 'anger': 6}}
+        self.new_version(text_emotion=emotion)
+        before = self.reload("angry today")
+        UserScore.objects.filter(pk=before.pk).update(text_emotion_score=0, total_score=0)
+
+        with mock.patch.object(rubric, 'CURRENT_RUBRIC_VERSION', self.following):
+            call_command('rescore_text_scores', stdout=mock.Mock())
+        after = self.reload("angry today")
+        self.assertEqual(after.rubric_version, self.current)
+        self.assertEqual((after.text_emotion_score, after.total_score), (before.text_emotion_score, before.total_score))
+
+    def test_text_change_uses_stored_vectors_and_two_columns(self):
+        emotion = {**rubric.RUBRICS[self.current]['text_emotion'],
+                   'scores': {**rubric.RUBRICS[self.current]['text_emotion']['scores'], 'anger': 6}}
+        self.new_version(text_emotion=emotion)
+
+        with mock.patch.object(views, 'analyze_text', side_effect=AssertionError("model was run")):
+            output, updates = self.apply()
+        self.assertIn("text_emotion (text_emotion_score): 1 rows", output)
+        bulk = [sql for sql in updates if '"text_emotion_score" =' in sql]
+        self.assertEqual(len(bulk), 1)
+        self.assertNotIn('"mood_score" =', bulk[0])
+        self.assertEqual(self.reload("angry today").text_emotion_score, 6)
+        self.assertEqual(self.reload("I feel sad and tired").text_emotion_score, 7)
+
+    def test_rows_without_vectors_stay_behind(self):
+        UserScore.objects.filter(pk=self.scores["angry today"].pk).update(text_emotion_probs=None)
+        self.new_version(text_emotion={**rubric.RUBRICS[self.current]['text_emotion'], 'default': 4})
+
+        output, _ = self.apply()
+        self.assertIn(f"1 scores stay on rubric {self.current}", output)
+        self.assertEqual(self.reload("angry today").rubric_version, self.current)
+        self.assertEqual(self.reload("").rubric_version, self.following)
+
+    def test_dry_run_rolls_back(self):
+        self.new_version(image_expression={'kind': 'constant', 'column': 'image_expression_score', 'score': 3})
+        output, _ = self.apply('--dry-run')
+        self.assertIn("image_expression (image_expression_score): 4 rows", output)
+        self.assertFalse(UserScore.objects.filter(rubric_version=self.following).exists())
+
+
+JPEG = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + bytes(range(256)) * 8
+
+
+class ReadCounter(io.BytesIO):
+    """Stream that records how many bytes were read from it"""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read = getattr(self, 'bytes_read', 0) + len(data)
+        return data
+
+
+@override_settings(ASSESSMENT_IMAGE_MAX_BYTES=4096, ASSESSMENT_IMAGE_CHUNK_BYTES=256)
+class CapturedImageUploadTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.media_root = media.name
+
+    def post_multipart(self, image, name='face.jpg'):
+        upload = io.BytesIO(image)
+        upload.name = name
+        with mock.patch('builtins.print'):
+            return self.client.post('/api/assessments/', {
+                'user': self.user.id, 'mood': 'sad', 'captured_image': upload,
+            })
+
+    def test_multipart_image_is_streamed_to_storage(self):
+        response = self.post_multipart(JPEG, name='face.png')
+        self.assertEqual(response.status_code, 202)
+        assessment = Assessment.objects.get()
+        self.assertEqual(assessment.mood, 'sad')
+        # Named after what the bytes are, not what the client called them
+        self.assertTrue(assessment.captured_image.name.endswith('.jpg'))
+        with assessment.captured_image.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+    def test_multipart_rejects_other_files_and_oversized_images(self):
+        response = self.post_multipart(b'%PDF-1.7 ' + bytes(600))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JPEG, PNG or WebP', response.json()['error'])
+
+        response = self.post_multipart(JPEG + bytes(4096))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Assessment.objects.exists())
+
+    def test_raw_body_upload(self):
+        assessment = Assessment.objects.create(user=self.user, mood='low')
+        png = b'\x89PNG\r\n\x1a\n' + bytes(1000)
+        with mock.patch('builtins.print'):
+            response = self.client.put(f'/api/assessments/{assessment.id}/image/', png, content_type='image/png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['size'], len(png))
+        assessment.refresh_from_db()
+        self.assertTrue(assessment.captured_image.name.endswith('.png'))
+        self.assertTrue(os.path.exists(assessment.captured_image.path))
+
+        response = self.client.put('/api/assessments/999/image/', png, content_type='image/png')
+        self.assertEqual(response.status_code, 404)
+
+    def test_raw_body_stops_reading_at_the_first_bad_chunk(self):
+        stream = ReadCounter(b'GIF89a' + bytes(100000))
+        with self.assertRaises(uploads.ImageUploadError):
+            uploads.receive_raw_image(stream)
+        self.assertEqual(stream.bytes_read, 256)
+
+        stream = ReadCounter(JPEG * 100)
+        with self.assertRaises(uploads.ImageUploadError) as raised:
+            uploads.receive_raw_image(stream)
+        self.assertEqual(raised.exception.status_code, 413)
+        self.assertLessEqual(stream.bytes_read, 4096 + 256)
+
+        # A declared Content-Length over the limit is refused before reading
+        stream = ReadCounter(JPEG)
+        with self.assertRaises(uploads.ImageUploadError):
+            uploads.receive_raw_image(stream, content_length=5000)
+        self.assertFalse(hasattr(stream, 'bytes_read'))
+
+    def test_base64_is_still_accepted(self):
+        with mock.patch('builtins.print'):
+            response = self.client.post('/api/assessments/', {
+                'user': self.user.id, 'mood': 'sad', 'captured_image': base64.b64encode(JPEG).decode(),
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertIn('image_upload_url', response.json())
+        with Assessment.objects.get().captured_image.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.media_root = media.name
+
+    def save_assessment(self, content, name='face.jpg'):
+        assessment = Assessment(user=self.user)
+        assessment.captured_image.save(name, ContentFile(content))
+        return assessment
+
+    def blob_files(self):
+        root = os.path.join(self.media_root, 'blobs')
+        return sorted(
+            os.path.relpath(os.path.join(directory, filename), self.media_root)
+            for directory, _, filenames in os.walk(root) for filename in filenames
+        )
+
+    def gc(self, *args):
+        stdout = io.StringIO()
+        call_command('gc_media', '--min-age', '0', *args, stdout=stdout, stderr=io.StringIO())
+        return stdout.getvalue()
+
+    def test_identical_bytes_share_one_file(self):
+        first = self.save_assessment(JPEG)
+        second = self.save_assessment(JPEG, name='again.JPG')
+        other = self.save_assessment(JPEG + b'!')
+
+        digest = hashlib.sha256(JPEG).hexdigest()
+        self.assertEqual(first.captured_image.name, f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertEqual(second.captured_image.name, first.captured_image.name)
+        self.assertNotEqual(other.captured_image.name, first.captured_image.name)
+        self.assertEqual(self.blob_files(), sorted([first.captured_image.name, other.captured_image.name]))
+        self.assertEqual(Blob.objects.get(pk=first.captured_image.name).refcount, 2)
+        with first.captured_image.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+    def test_streamed_upload_is_moved_not_copied(self):
+        upload = TemporaryUploadedFile('face.jpg', 'image/jpeg', len(JPEG), None)
+        upload.write(JPEG)
+        upload.seek(0)
+        assessment = Assessment(user=self.user)
+        assessment.captured_image.save('face.jpg', upload)
+        upload.close()
+
+        self.assertFalse(os.path.exists(upload.temporary_file_path()))
+        self.assertEqual(Blob.objects.get(pk=assessment.captured_image.name).size, len(JPEG))
+        with assessment.captured_image.open('rb') as f:
+            self.assertEqual(f.read(), JPEG)
+
+    def test_gc_removes_images_replaced_by_edit_profile(self):
+        other = CustomUser.objects.create_user(username='kim@example.com', email='kim@example.com', password='x')
+        first, second = io.BytesIO(JPEG), io.BytesIO(JPEG + b'!')
+        first.name = second.name = 'me.jpg'
+        for user, image in ((self.user, first), (other, first), (self.user, second)):
+            image.seek(0)
+            with mock.patch('builtins.print'):
+                response = self.client.post('/api/editprofile/', {'user_id': user.id, 'profile_image': image})
+            self.assertEqual(response.status_code, 200)
+
+        other.refresh_from_db()
+        self.user.refresh_from_db()
+        # The other user still uses the first image, so only a reference went away
+        self.assertEqual(Blob.objects.get(pk=other.profile_image.name).refcount, 1)
+        self.gc()
+        self.assertEqual(len(self.blob_files()), 2)
+
+        other.profile_image.delete()
+        self.gc()
+        self.assertEqual(self.blob_files(), [self.user.profile_image.name])
+        self.assertEqual(list(Blob.objects.values_list('name', flat=True)), [self.user.profile_image.name])
+
+    def test_gc_recounts_rows_deleted_without_releasing_files(self):
+        kept = self.save_assessment(JPEG)
+        gone = self.save_assessment(JPEG + b'!')
+        gone.save()
+        kept.save()
+        Assessment.objects.filter(pk=gone.pk).delete()
+        self.assertEqual(Blob.objects.get(pk=gone.captured_image.name).refcount, 1)
+
+        # Too recent to touch
+        call_command('gc_media', stdout=io.StringIO())
+        self.assertEqual(len(self.blob_files()), 2)
+
+        output = self.gc('--dry-run')
+        self.assertIn("Would remove 1 unused blobs", output)
+        self.assertEqual(len(self.blob_files()), 2)
+
+        self.gc()
+        self.assertEqual(self.blob_files(), [kept.captured_image.name])
+
+    def test_gc_removes_stray_files(self):
+        stray = os.path.join(self.media_root, 'blobs', 'ab', 'cd', 'abcd.jpg')
+        leftover = os.path.join(self.media_root, 'blobs', 'tmp', 'tmp1234')
+        for path in (stray, leftover):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(JPEG)
+            os.utime(path, (0, 0))
+        output = self.gc()
+        self.assertIn("2 stray files", output)
+        self.assertEqual(self.blob_files(), [])
+
+
+def speech_wav(syllables=20, pause_every=4, pause=0.5, pitch_swing=40.0, sample_rate=16000):
+    """WAV bytes of synthetic speech: 0.3 s voiced syllables around 180 Hz with pauses"""
+    t = np.arange(int(sample_rate * 0.3)) / sample_rate
+    parts = []
+    for i in range(syllables):
+        f0 = 180 + pitch_swing * np.sin(i)
+        parts.append((0.5 * np.sin(2 * np.pi * f0 * t) + 0.3 * np.sin(4 * np.pi * f0 * t)) * np.hanning(len(t)))
+        parts.append(np.zeros(int(sample_rate * (pause if i % pause_every == 0 else 0.05))))
+    samples = np.concatenate(parts) + np.random.default_rng(0).normal(0, 0.001, sum(map(len, parts)))
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.repeat((samples * 32767).astype('<i2')[:, None], 2, axis=1).tobytes())
+    return output.getvalue()
+
+
+class VoiceFeatureTests(SimpleTestCase):
+    def analyze(self, content, **kwargs):
+        with tempfile.NamedTemporaryFile(suffix='.wav') as f:
+            f.write(content)
+            f.flush()
+            return voice.analyze_file(f.name, **kwargs)
+
+    def test_features_of_synthetic_speech(self):
+        features = self.analyze(speech_wav())['features']
+        self.assertAlmostEqual(features['pitch_mean_hz'], 180, delta=10)
+        # 20 syllables in 6 s of speech
+        self.assertAlmostEqual(features['speaking_rate'], 20 / features['speech_seconds'], delta=0.3)
+        # Five 0.5 s pauses in a 9 s answer
+        self.assertAlmostEqual(features['pause_ratio'], 0.28, delta=0.04)
+        self.assertGreater(features['pitch_std_semitones'], 1.5)
+        self.assertLess(features['jitter'], 0.01)
+
+    def test_chunk_size_does_not_change_the_features(self):
+        content = speech_wav(syllables=8)
+        self.assertEqual(self.analyze(content, chunk_seconds=0.37), self.analyze(content, chunk_seconds=60))
+
+    def test_monotone_hesitant_speech_scores_worse(self):
+        current = rubric.get_rubric()
+        lively = self.analyze(speech_wav(pause_every=8, pause=0.3))
+        flat = self.analyze(speech_wav(pause_every=1, pause=0.6, pitch_swing=2.0))
+        self.assertEqual(flat['emotion'], 'sad')
+        self.assertGreater(sum(voice_scores(flat['features'], current).values()),
+                           sum(voice_scores(lively['features'], current).values()))
+        self.assertEqual(sum(voice_scores(None, current).values()), 0)
+
+    def test_silence_has_no_speech_features(self):
+        output = io.BytesIO()
+        with wave.open(output, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(bytes(16000))
+        result = self.analyze(output.getvalue())
+        self.assertEqual(result['features']['duration'], 1.0)
+        self.assertEqual(result['features']['speech_seconds'], 0.0)
+        self.assertEqual((result['emotion'], result['confidence']), ('neutral', 0.0))
+
+    def test_process_pool_gives_the_inline_result(self):
+        with tempfile.NamedTemporaryFile(suffix='.wav') as f:
+            f.write(speech_wav(syllables=6))
+            f.flush()
+            with self.settings(VOICE_ANALYSIS_WORKERS=1):
+                try:
+                    pooled = voice_jobs.get_executor().submit(voice.analyze_file, f.name).result(timeout=120)
+                finally:
+                    voice_jobs.shutdown_executor()
+            self.assertEqual(pooled, voice.analyze_file(f.name))
+
+
+class PcmCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = os.path.join(directory.name, 'cache')
+        self.recording = os.path.join(directory.name, 'answer.wav')
+        with open(self.recording, 'wb') as f:
+            f.write(speech_wav(syllables=8))
+
+    def test_cached_analysis_matches_decoding(self):
+        expected = voice.analyze_file(self.recording, 0.5)
+        first = pcm_cache.analyze_file(self.recording, 0.5, cache_dir=self.cache_dir, max_bytes=10 ** 8)
+        self.assertEqual(first, expected)
+
+        (path, size, _), = pcm_cache.entries(self.cache_dir)
+        with mock.patch.object(voice, 'decode_chunks', side_effect=AssertionError("decoded again")):
+            self.assertEqual(pcm_cache.analyze_file(self.recording, 0.5, cache_dir=self.cache_dir,
+                                                    max_bytes=10 ** 8), expected)
+
+        samples, sample_rate = pcm_cache.load(self.cache_dir, pcm_cache.content_key(self.recording))
+        self.assertIsInstance(samples, np.memmap)
+        self.assertEqual(sample_rate, 16000)
+        chunks = voice.decode_chunks(self.recording)
+        next(chunks)
+        np.testing.assert_array_equal(samples, np.concatenate(list(chunks)))
+
+    def test_least_recently_used_recordings_are_evicted(self):
+        keys = []
+        for i in range(3):
+            key = f"{i:064x}"
+            keys.append(key)
+            pcm_cache.store(self.cache_dir, key, iter([16000, np.zeros(1000, dtype=np.float32)]))
+            os.utime(pcm_cache.entry_path(self.cache_dir, key, 16000), (i, i))
+        size = pcm_cache.entries(self.cache_dir)[0][1]
+
+        pcm_cache.load(self.cache_dir, keys[0])  # now the most recent
+        self.assertEqual(pcm_cache.evict(self.cache_dir, 2 * size), (1, size))
+        self.assertIsNone(pcm_cache.load(self.cache_dir, keys[1]))
+        self.assertIsNotNone(pcm_cache.load(self.cache_dir, keys[0]))
+
+    def test_failed_decode_leaves_nothing(self):
+        with open(self.recording, 'wb') as f:
+            f.write(b'\x00\x00\x00\x20ftypM4A ' + bytes(100))
+        with self.assertRaises(voice.AudioDecodeError):
+            pcm_cache.analyze_file(self.recording, ffmpeg='no-such-ffmpeg', cache_dir=self.cache_dir, max_bytes=10 ** 8)
+        self.assertEqual([files for _, _, files in os.walk(self.cache_dir) if files], [])
+
+
+@override_settings(VOICE_ANALYSIS_WORKERS=0)
+class AudioAnalysisViewTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name, PCM_CACHE_DIR=os.path.join(media.name, 'pcm'))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.assessment = Assessment.objects.create(user=self.user, mood='sad', expression_analysis='')
+
+    def upload(self, content, content_type='audio/wav', **fields):
+        audio = SimpleUploadedFile('answer.wav', content, content_type=content_type)
+        with mock.patch('builtins.print'):
+            return self.client.post('/api/audio-analysis/', {'user_id': self.user.id, 'audio': audio, **fields})
+
+    def score(self):
+        with mock.patch.object(views, 'analyze_text', return_value=[]), mock.patch('builtins.print'):
+            user_score = views.calculate_user_score(self.assessment)
+        user_score.save()
+        return user_score
+
+    def test_recording_after_scoring_updates_the_voice_scores(self):
+        user_score = self.score()
+        self.assertEqual(user_score.voice_hesitation_score, 0)
+
+        response = self.upload(speech_wav(pause_every=1, pause=0.6, pitch_swing=2.0))
+        self.assertEqual(response.status_code, 202)
+        body = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(body['status'], 'completed')
+        self.assertEqual(body['assessment'], self.assessment.id)
+        self.assertEqual(body['emotion'], 'sad')
+        self.assertGreater(body['duration'], 10)
+
+        user_score.refresh_from_db()
+        analysis = AudioAnalysis.objects.get()
+        expected = voice_scores(analysis.features)
+        self.assertEqual(user_score.voice_hesitation_score, expected['voice_hesitation_score'])
+        self.assertGreater(user_score.voice_hesitation_score, 0)
+        self.assertAlmostEqual(user_score.total_score, user_score.mood_score + sum(expected.values()))
+
+    def test_scoring_after_recording_uses_it(self):
+        self.upload(speech_wav(pause_every=1, pause=0.6, pitch_swing=2.0), assessment_id=self.assessment.id)
+        user_score = self.score()
+        self.assertEqual(user_score.voice_pitch_score, 6)
+
+        # And rescore_assessments agrees
+        UserScore.objects.filter(pk=user_score.pk).update(voice_pitch_score=0, total_score=0)
+        with inference_settings("stub", 1):
+            call_command('rescore_assessments', '--checkpoint', os.path.join(settings.MEDIA_ROOT, 'c.json'),
+                         stdout=io.StringIO(), stderr=io.StringIO())
+        rescored = UserScore.objects.get(pk=user_score.pk)
+        self.assertEqual(rescored.voice_pitch_score, 6)
+        self.assertEqual(rescored.total_score, user_score.total_score)
+
+    def test_apply_rubric_fills_voice_scores_of_older_scores(self):
+        self.upload(speech_wav(pause_every=1, pause=0.6, pitch_swing=2.0))
+        with mock.patch.object(rubric, 'CURRENT_RUBRIC_VERSION', 1):
+            user_score = self.score()
+        self.assertEqual((user_score.rubric_version, user_score.voice_pitch_score), (1, 0))
+
+        call_command('apply_rubric', '--to', '2', stdout=io.StringIO())
+        user_score.refresh_from_db()
+        self.assertEqual((user_score.rubric_version, user_score.voice_pitch_score), (2, 6))
+
+    def test_undecodable_audio_fails_the_analysis(self):
+        with self.settings(FFMPEG_BINARY='no-such-ffmpeg'):
+            response = self.upload(b'\x00\x00\x00\x20ftypM4A ' + bytes(100), content_type='audio/m4a')
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertIn('no-such-ffmpeg', AudioAnalysis.objects.get().analysis_result['error'])
+
+    def test_unknown_assessment(self):
+        response = self.upload(speech_wav(syllables=2), assessment_id=999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_pcm_cache_command(self):
+        self.upload(speech_wav(syllables=4))
+        self.assertEqual(len(pcm_cache.entries(settings.PCM_CACHE_DIR)), 1)
+
+        call_command('pcm_cache', 'purge', stdout=io.StringIO())
+        self.assertEqual(pcm_cache.entries(settings.PCM_CACHE_DIR), [])
+        output = io.StringIO()
+        call_command('pcm_cache', 'prewarm', stdout=output)
+        self.assertIn('Decoded 1 recordings, 0 already cached', output.getvalue())
+        self.assertEqual(len(pcm_cache.entries(settings.PCM_CACHE_DIR)), 1)
+
+
+@override_settings(VOICE_ANALYSIS_WORKERS=0, AUDIO_UPLOAD_CHUNK_MAX_BYTES=64 * 1024)
+class ResumableAudioUploadTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(
+            MEDIA_ROOT=os.path.join(media.name, 'media'), AUDIO_UPLOAD_DIR=os.path.join(media.name, 'partial'),
+            PCM_CACHE_DIR=os.path.join(media.name, 'pcm'),
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.assessment = Assessment.objects.create(user=self.user, mood='sad', expression_analysis='')
+        self.audio = speech_wav(pause_every=1, pause=0.6, pitch_swing=2.0)
+
+    def start(self, size=None):
+        response = self.client.post('/api/audio-uploads/', {
+            'user_id': self.user.id, 'size': size or len(self.audio),
+            'content_type': 'audio/wav', 'filename': 'answer.wav',
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put(self, url, offset, chunk, checksum=None):
+        checksum = checksum or base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+        return self.client.put(
+            url, chunk, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM=f'sha256 {checksum}',
+        )
+
+    def send_all(self, upload, offset=0):
+        step = settings.AUDIO_UPLOAD_CHUNK_MAX_BYTES
+        while offset < len(self.audio):
+            response = self.put(upload['upload_url'], offset, self.audio[offset:offset + step])
+            self.assertEqual(response.status_code, 200, response.content)
+            offset = response.json()['offset']
+        return offset
+
+    def finalize(self, upload, **data):
+        with mock.patch('builtins.print'):
+            return self.client.post(upload['finalize_url'], data)
+
+    def test_chunked_upload_is_analysed(self):
+        upload = self.start()
+        self.assertEqual(self.send_all(upload), len(self.audio))
+
+        response = self.finalize(upload, sha256=hashlib.sha256(self.audio).hexdigest())
+        self.assertEqual(response.status_code, 202)
+        body = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(body['status'], 'completed')
+        self.assertEqual(body['assessment'], self.assessment.id)
+
+        analysis = AudioAnalysis.objects.get()
+        with analysis.audio_file.open('rb') as f:
+            self.assertEqual(f.read(), self.audio)
+        # Moved into storage, not copied
+        self.assertEqual(os.listdir(settings.AUDIO_UPLOAD_DIR), [])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.has_completed_assessment)
+
+        # Finalizing again returns the same analysis
+        again = self.finalize(upload)
+        self.assertEqual(again.json()['analysis_id'], analysis.id)
+        self.assertEqual(AudioAnalysis.objects.count(), 1)
+
+    def test_wrong_offset_is_rejected_with_the_committed_one(self):
+        upload = self.start()
+        self.put(upload['upload_url'], 0, self.audio[:1000])
+        response = self.put(upload['upload_url'], 500, self.audio[500:1500])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1000')
+
+        head = self.client.head(upload['upload_url'])
+        self.assertEqual(head['Upload-Offset'], '1000')
+        self.assertEqual(self.client.get(upload['upload_url']).json()['offset'], 1000)
+
+    def test_bad_checksum_commits_nothing(self):
+        upload = self.start()
+        self.put(upload['upload_url'], 0, self.audio[:1000])
+        wrong = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self.put(upload['upload_url'], 1000, self.audio[1000:2000], checksum=wrong)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], 1000)
+
+        path = audio_uploads.partial_path(AudioUpload.objects.get())
+        self.assertEqual(os.path.getsize(path), 1000)
+        self.send_all(upload, offset=1000)
+        self.assertEqual(self.finalize(upload).status_code, 202)
+
+    def test_interrupted_chunk_resumes_from_the_committed_offset(self):
+        upload_id = self.start()['upload_id']
+        chunk = self.audio[:4096]
+        checksum = hashlib.sha256(chunk).digest()
+        with self.assertRaises(audio_uploads.UploadError) as cm:
+            # The connection drops after half the chunk
+            audio_uploads.write_chunk(upload_id, 0, len(chunk), checksum, io.BytesIO(chunk[:2048]))
+        self.assertEqual(cm.exception.offset, 0)
+        upload = AudioUpload.objects.get()
+        self.assertEqual((upload.received, upload.locked_until), (0, None))
+        self.assertEqual(os.path.getsize(audio_uploads.partial_path(upload)), 0)
+
+        self.assertEqual(audio_uploads.write_chunk(upload_id, 0, len(chunk), checksum, io.BytesIO(chunk)), 4096)
+
+    def test_one_writer_per_upload(self):
+        upload = self.start()
+        AudioUpload.objects.update(locked_until=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(self.put(upload['upload_url'], 0, self.audio[:1000]).status_code, 409)
+        # A claim left by a dead request runs out
+        AudioUpload.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.put(upload['upload_url'], 0, self.audio[:1000]).status_code, 200)
+
+    def test_finalize_needs_every_byte_and_a_matching_file(self):
+        upload = self.start()
+        self.put(upload['upload_url'], 0, self.audio[:1000])
+        self.assertEqual(self.finalize(upload).status_code, 409)
+
+        self.send_all(upload, offset=1000)
+        response = self.finalize(upload, sha256='0' * 64)
+        self.assertEqual((response.status_code, response.json()['offset']), (400, 0))
+        self.assertFalse(AudioAnalysis.objects.exists())
+
+    def test_size_limits(self):
+        response = self.client.post('/api/audio-uploads/', {
+            'user_id': self.user.id, 'size': settings.AUDIO_UPLOAD_MAX_BYTES + 1, 'content_type': 'audio/wav',
+        })
+        self.assertEqual(response.status_code, 413)
+
+        upload = self.start()
+        response = self.put(upload['upload_url'], 0, self.audio[:settings.AUDIO_UPLOAD_CHUNK_MAX_BYTES + 1])
+        self.assertEqual(response.status_code, 413)
+
+        upload = self.start(size=300)
+        self.assertEqual(self.put(upload['upload_url'], 0, self.audio[:200]).status_code, 200)
+        response = self.put(upload['upload_url'], 200, self.audio[200:400])
+        self.assertEqual(response.status_code, 400)
+
+    def test_start_names_the_bad_field(self):
+        fields = {'user_id': self.user.id, 'size': len(self.audio), 'content_type': 'audio/wav'}
+        response = self.client.post('/api/audio-uploads/', {**fields, 'assessment_id': 'latest'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('assessment_id', response.json()['message'])
+        response = self.client.post('/api/audio-uploads/', {**fields, 'assessment_id': 999})
+        self.assertEqual((response.status_code, response.json()['message']), (404, 'Assessment not found'))
+        response = self.client.post('/api/audio-uploads/', {**fields, 'size': 'big'})
+        self.assertIn('size', response.json()['message'])
+
+    def test_expired_uploads_are_deleted(self):
+        self.start()
+        upload = AudioUpload.objects.get()
+        AudioUpload.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        call_command('expire_audio_uploads', stdout=io.StringIO())
+        self.assertFalse(AudioUpload.objects.exists())
+        self.assertFalse(os.path.exists(audio_uploads.partial_path(upload)))
+
+
+class ArticleCounterTests(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='writer@example.com', email='writer@example.com', password='secret123'
+        )
+        self.reader = CustomUser.objects.create_user(
+            username='sam@example.com', email='sam@example.com', password='secret123'
+        )
+        self.article = Article.objects.create(title='Breathing', content='In, out.', author=self.author)
+
+    def test_likes_and_views_move_the_counters(self):
+        like_url = f'/api/articles/{self.article.id}/like/'
+        response = self.client.post(like_url, {'user_id': self.reader.id}, content_type='application/json')
+        self.assertEqual((response.json()['liked'], response.json()['like_count']), (True, 1))
+        for _ in range(2):
+            response = self.client.post(f'/api/articles/{self.article.id}/view/', {'user_id': self.reader.id},
+                                        content_type='application/json')
+        self.assertEqual(response.json()['total_views'], 2)
+
+        body = self.client.get(f'/api/articles/{self.article.id}/').json()
+        self.assertEqual((body['total_likes'], body['total_views']), (1, 2))
+
+        response = self.client.post(like_url, {'user_id': self.reader.id}, content_type='application/json')
+        self.assertEqual((response.json()['liked'], response.json()['like_count']), (False, 0))
+        self.assertFalse(ArticleLike.objects.exists())
+
+    def test_unlike_against_a_drifted_counter(self):
+        articles.toggle_like(self.article, self.reader)
+        Article.objects.update(like_count=0)
+        response = self.client.post(f'/api/articles/{self.article.id}/like/', {'user_id': self.reader.id},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['liked'], response.json()['like_count']), (False, 0))
+        self.assertFalse(ArticleLike.objects.exists())
+
+    def test_admin_writes_move_the_counters(self):
+        request = mock.Mock(user=self.author)
+        like_admin = admin.site._registry[ArticleLike]
+        view_admin = admin.site._registry[ArticleView]
+        like_admin.save_model(request, ArticleLike(article=self.article, user=self.reader), None, False)
+        view_admin.save_model(request, ArticleView(article=self.article), None, False)
+        view_admin.save_model(request, ArticleView(article=self.article, user=self.reader), None, False)
+        self.assertEqual(articles.counters(self.article.pk)['like_count'], 1)
+        self.assertEqual(articles.counters(self.article.pk)['view_count'], 2)
+
+        like_admin.delete_queryset(request, ArticleLike.objects.all())
+        view_admin.delete_model(request, ArticleView.objects.first())
+        counters = articles.counters(self.article.pk)
+        self.assertEqual((counters['like_count'], counters['view_count']), (0, 1))
+        self.assertEqual(articles.reconcile(dry_run=True), {})
+
+    def test_ratings_update_the_average(self):
+        articles.rate_article(self.article, self.reader, 5)
+        articles.rate_article(self.article, self.author, 2)
+        articles.rate_article(self.article, self.reader, 4)  # changes the earlier rating
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.rating_sum, self.article.rating_count), (6, 2))
+        self.assertEqual(self.article.average_rating(), 3.0)
+
+        articles.remove_rating(ArticleRating.objects.get(user=self.author))
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.average_rating(), 4.0)
+
+    def test_article_list_queries_do_not_grow_with_articles(self):
+        self.client.force_login(self.reader)
+        for i in range(5):
+            article = Article.objects.create(title=f'Article {i}', content='...', author=self.author)
+            articles.toggle_like(article, self.reader)
+            articles.rate_article(article, self.reader, 3)
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/api/articles/').json()['results']
+        self.assertEqual(len(body), 6)
+        self.assertEqual(sum(a['is_liked'] for a in body), 5)
+        self.assertLessEqual(len(queries), 5)
+
+    def test_reconcile_repairs_drift(self):
+        articles.toggle_like(self.article, self.reader)
+        ArticleView.objects.create(article=self.article)  # bypassing the counters
+        Article.objects.filter(pk=self.article.pk).update(rating_sum=9)
+
+        output = io.StringIO()
+        call_command('reconcile_article_counters', '--dry-run', stdout=output)
+        self.assertIn('view_count 0 -> 1', output.getvalue())
+        self.assertIn('rating_sum 9 -> 0', output.getvalue())
+        self.assertEqual(Article.objects.get().view_count, 0)
+
+        call_command('reconcile_article_counters', stdout=io.StringIO())
+        counters = articles.counters(self.article.pk)
+        self.assertEqual(counters, {'like_count': 1, 'view_count': 1, 'rating_sum': 0, 'rating_count': 0})
+        self.assertEqual(articles.reconcile(), {})
+
+
+class ArticlePaginationTests(TestCase):
+    def setUp(self):
+        author = CustomUser.objects.create_user(
+            username='writer@example.com', email='writer@example.com', password='secret123'
+        )
+        created_at = timezone.now()
+        for i in range(7):
+            Article.objects.create(
+                title=f'Article {i}', content='...', author=author, category='stress' if i % 2 else 'anxiety'
+            )
+        # Three share a timestamp, so the id has to break the tie
+        Article.objects.filter(title__in=['Article 2', 'Article 3', 'Article 4']).update(created_at=created_at)
+
+    def fetch_all(self, query=''):
+        titles, pages = [], 0
+        url = f'/api/articles/?limit=2{query}'
+        while url:
+            body = self.client.get(url).json()
+            titles += [a['title'] for a in body['results']]
+            url, pages = body['next'], pages + 1
+        return titles, pages
+
+    def test_pages_cover_the_list_in_order_once(self):
+        expected = list(Article.objects.order_by('-created_at', '-id').values_list('title', flat=True))
+        self.assertEqual(self.fetch_all(), (expected, 4))
+
+        # Articles added meanwhile do not shift later pages
+        first = self.client.get('/api/articles/?limit=3').json()
+        Article.objects.create(title='New', content='...', author=CustomUser.objects.get())
+        rest = self.client.get(f"/api/articles/?limit=10&cursor={first['next_cursor']}").json()
+        self.assertEqual([a['title'] for a in first['results'] + rest['results']], expected)
+
+    def test_category_filter(self):
+        titles, _ = self.fetch_all('&category=stress')
+        self.assertEqual(sorted(titles), ['Article 1', 'Article 3', 'Article 5'])
+        self.assertEqual(self.client.get('/api/articles/?category=nonsense').status_code, 400)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/articles/?cursor=not-a-cursor').status_code, 404)
+
+    def test_page_query_uses_keyset_not_offset(self):
+        cursor = self.client.get('/api/articles/?limit=2').json()['next_cursor']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/articles/?limit=2&category=stress&cursor={cursor}')
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"api_article"."created_at" <', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+class ImportBudgetTests(SimpleTestCase):
+    """Management commands, the admin and non-ML workers must not pay for torch"""
+
+    HEAVY_MODULES = ('torch', 'transformers', 'onnxruntime')
+
+    def test_importing_views_does_not_load_ml_libraries(self):
+        script = (
+            "import json, sys, django; django.setup(); "
+            "import api.views, api.urls, EmotionDetection.views; "
+            f"print(json.dumps([m for m in {self.HEAVY_MODULES!r} if m in sys.modules]))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='MentalHealth.settings')
+        env.setdefault('GROQ_API_KEY', 'import-budget-test')
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
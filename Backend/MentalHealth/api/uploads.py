@@ -0,0 +1,167 @@
+"""
+Streaming upload of the assessment camera capture.
+
+The image can arrive three ways:
+
+    multipart   a `captured_image` file part on POST /assessments/
+    raw body    PUT /assessments/<id>/image/ with the image bytes as the body
+    base64      a `captured_image` string in the JSON body (old app versions only)
+
+The first two never hold the whole image in memory. Chunks go through an
+ImageValidator as they arrive and are written to a temporary file, which
+FileSystemStorage then moves into MEDIA_ROOT instead of copying. The
+validator checks the file signature on the first bytes and the size after
+every chunk, so a wrong type or an oversized upload is refused as soon as
+it shows, not after the whole body has been read.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import SkipFile, StopUpload, TemporaryFileUploadHandler
+from rest_framework import status
+
+# (file signature, offset, extension, content type)
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 0, 'jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'png', 'image/png'),
+    (b'WEBP', 8, 'webp', 'image/webp'),  # after b'RIFF' and the chunk size
+]
+SIGNATURE_BYTES = 12
+
+
+class ImageUploadError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def too_large_error(max_bytes):
+    return ImageUploadError(
+        f"Image is larger than {max_bytes} bytes", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    )
+
+
+def sniff_image(head):
+    """(extension, content type) of an image from its first bytes, or None"""
+    for signature, offset, extension, content_type in IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if extension == 'webp' and not head.startswith(b'RIFF'):
+                continue
+            return extension, content_type
+    return None
+
+
+class ImageValidator:
+    """Checks an image as it streams in: signature first, then size"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = settings.ASSESSMENT_IMAGE_MAX_BYTES if max_bytes is None else max_bytes
+        self.size = 0
+        self.head = b''
+        self.kind = None
+
+    @property
+    def extension(self):
+        return self.kind[0]
+
+    @property
+    def content_type(self):
+        return self.kind[1]
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise too_large_error(self.max_bytes)
+        if self.kind is None and len(self.head) < SIGNATURE_BYTES:
+            self.head += chunk[:SIGNATURE_BYTES - len(self.head)]
+            if len(self.head) == SIGNATURE_BYTES:
+                self.check_signature()
+
+    def check_signature(self):
+        self.kind = sniff_image(self.head)
+        if self.kind is None:
+            raise ImageUploadError("Image must be a JPEG, PNG or WebP file")
+
+    def finish(self):
+        if self.size == 0:
+            raise ImageUploadError("Image is empty")
+        if self.kind is None:
+            # Shorter than SIGNATURE_BYTES
+            self.check_signature()
+
+
+class CapturedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Multipart handler for the captured_image part: streams it to a temporary
+    file through an ImageValidator. On a bad image the rest of the body is
+    discarded unread and the reason is left in `error` for the view.
+    """
+
+    def __init__(self, request=None, field_name='captured_image', max_bytes=None):
+        super().__init__(request)
+        self.field_name = field_name
+        self.validator = ImageValidator(max_bytes)
+        self.error = None
+        self.chunk_size = settings.ASSESSMENT_IMAGE_CHUNK_BYTES
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        try:
+            self.validator.feed(raw_data)
+        except ImageUploadError as e:
+            self.reject(e)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        try:
+            self.validator.finish()
+        except ImageUploadError as e:
+            self.reject(e)
+        self.file.content_type = self.validator.content_type
+        return super().file_complete(file_size)
+
+    def reject(self, error):
+        self.error = error
+        self.file.close()
+        raise StopUpload(connection_reset=False)
+
+
+def receive_raw_image(stream, content_length=None, max_bytes=None):
+    """
+    Read an image body from a file-like stream in chunks into a temporary
+    file. Raises ImageUploadError before writing anything when the declared
+    Content-Length is already too large.
+    """
+    validator = ImageValidator(max_bytes)
+    if content_length is not None and content_length > validator.max_bytes:
+        raise too_large_error(validator.max_bytes)
+
+    upload = TemporaryUploadedFile('captured_image', 'application/octet-stream', 0, None)
+    try:
+        while chunk := stream.read(settings.ASSESSMENT_IMAGE_CHUNK_BYTES):
+            validator.feed(chunk)
+            upload.write(chunk)
+        validator.finish()
+    except BaseException:
+        upload.close()
+        raise
+    upload.content_type = validator.content_type
+    upload.size = validator.size
+    upload.seek(0)
+    return upload, validator.extension
+
+
+def image_filename(extension):
+    return f"expression_{uuid.uuid4().hex[:8]}.{extension}"
+
+
+def save_captured_image(assessment, upload, extension):
+    """Attach an uploaded image to the assessment; a temporary file is moved, not copied"""
+    if assessment.captured_image:
+        assessment.captured_image.delete(save=False)
+    assessment.captured_image.save(image_filename(extension), upload, save=False)
@@ -12,7 +12,13 @@ urlpatterns = [
     path('signup/', views.signup_view, name="login"),
     path('editprofile/',views.edit_profile, name='edit_profile'),
     path('assessments/', views.create_assessment, name='create_assessment'),
+    path('assessments/<int:pk>/image/', views.upload_assessment_image, name='upload_assessment_image'),
+    path('assessments/jobs/<uuid:job_id>/', views.assessment_job_status, name='assessment_job_status'),
     path('audio-analysis/', views.audio_analysis_view, name='audio-analysis'),
+    path('audio-analysis/<int:pk>/', views.audio_analysis_status, name='audio_analysis_status'),
+    path('audio-uploads/', views.start_audio_upload, name='start_audio_upload'),
+    path('audio-uploads/<uuid:upload_id>/', views.audio_upload_chunk, name='audio_upload_chunk'),
+    path('audio-uploads/<uuid:upload_id>/finalize/', views.finalize_audio_upload, name='finalize_audio_upload'),
 
     # path('scores/<int:user_id>/', views.get_user_scores, name='get_user_scores'),
 
@@ -304,10 +304,34 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from .models import AudioAnalysis
+from django.conf import settings
+from .models import AudioAnalysis, AudioUpload
+from .audio_uploads import UploadError, finalize_upload, parse_checksum, start_upload, write_chunk
 
 User = get_user_model()
 
+AUDIO_CONTENT_TYPES = ['audio/m4a', 'audio/mp3', 'audio/wav', 'audio/aac', 'audio/x-m4a']
+
+
+def recording_assessment(user, assessment_id=None):
+    """The assessment a recording answers: the one given, or the user's latest"""
+    assessments = Assessment.objects.filter(user=user)
+    if assessment_id:
+        return assessments.get(pk=assessment_id)
+    return assessments.order_by('-created_at', '-pk').first()
+
+
+def analysis_started(audio_analysis):
+    return {
+        'success': True,
+        'message': 'Audio received, analysis running' if audio_analysis.status == 'processing'
+                   else f'Audio analysis {audio_analysis.status}',
+        'analysis_id': audio_analysis.id,
+        'status': audio_analysis.status,
+        'status_url': reverse('audio_analysis_status', args=[audio_analysis.id]),
+    }
+
+
 @api_view(['POST'])
 def audio_analysis_view(request):
     try:
@@ -348,8 +372,7 @@ def audio_analysis_view(request):
         audio_file = request.FILES['audio']
         
         # Validate file type
-        allowed_types = ['audio/m4a', 'audio/mp3', 'audio/wav', 'audio/aac', 'audio/x-m4a']
-        if audio_file.content_type not in allowed_types:
+        if audio_file.content_type not in AUDIO_CONTENT_TYPES:
             return Response(
                 {'success': False, 'message': 'Invalid file type'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -363,28 +386,27 @@ def audio_analysis_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            assessment = recording_assessment(user, request.POST.get('assessment_id'))
+        except Assessment.DoesNotExist:
+            return Response(
+                {'success': False, 'message': 'Assessment not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
         # Create audio analysis record
         audio_analysis = AudioAnalysis.objects.create(
             user=user,
+            assessment=assessment,
             audio_file=audio_file,
-            status='uploaded'
+            status='processing'
         )
         
-        # Process the audio (your analysis logic here)
-        audio_analysis.status = 'completed'
-        audio_analysis.analysis_result = {
-            'emotion': 'neutral',
-            'confidence': 0.85,
-            'key_phrases': ['sample phrase 1', 'sample phrase 2'],
-            'sentiment_score': 0.6
-        }
-        audio_analysis.save()
+        # Decoding and feature extraction run in a worker process (see api/voice_jobs.py)
+        submit_analysis(audio_analysis)
+        audio_analysis.refresh_from_db()
         
-        return Response({
-            'success': True,
-            'message': 'Audio analysis completed successfully',
-            'analysis_id': audio_analysis.id
-        })
+        return Response(analysis_started(audio_analysis), status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
         print(f"Audio analysis error: {str(e)}")
@@ -401,6 +423,153 @@ def audio_analysis_view(request):
         )
     
 
+@api_view(['POST'])
+def start_audio_upload(request):
+    """Begin a resumable recording upload (see api/audio_uploads.py)"""
+    try:
+        user = User.objects.get(id=request.data.get('user_id'))
+    except (User.DoesNotExist, ValueError, TypeError):
+        return Response(
+            {'success': False, 'message': 'User not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    content_type = request.data.get('content_type', '')
+    if content_type not in AUDIO_CONTENT_TYPES:
+        return Response(
+            {'success': False, 'message': 'Invalid file type'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        size = int(request.data.get('size'))
+    except (ValueError, TypeError):
+        return Response(
+            {'success': False, 'message': 'size must be the number of bytes in the recording'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    assessment_id = request.data.get('assessment_id')
+    if assessment_id and not str(assessment_id).isdigit():
+        return Response(
+            {'success': False, 'message': 'assessment_id must be an assessment id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        assessment = recording_assessment(user, assessment_id)
+    except Assessment.DoesNotExist:
+        return Response(
+            {'success': False, 'message': 'Assessment not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        upload = start_upload(user, assessment, size, content_type, request.data.get('filename'))
+    except UploadError as e:
+        return Response({'success': False, 'message': str(e)}, status=e.status_code)
+    
+    return Response({
+        'success': True,
+        'upload_id': str(upload.id),
+        'offset': upload.received,
+        'size': upload.size,
+        'chunk_max_bytes': settings.AUDIO_UPLOAD_CHUNK_MAX_BYTES,
+        'expires_at': upload.expires_at,
+        'upload_url': reverse('audio_upload_chunk', args=[upload.id]),
+        'finalize_url': reverse('finalize_audio_upload', args=[upload.id]),
+    }, status=status.HTTP_201_CREATED)
+
+
+def upload_error_response(error):
+    headers = {'Upload-Offset': str(error.offset)} if error.offset is not None else None
+    return Response(
+        {'success': False, 'message': str(error), 'offset': error.offset},
+        status=error.status_code, headers=headers
+    )
+
+
+@api_view(['GET', 'HEAD', 'PUT'])
+@parser_classes([])
+def audio_upload_chunk(request, upload_id):
+    """GET/HEAD: the committed offset. PUT: one chunk at Upload-Offset, checked against Upload-Checksum."""
+    if request.method in ('GET', 'HEAD'):
+        try:
+            upload = AudioUpload.objects.get(pk=upload_id)
+        except AudioUpload.DoesNotExist:
+            return Response(
+                {'success': False, 'message': 'Upload not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({
+            'success': True,
+            'offset': upload.received,
+            'size': upload.size,
+            'status': upload.status,
+            'analysis_id': upload.analysis_id,
+        }, headers={'Upload-Offset': str(upload.received), 'Cache-Control': 'no-store'})
+    
+    try:
+        offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response(
+            {'success': False, 'message': 'Upload-Offset and Content-Length must be numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        checksum = parse_checksum(request.META.get('HTTP_UPLOAD_CHECKSUM'))
+        # The body is read straight from the WSGI stream into the partial file
+        committed = write_chunk(upload_id, offset, length, checksum, request._request)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return Response(
+        {'success': True, 'offset': committed},
+        headers={'Upload-Offset': str(committed)}
+    )
+
+
+@api_view(['POST'])
+def finalize_audio_upload(request, upload_id):
+    """Store a complete upload as an AudioAnalysis and start the voice analysis"""
+    try:
+        audio_analysis, created = finalize_upload(upload_id, request.data.get('sha256'))
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    if created:
+        User.objects.filter(pk=audio_analysis.user_id).update(has_completed_assessment=True)
+        submit_analysis(audio_analysis)
+        audio_analysis.refresh_from_db()
+    
+    return Response(analysis_started(audio_analysis), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def audio_analysis_status(request, pk):
+    """Poll a voice analysis started by audio_analysis_view"""
+    try:
+        audio_analysis = AudioAnalysis.objects.get(pk=pk)
+    except AudioAnalysis.DoesNotExist:
+        return Response(
+            {'success': False, 'message': 'Audio analysis not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({
+        'success': True,
+        'analysis_id': audio_analysis.id,
+        'assessment': audio_analysis.assessment_id,
+        'status': audio_analysis.status,
+        'duration': audio_analysis.duration,
+        'emotion': audio_analysis.emotion,
+        'confidence': audio_analysis.confidence,
+        'features': audio_analysis.features,
+        'error': (audio_analysis.analysis_result or {}).get('error'),
+        'processed_at': audio_analysis.processed_at,
+    })
+    
+
 # assessments/views.py
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -411,23 +580,44 @@ from .serializers import AssessmentSerializer
 
 User = get_user_model()
 
-from transformers import pipeline
 import json
 import logging
 from django.db import transaction
-import uuid
 import base64
 from django.core.files.base import ContentFile
-from .models import UserScore
+from django.urls import reverse
+from .models import ScoringJob, UserScore
+from .jobs import enqueue_scoring
+from .rubric import get_rubric
+from .uploads import (
+    CapturedImageUploadHandler, ImageUploadError, ImageValidator, image_filename,
+    receive_raw_image, save_captured_image,
+)
+from EmotionDetection.long_text import analyze_text
+from EmotionDetection.admission import InferenceRejected
+from .scoring import (
+    mood_score as mood_score_of, negative_keyword_count, negative_keyword_score,
+    pack_probabilities, primary_emotion as primary_emotion_of, probabilities_from_result,
+    sleep_score as sleep_score_of, text_model_scores, unpack_probabilities, update_total_score,
+    apply_voice_scores,
+)
+from .voice_jobs import latest_voice_features, submit_analysis
 
 logger = logging.getLogger(__name__)
 
-# Pretrained model load (load once) - moved here for shared access
-emotion_pipeline = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base")
-
 @api_view(['POST'])
 def create_assessment(request):
+    # Has to be in place before request.data parses a multipart body
+    image_handler = CapturedImageUploadHandler(request._request)
+    request._request.upload_handlers = [image_handler]
+
     user_id = request.data.get('user')
+    if image_handler.error is not None:
+        # Fields after a refused image are never parsed, so check this first
+        return Response(
+            {'error': str(image_handler.error)},
+            status=image_handler.error.status_code
+        )
     
     if not user_id:
         return Response(
@@ -443,8 +633,9 @@ def create_assessment(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Create a copy of the data
-    data = request.data.copy()
+    # Create a copy of the data: for form and multipart bodies only the plain
+    # fields, as single values (uploaded files can't be deep-copied)
+    data = request.POST.dict() if request.POST else request.data.copy()
     data.pop('user', None)
     
     # Extract text from expression_analysis field
@@ -452,26 +643,32 @@ def create_assessment(request):
     print(f"Received text for emotion detection from expression_analysis: '{user_text}'")
     print(f"Text length: {len(user_text)}")
     
-    # Handle captured_image if it's base64
+    # Handle captured_image: a streamed multipart file, or base64 from old app versions
+    uploaded_image = request.FILES.get('captured_image')
     captured_image_data = data.pop('captured_image', None)
     
     # Create assessment without captured_image first
     assessment = Assessment(user=user, **data)
     
+    if uploaded_image is not None:
+        save_captured_image(assessment, uploaded_image, image_handler.validator.extension)
+        print(f"Image streamed to storage: {assessment.captured_image.name} ({uploaded_image.size} bytes)")
+    
     # Handle base64 image data
-    if captured_image_data:
+    elif captured_image_data:
         print(f"Received image data, length: {len(captured_image_data)}")
         
         try:
             # If it's a base64 string (not data URI)
             if isinstance(captured_image_data, str) and len(captured_image_data) > 100:
-                # Generate unique filename
-                filename = f"expression_{uuid.uuid4().hex[:8]}.jpg"
-                
                 # Decode base64 string
                 image_data = base64.b64decode(captured_image_data)
+                validator = ImageValidator()
+                validator.feed(image_data)
+                validator.finish()
                 
                 # Create ContentFile and save to ImageField
+                filename = image_filename(validator.extension)
                 assessment.captured_image.save(
                     filename, 
                     ContentFile(image_data),
@@ -487,41 +684,28 @@ def create_assessment(request):
             # Continue without image if there's an error
     
     try:
+        # Only the assessment and its job are written here; the worker runs the model
         with transaction.atomic():
-            # Save assessment first
             assessment.save()
-            print(f"Assessment saved with ID: {assessment.id}")
-            print(f"Assessment fields: mood={assessment.mood}, sleep_quality={assessment.sleep_quality}, expression_analysis={assessment.expression_analysis}")
-            
-            # Calculate and create UserScore with emotion detection
-            user_score = calculate_user_score(assessment)
-            user_score.save()
-            
-            serializer = AssessmentSerializer(assessment)
-            
-            return Response(
-                {
-                    'message': 'Assessment created successfully', 
-                    'data': serializer.data,
-                    'score_details': {
-                        'total_score': user_score.total_score,
-                        'breakdown': {
-                            'basic_info_score': user_score.sleep_score,
-                            'mood_score': user_score.mood_score,
-                            'text_emotion_score': {
-                                'sentiment': user_score.text_sentiment_score,
-                                'emotion': user_score.text_emotion_score,
-                                'negative_keywords': user_score.text_negative_keywords_score,
-                                'total': user_score.text_sentiment_score + user_score.text_emotion_score + user_score.text_negative_keywords_score
-                            },
-                            'image_emotion_score': user_score.image_expression_score + user_score.image_fatigue_score + user_score.image_darkcircles_score + user_score.image_stressmicro_score,
-                            'voice_emotion_score': user_score.voice_tone_score + user_score.voice_pitch_score + user_score.voice_speed_score + user_score.voice_hesitation_score + user_score.voice_stress_score
-                        },
-                        'text_analyzed': user_text[:500] if user_text else "No text provided"
-                    }
-                }, 
-                status=status.HTTP_201_CREATED
-            )
+            job = enqueue_scoring(assessment)
+        print(f"Assessment saved with ID: {assessment.id}, scoring job: {job.id}")
+        print(f"Assessment fields: mood={assessment.mood}, sleep_quality={assessment.sleep_quality}, expression_analysis={assessment.expression_analysis}")
+        
+        serializer = AssessmentSerializer(assessment)
+        
+        return Response(
+            {
+                'message': 'Assessment received, scoring queued',
+                'data': serializer.data,
+                'image_upload_url': reverse('upload_assessment_image', args=[assessment.id]),
+                'job': {
+                    'id': str(job.id),
+                    'status': job.status,
+                    'status_url': reverse('assessment_job_status', args=[job.id]),
+                }
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
     except Exception as e:
         logger.error(f"Error creating assessment: {str(e)}")
         return Response(
@@ -529,6 +713,99 @@ def create_assessment(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+
+@api_view(['PUT'])
+@parser_classes([])
+def upload_assessment_image(request, pk):
+    """Raw-body upload of an assessment's captured image, streamed to storage (see api/uploads.py)"""
+    try:
+        assessment = Assessment.objects.get(pk=pk)
+    except Assessment.DoesNotExist:
+        return Response(
+            {'error': 'Assessment not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0) or None
+        # The body is read straight from the WSGI stream, never through request.data
+        upload, extension = receive_raw_image(request._request, content_length)
+    except ValueError:
+        return Response(
+            {'error': 'Invalid Content-Length'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ImageUploadError as e:
+        return Response(
+            {'error': str(e)},
+            status=e.status_code
+        )
+    
+    try:
+        save_captured_image(assessment, upload, extension)
+        assessment.save(update_fields=['captured_image'])
+    finally:
+        upload.close()
+    print(f"Image streamed to storage for assessment {assessment.id}: {assessment.captured_image.name}")
+    
+    return Response(
+        {
+            'message': 'Image uploaded successfully',
+            'captured_image_url': assessment.captured_image.url,
+            'size': upload.size,
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+def score_details(user_score, user_text):
+    return {
+        'total_score': user_score.total_score,
+        'breakdown': {
+            'basic_info_score': user_score.sleep_score,
+            'mood_score': user_score.mood_score,
+            'text_emotion_score': {
+                'sentiment': user_score.text_sentiment_score,
+                'emotion': user_score.text_emotion_score,
+                'negative_keywords': user_score.text_negative_keywords_score,
+                'total': user_score.text_sentiment_score + user_score.text_emotion_score + user_score.text_negative_keywords_score
+            },
+            'image_emotion_score': user_score.image_expression_score + user_score.image_fatigue_score + user_score.image_darkcircles_score + user_score.image_stressmicro_score,
+            'voice_emotion_score': user_score.voice_tone_score + user_score.voice_pitch_score + user_score.voice_speed_score + user_score.voice_hesitation_score + user_score.voice_stress_score
+        },
+        'text_analyzed': user_text[:500] if user_text else "No text provided"
+    }
+
+
+@api_view(['GET'])
+def assessment_job_status(request, job_id):
+    """Poll a scoring job queued by create_assessment; the score is included once it is done"""
+    try:
+        job = ScoringJob.objects.select_related('assessment').get(pk=job_id)
+    except ScoringJob.DoesNotExist:
+        return Response(
+            {'error': 'Job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    data = {
+        'id': str(job.id),
+        'status': job.status,
+        'assessment': job.assessment_id,
+        'attempts': job.attempts,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+    
+    if job.status == ScoringJob.DONE:
+        user_score = UserScore.objects.filter(assessment=job.assessment).first()
+        if user_score is not None:
+            data['score_details'] = score_details(user_score, job.assessment.expression_analysis)
+    elif job.status == ScoringJob.FAILED:
+        data['error'] = job.last_error
+    
+    return Response(data, status=status.HTTP_200_OK)
+
 def detect_text_emotion(text):
     """
     Detect emotion from text and return scores for text emotion components
@@ -538,87 +815,57 @@ def detect_text_emotion(text):
         return {
             "text_sentiment_score": 0,
             "text_emotion_score": 0,
-            "text_negative_keywords_score": 0
+            "text_negative_keywords_score": 0,
+            "text_emotion_probs": None
         }
     
     print(f"Detecting emotion from text: '{text}'")
     print(f"Text length: {len(text)}")
     
     try:
-        # Process emotion detection
-        result = emotion_pipeline(text)
+        # Process emotion detection (long texts are analysed window by window)
+        result = analyze_text(text)
         print(f"Emotion detection result: {result}")
         
-        # Get primary emotion and score
-        primary_emotion = result[0]['label']
-        confidence = result[0]['score']
+        # Keep the full probability vector so scores can be re-derived later
+        probabilities = probabilities_from_result(result)
+        primary_emotion, confidence = primary_emotion_of(probabilities)
         print(f"Primary emotion: {primary_emotion}, Confidence: {confidence}")
         
-        # 1️⃣ Sentiment Polarity Score (10 points)
-        # Negative emotions get higher scores (worse mental health)
-        negative_emotions = ['anger', 'disgust', 'fear', 'sadness']
-        positive_emotions = ['joy', 'surprise', 'neutral']
-        
-        if primary_emotion in negative_emotions:
-            # Scale sentiment score based on confidence (0-10 points)
-            text_sentiment_score = min(10, confidence * 10)
-        elif primary_emotion in positive_emotions:
-            # Positive emotions get lower scores (better mental health)
-            text_sentiment_score = min(3, confidence * 3)  # Max 3 for positive
-        else:
-            text_sentiment_score = 5  # Neutral
-        
-        # 2️⃣ Emotion Category Score (10 points)
-        emotion_score_map = {
-            'anger': 10,      # Highest score for anger
-            'disgust': 9,     # High score for disgust
-            'fear': 8,        # High score for fear
-            'sadness': 7,     # Medium-high for sadness
-            'surprise': 4,    # Medium-low for surprise (can be positive/negative)
-            'neutral': 2,     # Low for neutral
-            'joy': 0,         # Zero for joy (positive emotion)
-        }
-        
-        text_emotion_score = emotion_score_map.get(primary_emotion.lower(), 5)
+        # 1️⃣ Sentiment Polarity Score + 2️⃣ Emotion Category Score (see api/scoring.py)
+        # Scored from the packed float32 vector so a later rescore gives exactly the same numbers
+        packed_probabilities = pack_probabilities(probabilities)
+        model_scores = text_model_scores(unpack_probabilities(packed_probabilities))
         
         # 3️⃣ Negative Keywords Count Score (5 points)
-        # Count negative words in text
-        negative_keywords = ['sad', 'angry', 'depressed', 'anxious', 'stress', 
-                           'tired', 'exhausted', 'hopeless', 'lonely', 'hurt',
-                           'bad', 'terrible', 'awful', 'hate', 'cant', "can't",
-                           'worried', 'scared', 'frustrated', 'upset', 'miserable',
-                           'pain', 'suffer', 'alone', 'empty', 'guilty']
-        
-        text_lower = text.lower()
-        negative_count = sum(1 for word in negative_keywords if word in text_lower)
+        # Count negative words in text (see api/scoring.py)
+        negative_count = negative_keyword_count(text)
         print(f"Negative keywords found: {negative_count}")
         
         # Score based on negative word count (0-5 points)
-        if negative_count >= 5:
-            text_negative_score = 5
-        elif negative_count >= 3:
-            text_negative_score = 3
-        elif negative_count >= 1:
-            text_negative_score = 1
-        else:
-            text_negative_score = 0
+        text_negative_score = negative_keyword_score(negative_count)
         
         scores = {
-            "text_sentiment_score": round(text_sentiment_score, 2),
-            "text_emotion_score": text_emotion_score,
-            "text_negative_keywords_score": text_negative_score
+            "text_sentiment_score": model_scores["text_sentiment_score"],
+            "text_emotion_score": model_scores["text_emotion_score"],
+            "text_negative_keywords_score": text_negative_score,
+            "text_emotion_probs": packed_probabilities
         }
         
         print(f"Text emotion scores calculated: {scores}")
         return scores
         
+    except InferenceRejected:
+        # Let the view tell the client to retry instead of silently scoring 0
+        raise
     except Exception as e:
         logger.error(f"Error in emotion detection: {str(e)}")
         print(f"Error in emotion detection: {str(e)}")
         return {
             "text_sentiment_score": 0,
             "text_emotion_score": 0,
-            "text_negative_keywords_score": 0
+            "text_negative_keywords_score": 0,
+            "text_emotion_probs": None
         }
 
 def calculate_user_score(assessment):
@@ -628,7 +875,7 @@ def calculate_user_score(assessment):
     Args:
         assessment: The saved Assessment object
     """
-    user_score = UserScore(user=assessment.user)
+    user_score = UserScore(user=assessment.user, assessment=assessment)
     
     print(f"=== Calculating score for assessment ID: {assessment.id} ===")
     
@@ -636,16 +883,7 @@ def calculate_user_score(assessment):
     sleep_quality = getattr(assessment, 'sleep_quality', '')
     print(f"Sleep quality from assessment: '{sleep_quality}'")
     
-    if sleep_quality and sleep_quality.lower() == 'excellent':
-        user_score.sleep_score = 4
-    elif sleep_quality and sleep_quality.lower() == 'good':
-        user_score.sleep_score = 3
-    elif sleep_quality and sleep_quality.lower() == 'fair':
-        user_score.sleep_score = 2
-    elif sleep_quality and sleep_quality.lower() == 'worst':
-        user_score.sleep_score = 1
-    else:
-        user_score.sleep_score = 0
+    user_score.sleep_score = sleep_score_of(sleep_quality)
     
     print(f"Sleep score: {user_score.sleep_score}")
     
@@ -653,24 +891,7 @@ def calculate_user_score(assessment):
     mood = getattr(assessment, 'mood', '')
     print(f"Mood from assessment: '{mood}'")
     
-    if mood and mood.lower() == 'happy':
-        user_score.mood_score = 0
-        user_score.mood_label = 'Happy'
-    elif mood and mood.lower() == 'neutral':
-        user_score.mood_score = 2
-        user_score.mood_label = 'Neutral'
-    elif mood and mood.lower() == 'low':
-        user_score.mood_score = 5
-        user_score.mood_label = 'Low'
-    elif mood and mood.lower() == 'sad':
-        user_score.mood_score = 8
-        user_score.mood_label = 'Sad'
-    elif mood and mood.lower() == 'angry':
-        user_score.mood_score = 10
-        user_score.mood_label = 'Angry'
-    else:
-        user_score.mood_score = 0
-        user_score.mood_label = 'Unknown'
+    user_score.mood_score, user_score.mood_label = mood_score_of(mood)
     
     print(f"Mood score: {user_score.mood_score}, Mood label: {user_score.mood_label}")
     
@@ -691,33 +912,27 @@ def calculate_user_score(assessment):
     user_score.text_sentiment_score = text_emotion_scores['text_sentiment_score']
     user_score.text_emotion_score = text_emotion_scores['text_emotion_score']
     user_score.text_negative_keywords_score = text_emotion_scores['text_negative_keywords_score']
+    user_score.text_emotion_probs = text_emotion_scores['text_emotion_probs']
     
     print(f"Text emotion scores assigned to user_score:")
     print(f"  Sentiment: {user_score.text_sentiment_score}")
     print(f"  Emotion: {user_score.text_emotion_score}")
     print(f"  Negative keywords: {user_score.text_negative_keywords_score}")
     
-    # 4️⃣ Image Emotion Recognition (Total 25 points) - Currently set to 0
-    user_score.image_expression_score = 0
-    user_score.image_fatigue_score = 0
-    user_score.image_darkcircles_score = 0
-    user_score.image_stressmicro_score = 0
-    
-    # 5️⃣ Voice Emotion (Total 30 points) - Currently set to 0
-    user_score.voice_tone_score = 0
-    user_score.voice_pitch_score = 0
-    user_score.voice_speed_score = 0
-    user_score.voice_hesitation_score = 0
-    user_score.voice_stress_score = 0
-    
-    # Calculate total score
-    user_score.total_score = (
-        user_score.sleep_score +  # Basic Info (10)
-        user_score.mood_score +  # Mood (10)
-        user_score.text_sentiment_score + user_score.text_emotion_score + user_score.text_negative_keywords_score +  # Text Emotion (25)
-        user_score.image_expression_score + user_score.image_fatigue_score + user_score.image_darkcircles_score + user_score.image_stressmicro_score +  # Image Emotion (25)
-        user_score.voice_tone_score + user_score.voice_pitch_score + user_score.voice_speed_score + user_score.voice_hesitation_score + user_score.voice_stress_score  # Voice Emotion (30)
-    )
+    # 4️⃣ Image Emotion Recognition (Total 25 points)
+    # Not scored yet: the rubric gives every assessment the same constant scores
+    rubric = get_rubric()
+    for name, spec in rubric.components.items():
+        if spec['kind'] == 'constant':
+            setattr(user_score, spec['column'], rubric.constant_score(name))
+    user_score.rubric_version = rubric.version
+    
+    # 5️⃣ Voice Emotion (Total 30 points), from the recorded answer if it has been analysed
+    voice_features = latest_voice_features([assessment.id]).get(assessment.id)
+    print(f"Voice features: {voice_features}")
+    
+    # Calculate total score (apply_voice_scores totals everything)
+    apply_voice_scores(user_score, voice_features)
     
     print(f"Total score calculated: {user_score.total_score}")
     print(f"=== Score calculation complete ===")
@@ -728,15 +943,40 @@ def calculate_user_score(assessment):
 
 
 
-from rest_framework import generics
+from rest_framework import generics, serializers
+from django.db.models import Exists, OuterRef
 from .models import Article
 from .serializers import ArticleSerializer
-
-class ArticleListView(generics.ListAPIView):
-    queryset = Article.objects.all().order_by("-created_at")
+from .articles import record_view, toggle_like
+from .pagination import KeysetPagination
+
+class ArticleQuerysetMixin:
+    """Author and the user's like come with each article instead of a query apiece"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("author")
+        if self.request.user.is_authenticated:
+            queryset = queryset.annotate(liked_by_user=Exists(
+                ArticleLike.objects.filter(article=OuterRef("pk"), user=self.request.user)
+            ))
+        return queryset
+
+class ArticleListView(ArticleQuerysetMixin, generics.ListAPIView):
+    """Newest first, a page at a time (?cursor=, ?limit=), optionally one ?category="""
+    queryset = Article.objects.all().order_by("-created_at", "-id")
     serializer_class = ArticleSerializer
-
-class ArticleDetailView(generics.RetrieveAPIView):
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        category = self.request.query_params.get("category")
+        if category:
+            if category not in dict(Article.CATEGORY_CHOICES):
+                raise serializers.ValidationError({"category": f"Unknown category '{category}'"})
+            queryset = queryset.filter(category=category)
+        return queryset
+
+class ArticleDetailView(ArticleQuerysetMixin, generics.RetrieveAPIView):
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
 
@@ -761,25 +1001,9 @@ def like_article(request, pk):
         user = get_object_or_404(User, id=user_id)
         article = get_object_or_404(Article, pk=pk)
         
-        # Check if user already liked the article
-        existing_like = ArticleLike.objects.filter(
-            article=article, 
-            user=user
-        ).first()
-        
-        if existing_like:
-            # Unlike the article
-            existing_like.delete()
-            liked = False
-            message = "Article unliked successfully"
-        else:
-            # Like the article
-            ArticleLike.objects.create(article=article, user=user)
-            liked = True
-            message = "Article liked successfully"
-        
-        # Get updated like count - direct query approach
-        like_count = ArticleLike.objects.filter(article=article).count()
+        # Like the article, or unlike it if the user already does
+        liked, like_count = toggle_like(article, user)
+        message = "Article liked successfully" if liked else "Article unliked successfully"
         
         return JsonResponse({
             'success': True,
@@ -818,7 +1042,7 @@ def check_article_like_status(request, pk):
         
         # Check if user already liked the article
         is_liked = ArticleLike.objects.filter(article=article, user=user).exists()
-        like_count = ArticleLike.objects.filter(article=article).count()
+        like_count = article.like_count
         
         return JsonResponse({
             'success': True,
@@ -854,14 +1078,8 @@ def track_article_view(request, pk):
         
         article = get_object_or_404(Article, pk=pk)
         
-        # Create view record
-        ArticleView.objects.create(
-            article=article,
-            user_id=user_id  # This will be null if user_id is not provided
-        )
-        
-        # Get updated total views from the serializer field
-        total_views = article.views.count()
+        # Create view record; user_id is null for anonymous users
+        total_views = record_view(article, user_id)
         
         return JsonResponse({
             'success': True,
@@ -888,7 +1106,7 @@ def get_article_views(request, pk):
     try:
         article = get_object_or_404(Article, pk=pk)
         
-        total_views = article.views.count()
+        total_views = article.view_count
         unique_user_views = article.views.exclude(user__isnull=True).values('user').distinct().count()
         anonymous_views = article.views.filter(user__isnull=True).count()
         
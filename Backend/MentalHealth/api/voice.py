@@ -0,0 +1,325 @@
+"""
+Voice features of a recorded answer, computed with NumPy.
+
+The audio is decoded in chunks: stdlib `wave` for PCM WAV, and an ffmpeg
+pipe for everything else (M4A/AAC/MP3). Each chunk is cut into
+overlapping frames with stride tricks, as views with no copy. The
+per-frame measures are whole-array operations over every frame of the
+chunk at once:
+
+    energy   RMS level in dBFS
+    pitch    YIN: difference function via FFT, cumulative mean normalisation,
+             first dip under the threshold, parabolic refinement
+
+The recording-level features are computed from those frame arrays.
+Speaking rate comes from syllable nuclei (peaks of the energy envelope),
+pauses from runs of silent frames, and jitter from the change in pitch
+period between neighbouring voiced frames. This is frame-level jitter,
+which runs higher than the cycle-level jitter of clinical tools.
+
+This module imports nothing from Django, so process-pool workers start
+quickly (see voice_jobs.py).
+"""
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+FFMPEG_SAMPLE_RATE = 16000
+
+HOP_SECONDS = 0.010
+PITCH_MIN_HZ = 65.0
+PITCH_MAX_HZ = 450.0
+YIN_THRESHOLD = 0.15
+SILENCE_BELOW_PEAK_DB = 30.0  # frames this far under the loud frames are silent
+SILENCE_FLOOR_DB = -50.0  # and anything under this, whatever the peak
+MIN_PAUSE_SECONDS = 0.20
+SYLLABLE_MIN_GAP_SECONDS = 0.10
+
+# Rough feature prototypes of each emotion, and how far apart values count as different.
+# The voice emotion is the nearest prototype; this is a heuristic, not a trained model.
+PROTOTYPE_FEATURES = ('pitch_std_semitones', 'energy_std_db', 'speaking_rate', 'pause_ratio', 'jitter')
+PROTOTYPE_SCALES = np.array([1.0, 3.0, 1.0, 0.1, 0.02])
+EMOTION_PROTOTYPES = {
+    'neutral': [2.0, 6.0, 4.0, 0.20, 0.03],
+    'happy': [3.5, 9.0, 4.8, 0.12, 0.03],
+    'sad': [1.0, 4.0, 2.8, 0.40, 0.04],
+    'angry': [3.0, 12.0, 4.5, 0.10, 0.06],
+    'fearful': [3.5, 8.0, 5.2, 0.20, 0.07],
+}
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+# ---- Decoding ----
+
+def _pcm_to_float(data, sample_width, channels):
+    if sample_width == 1:
+        samples = np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0
+        scale = 128.0
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        # Little-endian 24-bit into the top of an int32, keeping the sign
+        samples = (raw[:, 0].astype(np.int32) << 8 | raw[:, 1].astype(np.int32) << 16
+                   | raw[:, 2].astype(np.int32) << 24).astype(np.float32)
+        scale = 2.0 ** 31
+    else:
+        samples = np.frombuffer(data, dtype=f'<i{sample_width}').astype(np.float32)
+        scale = 2.0 ** (8 * sample_width - 1)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples / scale
+
+
+def _wav_chunks(path, chunk_seconds):
+    with wave.open(path, 'rb') as wav:
+        sample_rate = wav.getframerate()
+        sample_width, channels = wav.getsampwidth(), wav.getnchannels()
+        frames_per_chunk = max(1, int(sample_rate * chunk_seconds))
+        yield sample_rate
+        while data := wav.readframes(frames_per_chunk):
+            yield _pcm_to_float(data, sample_width, channels)
+
+
+def _ffmpeg_chunks(path, chunk_seconds, ffmpeg):
+    binary = shutil.which(ffmpeg)
+    if binary is None:
+        raise AudioDecodeError(f"{ffmpeg} is needed to decode {os.path.basename(path)} and was not found")
+    process = subprocess.Popen(
+        [binary, '-nostdin', '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1', '-ar', str(FFMPEG_SAMPLE_RATE), '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    yield FFMPEG_SAMPLE_RATE
+    chunk_bytes = 2 * int(FFMPEG_SAMPLE_RATE * chunk_seconds)
+    try:
+        while data := process.stdout.read(chunk_bytes):
+            if len(data) % 2:
+                data += process.stdout.read(1)
+            yield _pcm_to_float(data, 2, 1)
+    finally:
+        process.stdout.close()
+        error = process.stderr.read().decode(errors='replace').strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise AudioDecodeError(f"ffmpeg could not decode {os.path.basename(path)}: {error}")
+
+
+def decode_chunks(path, chunk_seconds=5.0, ffmpeg='ffmpeg'):
+    """
+    Mono float32 samples of an audio file, chunk_seconds at a time. The
+    first item yielded is the sample rate.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        try:
+            yield from _wav_chunks(path, chunk_seconds)
+            return
+        except wave.Error:
+            pass  # Float or compressed WAV: let ffmpeg decode it
+    yield from _ffmpeg_chunks(path, chunk_seconds, ffmpeg)
+
+
+# ---- Per-frame measures ----
+
+class FrameAnalyzer:
+    """Frames a stream of chunks and keeps the per-frame energy and pitch"""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.hop = max(1, int(round(sample_rate * HOP_SECONDS)))
+        self.tau_min = max(2, int(sample_rate / PITCH_MAX_HZ))
+        self.tau_max = int(np.ceil(sample_rate / PITCH_MIN_HZ))
+        # YIN compares a window of w samples with the same window shifted by up to tau_max
+        self.window = self.tau_max
+        self.frame_length = self.window + self.tau_max + 1
+        self.fft_size = 1 << int(np.ceil(np.log2(self.frame_length + self.window)))
+
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.samples = 0
+        self.energy_db = []
+        self.f0 = []
+
+    def feed(self, chunk):
+        self.samples += len(chunk)
+        buffer = np.concatenate([self.pending, chunk])
+        if len(buffer) < self.frame_length:
+            self.pending = buffer
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame_length)[::self.hop]
+        # The samples the next frame starts from
+        self.pending = buffer[len(frames) * self.hop:]
+        self.energy_db.append(self.frame_energy_db(frames))
+        self.f0.append(self.frame_pitch(frames))
+
+    def feed_all(self, samples, block_seconds=5.0):
+        """
+        Feed a whole recording at once, such as a memory-mapped one from
+        pcm_cache. The frames are views of `samples`, and they are measured
+        block_seconds at a time.
+        """
+        self.samples += len(samples)
+        buffer = np.concatenate([self.pending, samples]) if len(self.pending) else samples
+        if len(buffer) < self.frame_length:
+            self.pending = np.asarray(buffer, dtype=np.float32)
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame_length)[::self.hop]
+        block = max(1, int(self.sample_rate * block_seconds / self.hop))
+        for start in range(0, len(frames), block):
+            self.energy_db.append(self.frame_energy_db(frames[start:start + block]))
+            self.f0.append(self.frame_pitch(frames[start:start + block]))
+        self.pending = np.array(buffer[len(frames) * self.hop:], dtype=np.float32)
+
+    def frame_energy_db(self, frames):
+        analysed = frames[:, :self.window + self.tau_max]
+        rms = np.sqrt(np.mean(np.square(analysed, dtype=np.float64), axis=1))
+        return 20 * np.log10(rms + 1e-10)
+
+    def frame_pitch(self, frames):
+        """Fundamental frequency of every frame (NaN when unvoiced), YIN"""
+        w, tau_max = self.window, self.tau_max
+        frames = frames.astype(np.float64)
+        # r(tau) = sum_j x[j] x[j + tau] over the window, all frames in one FFT
+        spectrum = np.fft.rfft(frames, self.fft_size, axis=1)
+        head = np.fft.rfft(frames[:, :w], self.fft_size, axis=1)
+        correlation = np.fft.irfft(np.conj(head) * spectrum, self.fft_size, axis=1)[:, :tau_max + 1]
+
+        squares = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+        taus = np.arange(tau_max + 1)
+        energy_at = squares[:, taus + w] - squares[:, taus]  # sum of x^2 over the shifted window
+        difference = np.maximum(energy_at[:, :1] + energy_at - 2 * correlation, 0.0)
+
+        # Cumulative mean normalised difference, 1 at tau 0
+        running = np.cumsum(difference[:, 1:], axis=1)
+        normalised = np.ones_like(difference)
+        normalised[:, 1:] = difference[:, 1:] * taus[1:] / np.where(running > 0, running, np.inf)
+
+        # First tau under the threshold that is also a local minimum
+        search = normalised[:, self.tau_min:tau_max]
+        dips = (search[:, :-1] < YIN_THRESHOLD) & (search[:, :-1] <= search[:, 1:])
+        voiced = dips.any(axis=1)
+        tau = dips.argmax(axis=1) + self.tau_min
+
+        # Parabolic interpolation around the dip
+        rows = np.arange(len(frames))
+        left, centre, right = (normalised[rows, tau - 1], normalised[rows, tau], normalised[rows, tau + 1])
+        curvature = left - 2 * centre + right
+        shift = np.where(np.abs(curvature) > 1e-12, 0.5 * (left - right) / np.where(curvature == 0, 1, curvature), 0.0)
+        refined = tau + np.clip(shift, -1, 1)
+        return np.where(voiced, self.sample_rate / refined, np.nan)
+
+    def arrays(self):
+        if not self.energy_db:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate(self.energy_db), np.concatenate(self.f0)
+
+
+# ---- Recording-level features ----
+
+def _runs(mask):
+    """(start, length) of every run of True in a boolean array"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def _optional(value, digits=4):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def features_from_frames(energy_db, f0, sample_rate, samples):
+    frames_per_second = 1.0 / HOP_SECONDS
+    features = {'duration': round(samples / sample_rate, 3) if sample_rate else 0.0}
+    if len(energy_db) == 0:
+        return features
+
+    threshold = max(SILENCE_FLOOR_DB, np.percentile(energy_db, 95) - SILENCE_BELOW_PEAK_DB)
+    speech = energy_db > threshold
+    if not speech.any():
+        features['speech_seconds'] = 0.0
+        return features
+    voiced = speech & np.isfinite(f0)
+
+    # Pauses: silent runs between the first and the last speech frame
+    first, last = np.flatnonzero(speech)[[0, -1]]
+    span = speech[first:last + 1]
+    starts, lengths = _runs(~span)
+    pauses = lengths[lengths >= MIN_PAUSE_SECONDS * frames_per_second]
+    span_seconds = len(span) / frames_per_second
+    speech_seconds = span.sum() / frames_per_second
+
+    # Syllable nuclei: speech frames that are the maximum of the smoothed
+    # envelope within SYLLABLE_MIN_GAP_SECONDS either side
+    envelope = np.convolve(energy_db, np.ones(5) / 5, mode='same')
+    reach = max(1, int(SYLLABLE_MIN_GAP_SECONDS * frames_per_second))
+    padded = np.pad(envelope, reach, constant_values=-np.inf)
+    neighbourhood = np.lib.stride_tricks.sliding_window_view(padded, 2 * reach + 1).max(axis=1)
+    nuclei = speech & (envelope >= neighbourhood) & (envelope > threshold + 6)
+
+    pitch = f0[voiced]
+    features.update({
+        'speech_seconds': round(float(speech_seconds), 3),
+        'voiced_ratio': _optional(voiced.sum() / max(1, speech.sum())),
+        'energy_mean_db': _optional(energy_db[speech].mean(), 2),
+        'energy_std_db': _optional(energy_db[speech].std(), 3),
+        'speaking_rate': _optional(nuclei.sum() / speech_seconds, 3),
+        'pause_ratio': _optional(pauses.sum() / frames_per_second / span_seconds),
+        'pauses_per_minute': _optional(len(pauses) / (span_seconds / 60), 2),
+        'mean_pause_seconds': _optional(pauses.mean() / frames_per_second if len(pauses) else 0.0, 3),
+    })
+    if len(pitch):
+        semitones = 12 * np.log2(pitch / np.median(pitch))
+        features.update({
+            'pitch_mean_hz': _optional(pitch.mean(), 2),
+            'pitch_std_semitones': _optional(semitones.std(), 3),
+            'pitch_range_semitones': _optional(np.percentile(semitones, 95) - np.percentile(semitones, 5), 3),
+        })
+        # Consecutive voiced frames only
+        both = voiced[1:] & voiced[:-1]
+        if both.any():
+            periods = 1.0 / f0
+            features['jitter'] = _optional(
+                np.abs(np.diff(periods))[both].mean() / periods[:-1][both].mean(), 5
+            )
+    return features
+
+
+def classify_emotion(features):
+    """(emotion, confidence) from the nearest EMOTION_PROTOTYPES; ('neutral', 0.0) without speech"""
+    values = [features.get(name) for name in PROTOTYPE_FEATURES]
+    known = np.array([value is not None for value in values])
+    if not known.any():
+        return 'neutral', 0.0
+    x = np.array([value if value is not None else 0.0 for value in values])
+    prototypes = np.array(list(EMOTION_PROTOTYPES.values()))
+    distances = (((x - prototypes) / PROTOTYPE_SCALES)[:, known] ** 2).sum(axis=1)
+    weights = np.exp(-(distances - distances.min()) / 2)
+    probabilities = weights / weights.sum()
+    best = int(probabilities.argmax())
+    return list(EMOTION_PROTOTYPES)[best], round(float(probabilities[best]), 4)
+
+
+def _result(analyzer):
+    features = features_from_frames(*analyzer.arrays(), analyzer.sample_rate, analyzer.samples)
+    emotion, confidence = classify_emotion(features)
+    return {'features': features, 'emotion': emotion, 'confidence': confidence}
+
+
+def analyze_file(path, chunk_seconds=5.0, ffmpeg='ffmpeg'):
+    """Everything AudioAnalysis stores about one recording. Runs in a pool worker."""
+    chunks = decode_chunks(path, chunk_seconds, ffmpeg)
+    analyzer = FrameAnalyzer(next(chunks))
+    for chunk in chunks:
+        analyzer.feed(chunk)
+    return _result(analyzer)
+
+
+def analyze_samples(samples, sample_rate, block_seconds=5.0):
+    """analyze_file for samples that are already decoded"""
+    analyzer = FrameAnalyzer(sample_rate)
+    analyzer.feed_all(samples, block_seconds)
+    return _result(analyzer)
@@ -0,0 +1,138 @@
+"""
+Voice analysis in a process pool.
+
+audio_analysis_view saves the upload, hands the file to a pool worker
+running voice.analyze_file (through pcm_cache), and returns. The NumPy
+work never runs on the request thread, and it does not hold the
+server's GIL. When the worker finishes, the future's callback stores
+these on the AudioAnalysis:
+- the features, duration, emotion and confidence;
+- the voice scores on the assessment's UserScore, if it is already
+  scored.
+If the assessment is not scored yet, calculate_user_score picks the
+features up itself.
+
+With VOICE_ANALYSIS_WORKERS = 0 the analysis runs inline instead. Tests
+and one-off scripts use that.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import pcm_cache
+from .models import Assessment, AudioAnalysis, UserScore
+from .scoring import apply_voice_scores
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+VOICE_SCORE_FIELDS = [
+    'voice_tone_score', 'voice_pitch_score', 'voice_speed_score', 'voice_hesitation_score', 'voice_stress_score',
+]
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers start clean instead of inheriting the server's threads and DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.VOICE_ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def submit_analysis(analysis):
+    """Analyse a saved AudioAnalysis's file in the pool (inline with no workers)"""
+    args = (
+        analysis.audio_file.path, settings.VOICE_DECODE_CHUNK_SECONDS, settings.FFMPEG_BINARY,
+        settings.PCM_CACHE_DIR, settings.PCM_CACHE_MAX_BYTES,
+    )
+    if settings.VOICE_ANALYSIS_WORKERS == 0:
+        try:
+            result = pcm_cache.analyze_file(*args)
+        except Exception as e:
+            store_failure(analysis.pk, e)
+        else:
+            store_result(analysis.pk, result)
+        return
+
+    future = get_executor().submit(pcm_cache.analyze_file, *args)
+    future.add_done_callback(partial(_analysis_done, analysis.pk))
+
+
+def _analysis_done(analysis_id, future):
+    # Runs on the executor's management thread, which has a DB connection of its own
+    try:
+        try:
+            result = future.result()
+        except Exception as e:
+            store_failure(analysis_id, e)
+        else:
+            store_result(analysis_id, result)
+    except Exception:
+        logger.exception(f"Could not store voice analysis {analysis_id}")
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def store_result(analysis_id, result):
+    features = result['features']
+    with transaction.atomic():
+        analysis = AudioAnalysis.objects.get(pk=analysis_id)
+        if analysis.assessment_id:
+            # Serialises with run_job saving the same assessment's score
+            Assessment.objects.select_for_update().filter(pk=analysis.assessment_id).first()
+        analysis.features = features
+        analysis.duration = features.get('duration')
+        analysis.emotion = result['emotion']
+        analysis.confidence = result['confidence']
+        analysis.analysis_result = result
+        analysis.status = 'completed'
+        analysis.processed_at = timezone.now()
+        analysis.save()
+
+        if analysis.assessment_id:
+            user_score = UserScore.objects.filter(assessment_id=analysis.assessment_id).first()
+            if user_score is not None:
+                apply_voice_scores(user_score, features)
+                user_score.save(update_fields=VOICE_SCORE_FIELDS + ['total_score'])
+    logger.info(f"Voice analysis {analysis_id} completed: {result['emotion']} ({result['confidence']})")
+
+
+def store_failure(analysis_id, error):
+    logger.warning(f"Voice analysis {analysis_id} failed: {type(error).__name__}: {str(error)}")
+    AudioAnalysis.objects.filter(pk=analysis_id).update(
+        status='failed', processed_at=timezone.now(),
+        analysis_result={'error': f"{type(error).__name__}: {str(error)}"},
+    )
+
+
+def latest_voice_features(assessment_ids):
+    """{assessment id: features of its latest completed recording}"""
+    analyses = (
+        AudioAnalysis.objects
+        .filter(assessment_id__in=assessment_ids, status='completed', features__isnull=False)
+        .order_by('assessment_id', 'processed_at', 'pk')
+        .values_list('assessment_id', 'features')
+    )
+    # Later recordings overwrite earlier ones
+    return dict(analyses)
@@ -18,16 +18,19 @@ import { getArticles } from "../../Services/api";
 const ArticlesSection = () => {
   const scrollX = useRef(new Animated.Value(0)).current;
   const [articles, setArticles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [refreshing, setRefreshing] = useState(false);
+  const loadingMore = useRef(false);
   const navigation = useNavigation();
   const isFocused = useIsFocused(); // Hook to detect when screen is focused
 
-  // Fetch articles function
+  // Fetch the first page again (newest articles), dropping any loaded pages
   const fetchArticles = async () => {
     try {
       setRefreshing(true);
       const data = await getArticles();
-      setArticles(data);
+      setArticles(data.results);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("Error fetching articles:", error);
     } finally {
@@ -35,6 +38,32 @@ const ArticlesSection = () => {
     }
   };
 
+  // Append the next page once the user scrolls to the end of the row
+  const loadMoreArticles = async () => {
+    if (!nextCursor || loadingMore.current) return;
+    loadingMore.current = true;
+    try {
+      const data = await getArticles({ cursor: nextCursor });
+      setArticles((loaded) => {
+        const seen = new Set(loaded.map((article) => article.id));
+        return [...loaded, ...data.results.filter((article) => !seen.has(article.id))];
+      });
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error("Error fetching more articles:", error);
+    } finally {
+      loadingMore.current = false;
+    }
+  };
+
+  const onScrollEnd = ({ nativeEvent }) => {
+    const { contentOffset, layoutMeasurement, contentSize } = nativeEvent;
+    // Within about one card of the end
+    if (contentOffset.x + layoutMeasurement.width >= contentSize.width - 216) {
+      loadMoreArticles();
+    }
+  };
+
   // Initial fetch and refetch when screen comes into focus
   useEffect(() => {
     fetchArticles();
@@ -70,6 +99,8 @@ const ArticlesSection = () => {
           [{ nativeEvent: { contentOffset: { x: scrollX } } }],
           { useNativeDriver: false }
         )}
+        onMomentumScrollEnd={onScrollEnd}
+        onScrollEndDrag={onScrollEnd}
         scrollEventThrottle={16}
         decelerationRate="fast"
         snapToInterval={216}
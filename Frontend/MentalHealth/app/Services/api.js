@@ -241,8 +241,14 @@ export const ChatService = {
 
 
 // 📰 Articles API
-export const getArticles = async () => {
-  return makeRequest('get', '/articles/');
+// Newest first, a page at a time: pass back next_cursor for the following page
+export const getArticles = async ({ cursor = null, category = null, limit = null } = {}) => {
+  const params = new URLSearchParams();
+  if (cursor) params.append('cursor', cursor);
+  if (category) params.append('category', category);
+  if (limit) params.append('limit', limit);
+  const query = params.toString();
+  return makeRequest('get', `/articles/${query ? `?${query}` : ''}`);
 };
 
 